@@ -0,0 +1,84 @@
+"""
+Admin Routes
+Endpoints de diagnóstico protegidos con ADMIN_TOKEN
+"""
+import asyncio
+import hmac
+import os
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.services.recommender_service import recommender_service
+from app.utils.profiler import ProfilerBusy, profile
+from app.utils.serialization import FastJSONResponse
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Sin ADMIN_TOKEN configurado los endpoints de admin no existen"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    top: int = 25,
+    include_idle: bool = False,
+    memory: bool = True,
+    format: Literal["json", "collapsed"] = "json"
+):
+    """
+    Perfila este worker durante `seconds` sin reiniciarlo
+    Muestreo de pilas + tracemalloc; format=collapsed retorna sólo las pilas
+    """
+    max_seconds = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    if not 0 < seconds <= max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {max_seconds}]")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+
+    try:
+        result = await asyncio.to_thread(
+            profile, seconds,
+            interval=interval_ms / 1000,
+            top=top,
+            include_idle=include_idle,
+            trace_memory=memory and format == "json"
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(result["stacks"]) + "\n")
+    return FastJSONResponse(result)
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """Estado de los jobs de fondo"""
+    return FastJSONResponse(recommender_service.jobs.stats())
+
+
+@router.post("/jobs/{name}")
+async def run_job(name: str, wait: bool = False):
+    """
+    Dispara un job de fondo
+    Con wait=true espera a que termine y retorna su estado
+    """
+    jobs = recommender_service.jobs
+    if name not in jobs.jobs:
+        raise HTTPException(status_code=404, detail=f"Job '{name}' not found")
+    if wait:
+        ok = await jobs.run(name)
+        return FastJSONResponse({"job": name, "ok": ok, **jobs.jobs[name].stats()})
+    jobs.trigger(name)
+    return FastJSONResponse({"job": name, "triggered": True}, status_code=202)
@@ -0,0 +1,294 @@
+"""
+Admission Control
+Límite de concurrencia por endpoint, cola acotada y deadline por request
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import request_budget, server_timing
+from app.utils.metrics import registry
+
+
+class Overloaded(Exception):
+    """No hay lugar en la cola o la espera superó su presupuesto"""
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo con cola FIFO acotada y tiempo máximo de espera
+
+    Un request que encuentra la cola llena se rechaza sin esperar; uno que
+    espera más de queue_timeout también. Al liberar un lugar se le entrega
+    directamente al primero de la cola, así el orden es estricto.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 0.5,
+        cheap_queue_ratio: float = 0.5
+    ):
+        """
+        Args:
+            max_concurrency: Requests ejecutándose a la vez
+            max_queue: Requests esperando un lugar
+            queue_timeout: Máximo de segundos en la cola
+            cheap_queue_ratio: Ocupación de la cola desde la que los
+                admitidos usan el camino barato (1 o más = nunca)
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cheap_queue_ratio = cheap_queue_ratio
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self.stats: Dict[str, int] = {
+            "admitted": 0, "queued": 0, "rejected": 0, "queue_timeouts": 0, "cheap": 0
+        }
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def under_pressure(self) -> bool:
+        """True si la cola supera cheap_queue_ratio de su capacidad"""
+        return self.max_queue > 0 and self.queued >= self.cheap_queue_ratio * self.max_queue
+
+    async def acquire(self):
+        """
+        Espera un lugar
+
+        Raises:
+            Overloaded: Si la cola está llena o se agota queue_timeout
+        """
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise Overloaded("Queue full")
+
+        self.stats["queued"] += 1
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # El lugar se entregó justo al vencer la espera: se conserva
+                # si fue timeout, se devuelve si el request se canceló
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["admitted"] += 1
+                    return
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["queue_timeouts"] += 1
+                raise Overloaded("Queue timeout") from None
+            raise
+        self.stats["admitted"] += 1
+
+    def release(self):
+        """Libera un lugar, entregándolo al primero de la cola si hay"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "active": self.active, "waiting": self.queued}
+
+    @classmethod
+    def from_env(cls, name: str) -> "ConcurrencyLimiter":
+        """ADMISSION_<NAME>_* con ADMISSION_* como valores por defecto"""
+        def option(key: str, default: str) -> str:
+            return os.getenv(f"ADMISSION_{name.upper()}_{key}", os.getenv(f"ADMISSION_{key}", default))
+
+        return cls(
+            max_concurrency=int(option("MAX_CONCURRENCY", "32")),
+            max_queue=int(option("MAX_QUEUE", "64")),
+            queue_timeout=float(option("QUEUE_TIMEOUT_SECONDS", "0.5")),
+            cheap_queue_ratio=float(option("CHEAP_QUEUE_RATIO", "0.5"))
+        )
+
+
+class AdmissionControl:
+    """Un limitador por endpoint más el presupuesto total de cada request"""
+
+    def __init__(
+        self,
+        limiters: Sequence[Tuple[str, str, ConcurrencyLimiter]],
+        budget_seconds: Optional[float] = 5.0,
+        retry_after: int = 1
+    ):
+        """
+        Args:
+            limiters: (nombre, prefijo de ruta, limitador), en orden de búsqueda
+            budget_seconds: Tiempo total por request, cola incluida (None = sin límite)
+            retry_after: Segundos sugeridos en Retry-After al rechazar
+        """
+        self.limiters = list(limiters)
+        self.budget_seconds = budget_seconds
+        self.retry_after = retry_after
+        self.stats: Dict[str, int] = {"deadline_exceeded": 0, "disconnected": 0}
+
+    def match(self, path: str) -> Optional[ConcurrencyLimiter]:
+        for _, prefix, limiter in self.limiters:
+            if path.startswith(prefix):
+                return limiter
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "endpoints": {name: limiter.snapshot() for name, _, limiter in self.limiters}
+        }
+
+    @classmethod
+    def from_env(cls, prefix: str = "/api/v1") -> "AdmissionControl":
+        """Crea los limitadores de los endpoints de recomendación"""
+        endpoints = ("recommendations", "similar", "personalized", "trending")
+        budget = os.getenv("REQUEST_BUDGET_SECONDS", "5")
+        return cls(
+            [(name, f"{prefix}/{name}", ConcurrencyLimiter.from_env(name)) for name in endpoints],
+            budget_seconds=float(budget) if budget else None,
+            retry_after=int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+        )
+
+
+admission_control = AdmissionControl.from_env()
+
+registry.callback(
+    "recommender_admission_in_flight", "Requests running or waiting per endpoint",
+    lambda: {
+        (name, state): value
+        for name, _, limiter in admission_control.limiters
+        for state, value in (("active", limiter.active), ("waiting", limiter.queued))
+    },
+    ("endpoint", "state")
+)
+registry.callback(
+    "recommender_admission_requests_total", "Admission decisions per endpoint",
+    lambda: {
+        (name, outcome): limiter.stats[outcome]
+        for name, _, limiter in admission_control.limiters
+        for outcome in ("admitted", "rejected", "queue_timeouts", "cheap")
+    },
+    ("endpoint", "outcome"),
+    kind="counter"
+)
+
+
+class AdmissionMiddleware:
+    """
+    Aplica AdmissionControl a los requests HTTP
+
+    El request admitido corre en su propia tarea con el deadline fijado en
+    request_budget; si vence o el cliente se desconecta la tarea se cancela,
+    lo que corta las consultas pendientes a Supabase. Si todavía no se
+    envió la respuesta, se responde 503 con Retry-After.
+    """
+
+    def __init__(self, app: ASGIApp, control: AdmissionControl = admission_control):
+        self.app = app
+        self.control = control
+        self._retry_after = str(control.retry_after).encode("latin-1")
+
+    async def _unavailable(self, send: Send, detail: str):
+        body = orjson.dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", self._retry_after)
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limiter = self.control.match(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        cheap = limiter.under_pressure()
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            await self._unavailable(send, f"Service overloaded: {e}")
+            return
+
+        server_timing.add("queue", time.monotonic() - started)
+        try:
+            if cheap:
+                limiter.stats["cheap"] += 1
+            budget = self.control.budget_seconds
+            if budget is not None:
+                budget -= time.monotonic() - started
+            await self._run(scope, receive, send, budget, cheap)
+        finally:
+            limiter.release()
+
+    async def _run(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        budget: Optional[float],
+        cheap: bool
+    ):
+        inbox: "asyncio.Queue[Message]" = asyncio.Queue()
+        response_started = False
+
+        async def app_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        tokens = request_budget.start(budget, cheap=cheap)
+        try:
+            task = asyncio.ensure_future(self.app(scope, inbox.get, app_send))
+        finally:
+            request_budget.reset(tokens)
+
+        async def listen():
+            # Reenvía los mensajes del cliente a la app y corta al desconectarse
+            while True:
+                message = await receive()
+                await inbox.put(message)
+                if message["type"] == "http.disconnect":
+                    self.control.stats["disconnected"] += 1
+                    task.cancel()
+                    return
+
+        listener = asyncio.ensure_future(listen())
+        try:
+            done, _ = await asyncio.wait({task}, timeout=budget)
+            if not done:
+                self.control.stats["deadline_exceeded"] += 1
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                if listener.done() or response_started:
+                    return
+                await self._unavailable(send, "Request deadline exceeded")
+        finally:
+            listener.cancel()
+            if not task.done():
+                task.cancel()
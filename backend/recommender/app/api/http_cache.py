@@ -0,0 +1,154 @@
+"""
+HTTP Cache
+ETag / Cache-Control / 304 para endpoints cuyo contenido es igual para todos
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ConditionalCacheMiddleware:
+    """
+    Caché condicional para GET de endpoints públicos
+
+    El ETag se deriva de la ruta, los parámetros (ordenados), la huella del
+    catálogo y la versión del modelo, así que se calcula sin ejecutar
+    el endpoint: un If-None-Match que coincide se responde con 304 de
+    inmediato. Las respuestas 200 se guardan por max_age segundos para que
+    un mismo ETag siempre corresponda al mismo cuerpo (las estrategias son
+    aleatorias) y se agregan Cache-Control con stale-while-revalidate para
+    que CDNs y navegadores absorban el tráfico.
+
+    Va por dentro de CORSMiddleware: lo guardado no lleva headers que
+    dependan del Origin del request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: Sequence[str],
+        version: Callable[[], str],
+        max_age: int = 60,
+        stale_while_revalidate: int = 300,
+        max_entries: int = 1000
+    ):
+        """
+        Args:
+            app: Aplicación ASGI
+            paths: Prefijos de ruta cacheables
+            version: Retorna la versión del contenido (catálogo + modelo)
+            max_age: Segundos que la respuesta se considera fresca
+            stale_while_revalidate: Segundos extra en que puede servirse
+                vencida mientras se revalida
+            max_entries: Respuestas guardadas en memoria
+        """
+        self.app = app
+        self.paths = tuple(paths)
+        self.version = version
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_entries = max_entries
+        self.cache_control = (
+            f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+        ).encode("latin-1")
+        # etag -> (expira en, headers, cuerpo)
+        self._responses: "OrderedDict[bytes, Tuple[float, List[Tuple[bytes, bytes]], bytes]]" = OrderedDict()
+
+    def _etag(self, scope: Scope) -> bytes:
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"))))
+        key = "\n".join((scope["path"], query, self.version()))
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()
+        return f'"{digest}"'.encode("latin-1")
+
+    @staticmethod
+    def _if_none_match(scope: Scope) -> Optional[bytes]:
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                return value
+        return None
+
+    @staticmethod
+    def _matches(if_none_match: bytes, etag: bytes) -> bool:
+        if if_none_match.strip() == b"*":
+            return True
+        for candidate in if_none_match.split(b","):
+            candidate = candidate.strip()
+            if candidate.startswith(b"W/"):
+                candidate = candidate[2:]
+            if candidate == etag:
+                return True
+        return False
+
+    def _cache_headers(self, etag: bytes) -> List[Tuple[bytes, bytes]]:
+        return [(b"etag", etag), (b"cache-control", self.cache_control)]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        etag = self._etag(scope)
+
+        if_none_match = self._if_none_match(scope)
+        if if_none_match is not None and self._matches(if_none_match, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": self._cache_headers(etag)})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        cached = self._responses.get(etag)
+        if cached is not None and cached[0] > time.monotonic():
+            self._responses.move_to_end(etag)
+            _, headers, body = cached
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": body if scope["method"] == "GET" else b""})
+            return
+
+        start: Dict[str, Message] = {}
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                start["message"] = message
+                if message["status"] == 200:
+                    headers = [
+                        (name, value) for name, value in message.get("headers", [])
+                        if name not in (b"etag", b"cache-control")
+                    ]
+                    message = {**message, "headers": headers + self._cache_headers(etag)}
+                    start["message"] = message
+            elif message["type"] == "http.response.body" and start["message"]["status"] == 200:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False) and scope["method"] == "GET":
+                    self._store(etag, start["message"]["headers"], b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _store(self, etag: bytes, headers: List[Tuple[bytes, bytes]], body: bytes):
+        # Los headers que dependen del Origin los pone CORS en cada request
+        headers = [
+            (name, value) for name, value in headers
+            if not name.startswith(b"access-control-") and name != b"vary"
+        ]
+        self._responses[etag] = (time.monotonic() + self.max_age, headers, body)
+        self._responses.move_to_end(etag)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    @staticmethod
+    def env_options() -> Dict[str, int]:
+        """max_age / stale_while_revalidate / max_entries desde el entorno"""
+        return {
+            "max_age": int(os.getenv("HTTP_CACHE_MAX_AGE", "60")),
+            "stale_while_revalidate": int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "300")),
+            "max_entries": int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "1000"))
+        }
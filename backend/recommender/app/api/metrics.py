@@ -0,0 +1,62 @@
+"""
+HTTP Metrics
+Latencia y throughput por ruta, status y método
+"""
+import time
+from typing import Optional, Sequence
+
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import registry
+
+request_seconds = registry.histogram(
+    "recommender_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """
+    Mide cada request HTTP con el template de la ruta como label
+
+    La ruta sale de scope["route"] (la fija FastAPI al enrutar); para las
+    respuestas que no llegan al router, como los 304 o las respuestas
+    cacheadas de ConditionalCacheMiddleware, se busca en `routes`. Así
+    /similar/{product_id} es una sola serie y no una por producto.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute] = ()):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope: Scope) -> str:
+        route: Optional[BaseRoute] = scope.get("route")
+        if route is None:
+            for candidate in self.routes:
+                if candidate.matches(scope)[0] == Match.FULL:
+                    route = candidate
+                    break
+        return getattr(route, "path", "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_seconds.observe(
+                time.perf_counter() - started, scope["method"], self._route(scope), str(status)
+            )
@@ -2,20 +2,68 @@
 API Routes
 Endpoints para recomendaciones de productos
 """
+import math
 from fastapi import APIRouter, HTTPException
-from typing import Optional, List
+from typing import Optional, List, Set, Literal, Sequence, Union
 from pydantic import BaseModel
 from app.services.recommender_service import recommender_service
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.database import validate_fields
+from app.utils.query_executor import QueryTimeout
+from app.utils.request_budget import DeadlineExceeded
+from app.api.admission import admission_control
+from app.utils.serialization import FastJSONResponse
 
 router = APIRouter()
 
+# Variantes de product_images.thumbnails ("full" = imagen original)
+ImageSize = Literal["full", "desktop", "tablet", "mobile", "minithumb"]
+
+
+def _parse_fields(fields: Optional[Union[str, List[str]]]) -> Optional[Sequence[str]]:
+    """fields llega como lista (body) o separado por comas (query string)"""
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    try:
+        return validate_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _unavailable(e: Exception) -> HTTPException:
+    """503 con Retry-After cuando Supabase no responde o se agota el presupuesto del request"""
+    retry_after = e.retry_after if isinstance(e, CircuitOpenError) else 1
+    return HTTPException(
+        status_code=503,
+        detail=f"Database unavailable: {str(e)}",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
 
 class RecommendationRequest(BaseModel):
     """Request model para obtener recomendaciones"""
     user_id: Optional[str] = None
     category: Optional[str] = None
     limit: int = 6
-    exclude_ids: Optional[List[str]] = None
+    exclude_ids: Optional[Set[str]] = None
+    # Excluye lo ya mostrado a user_id (se guarda en el servicio, no en el cliente)
+    exclude_seen: bool = False
+    # Filtros por precio unitario efectivo (tramos de product_quantity_ranges)
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    quantity: Optional[int] = None
+    sort_by: Literal["relevance", "price_asc", "price_desc"] = "relevance"
+    # Sólo productos que despachan a la región (product_delivery_regions)
+    region: Optional[str] = None
+    max_delivery_days: Optional[int] = None
+    # Campos a retornar por producto (id siempre va) y tamaño de imagen
+    fields: Optional[List[str]] = None
+    image_size: ImageSize = "full"
+
+
+class SeenRequest(BaseModel):
+    """Request model para registrar productos vistos"""
+    product_ids: List[str]
 
 
 class HealthResponse(BaseModel):
@@ -29,7 +77,7 @@ class HealthResponse(BaseModel):
 async def health_check():
     """Endpoint de salud del servicio"""
     return {
-        "status": "healthy",
+        "status": "degraded" if recommender_service.degraded else "healthy",
         "service": "sellsi-recommender",
         "version": "1.0.0"
     }
@@ -38,10 +86,26 @@ async def health_check():
 @router.get("/strategies")
 async def list_strategies():
     """Lista las estrategias de recomendación disponibles"""
-    return {
+    return FastJSONResponse({
         "strategies": recommender_service.get_available_strategies(),
-        "active": recommender_service.get_active_strategy()
-    }
+        "active": recommender_service.get_active_strategy(),
+        "split": recommender_service.router.split,
+        "budgets_ms": recommender_service.router.budgets_ms,
+        "fallback": recommender_service.router.fallback
+    })
+
+
+@router.get("/stats")
+async def service_stats():
+    """
+    Estado interno del servicio
+    Cachés, índices en memoria, latencias / hedging de Supabase por operación
+    y admisión por endpoint
+    """
+    return FastJSONResponse({
+        **recommender_service.stats(),
+        "admission": admission_control.snapshot()
+    })
 
 
 @router.post("/recommendations")
@@ -50,19 +114,32 @@ async def get_recommendations(request: RecommendationRequest):
     Obtiene recomendaciones de productos
     MVP: Retorna productos en orden aleatorio
     """
+    fields = _parse_fields(request.fields)
     try:
         recommendations = await recommender_service.get_recommendations(
             user_id=request.user_id,
             category=request.category,
             limit=request.limit,
-            exclude_ids=request.exclude_ids or []
+            exclude_ids=request.exclude_ids,
+            exclude_seen=request.exclude_seen,
+            min_price=request.min_price,
+            max_price=request.max_price,
+            quantity=request.quantity,
+            sort_by=request.sort_by,
+            region=request.region,
+            max_delivery_days=request.max_delivery_days,
+            fields=fields,
+            image_size=request.image_size
         )
         
-        return {
+        return FastJSONResponse({
             "products": recommendations,
             "count": len(recommendations),
-            "strategy": recommender_service.get_active_strategy()
-        }
+            "strategy": recommender_service.served_strategy(request.user_id),
+            "degraded": recommender_service.degraded
+        })
+    except (CircuitOpenError, QueryTimeout, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -70,23 +147,35 @@ async def get_recommendations(request: RecommendationRequest):
 @router.get("/similar/{product_id}")
 async def get_similar_products(
     product_id: str,
-    limit: int = 6
+    limit: int = 6,
+    region: Optional[str] = None,
+    max_delivery_days: Optional[int] = None,
+    fields: Optional[str] = None,
+    image_size: ImageSize = "full"
 ):
     """
     Obtiene productos similares a uno dado
     MVP: Retorna productos aleatorios de la misma categoría
     """
+    fields = _parse_fields(fields)
     try:
         similar = await recommender_service.get_similar_products(
             product_id=product_id,
-            limit=limit
+            limit=limit,
+            region=region,
+            max_delivery_days=max_delivery_days,
+            fields=fields,
+            image_size=image_size
         )
         
-        return {
+        return FastJSONResponse({
             "product_id": product_id,
             "similar_products": similar,
-            "count": len(similar)
-        }
+            "count": len(similar),
+            "degraded": recommender_service.degraded
+        })
+    except (CircuitOpenError, QueryTimeout, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Product not found: {str(e)}")
 
@@ -94,39 +183,94 @@ async def get_similar_products(
 @router.get("/personalized/{user_id}")
 async def get_personalized_recommendations(
     user_id: str,
-    limit: int = 10
+    limit: int = 10,
+    exclude_seen: bool = False,
+    fields: Optional[str] = None,
+    image_size: ImageSize = "full"
 ):
     """
     Obtiene recomendaciones personalizadas para un usuario
     MVP: Retorna productos aleatorios
     """
+    fields = _parse_fields(fields)
     try:
         personalized = await recommender_service.get_personalized_recommendations(
             user_id=user_id,
-            limit=limit
+            limit=limit,
+            exclude_seen=exclude_seen,
+            fields=fields,
+            image_size=image_size
         )
         
-        return {
+        return FastJSONResponse({
             "user_id": user_id,
             "recommendations": personalized,
-            "count": len(personalized)
-        }
+            "count": len(personalized),
+            "degraded": recommender_service.degraded
+        })
+    except (CircuitOpenError, QueryTimeout, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/autocomplete")
+async def autocomplete_products(
+    q: str,
+    limit: int = 8,
+    fuzzy: bool = True
+):
+    """
+    Sugerencias de productos mientras el usuario escribe
+    Se resuelve en memoria sobre el catálogo cargado, sin consultar Supabase
+    """
+    suggestions = recommender_service.autocomplete(q, limit=limit, fuzzy=fuzzy)
+    
+    return FastJSONResponse({
+        "query": q,
+        "suggestions": suggestions,
+        "count": len(suggestions)
+    })
+
+
+@router.post("/seen/{user_id}")
+async def mark_products_seen(user_id: str, request: SeenRequest):
+    """Registra productos vistos por el usuario (p. ej. vistas de detalle)"""
+    recommender_service.mark_seen(user_id, request.product_ids)
+    return {"user_id": user_id, "count": len(request.product_ids)}
+
+
+@router.delete("/seen/{user_id}")
+async def clear_seen_products(user_id: str):
+    """Olvida los productos vistos por el usuario"""
+    recommender_service.clear_seen(user_id)
+    return {"user_id": user_id, "cleared": True}
+
+
 @router.get("/trending")
-async def get_trending_products(limit: int = 10):
+async def get_trending_products(
+    limit: int = 10,
+    fields: Optional[str] = None,
+    image_size: ImageSize = "full"
+):
     """
     Obtiene productos en tendencia
     MVP: Retorna productos aleatorios
     """
+    fields = _parse_fields(fields)
     try:
-        trending = await recommender_service.get_trending_products(limit=limit)
+        trending = await recommender_service.get_trending_products(
+            limit=limit,
+            fields=fields,
+            image_size=image_size
+        )
         
-        return {
+        return FastJSONResponse({
             "trending_products": trending,
-            "count": len(trending)
-        }
+            "count": len(trending),
+            "degraded": recommender_service.degraded
+        })
+    except (CircuitOpenError, QueryTimeout, DeadlineExceeded) as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
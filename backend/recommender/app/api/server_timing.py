@@ -0,0 +1,48 @@
+"""
+Server-Timing
+Agrega a cada respuesta la duración de sus etapas (cola, db, transform, score, serialize)
+"""
+import os
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import server_timing
+
+
+class ServerTimingMiddleware:
+    """
+    Header Server-Timing con las etapas registradas en app.utils.server_timing
+
+    Va por fuera de ConditionalCacheMiddleware para que las respuestas
+    guardadas no repitan los tiempos del request que las generó.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = server_timing.start()
+        stages = server_timing.current()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.header(stages, time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            server_timing.reset(token)
+
+    @staticmethod
+    def env_options() -> dict:
+        return {"enabled": os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"}
@@ -2,15 +2,54 @@
 FastAPI Application Entry Point
 Localhost development server
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
+from app.api.admin import router as admin_router
+from app.api.http_cache import ConditionalCacheMiddleware
+from app.api.admission import AdmissionMiddleware
+from app.api.metrics import MetricsMiddleware
+from app.api.server_timing import ServerTimingMiddleware
+from app.services.recommender_service import recommender_service
+from app.utils.metrics import CONTENT_TYPE, LoopLagMonitor, registry
 import uvicorn
 
+
+loop_lag = LoopLagMonitor()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refresco del catálogo en memoria en segundo plano
+    recommender_service.start()
+    loop_lag.start()
+    yield
+    await loop_lag.stop()
+    await recommender_service.stop()
+
+
 app = FastAPI(
     title="Sellsi Recommender API",
     description="Product recommendation service - MVP with randomization",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Límite de concurrencia, cola acotada y deadline por request. Se agrega
+# primero para quedar por dentro de CORS y del caché HTTP: los 503 llevan
+# headers CORS y las respuestas cacheadas no ocupan lugar
+app.add_middleware(AdmissionMiddleware)
+
+# ETag / Cache-Control para endpoints cuyo contenido es igual para todos.
+# Queda por dentro de CORS: las respuestas guardadas y los 304 reciben los
+# headers CORS del Origin de cada request, no los del primero que se guardó
+app.add_middleware(
+    ConditionalCacheMiddleware,
+    paths=("/api/v1/trending", "/api/v1/similar/", "/api/v1/strategies"),
+    version=recommender_service.content_version,
+    **ConditionalCacheMiddleware.env_options()
 )
 
 # CORS para localhost
@@ -27,8 +66,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-Timing por etapa (opcional), por fuera del caché HTTP
+app.add_middleware(ServerTimingMiddleware, **ServerTimingMiddleware.env_options())
+
+# Latencia por ruta; se agrega al final para medir también lo que
+# resuelven los demás middlewares (304, respuestas cacheadas, 503)
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
 # Incluir rutas
 app.include_router(router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1/admin", include_in_schema=False)
 
 @app.get("/")
 async def root():
@@ -39,6 +86,13 @@ async def root():
         "mode": "localhost"
     }
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,263 @@
+"""
+Autocomplete Index
+Búsqueda "mientras se escribe" sobre productnm: arreglo ordenado de prefijos
+por palabra + índice de trigramas para coincidencias aproximadas
+"""
+import bisect
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+
+from app.utils.catalog import CatalogSnapshot
+from app.utils.text import tokenize
+
+# Mayor que cualquier carácter de palabra: keys[lo:hi] con hi = bisect(q + _PREFIX_END)
+_PREFIX_END = "\uffff"
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(tokenize(name))
+
+
+def _prefix_keys(norm: str) -> List[str]:
+    """El nombre desde el inicio de cada palabra: 'dell xps 13' -> ['dell xps 13', 'xps 13', '13']"""
+    words = norm.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+def _trigrams(norm: str) -> Set[str]:
+    padded = f" {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _IndexState:
+    """Estado publicado e inmutable que leen las consultas"""
+
+    def __init__(
+        self,
+        keys: List[str],
+        owners: np.ndarray,
+        popularity: np.ndarray,
+        postings: Dict[str, np.ndarray],
+        pids: List[Optional[str]]
+    ):
+        self.keys = keys
+        self.owners = owners
+        self.popularity = popularity
+        self.postings = postings
+        self.pids = pids
+        self.cache: Dict[Tuple[str, int, bool], List[Dict[str, Any]]] = {}
+
+
+class AutocompleteIndex:
+    """
+    Índice de autocompletado con ranking por popularidad
+
+    Cada producto ocupa un slot estable mientras exista, de modo que un
+    refresco del catálogo sólo toca las claves y trigramas de los productos
+    nuevos, renombrados o eliminados. Las consultas leen un estado publicado
+    de una sola vez al final de cada sync.
+    """
+
+    def __init__(
+        self,
+        fuzzy_threshold: float = 0.5,
+        rebuild_ratio: float = 0.2,
+        max_cache: int = 10000
+    ):
+        """
+        Args:
+            fuzzy_threshold: Fracción mínima de trigramas de la consulta
+                presentes en el nombre para una coincidencia aproximada
+            rebuild_ratio: Sobre esta fracción de cambios se reconstruye todo
+            max_cache: Consultas memorizadas por generación
+        """
+        self.fuzzy_threshold = fuzzy_threshold
+        self.rebuild_ratio = rebuild_ratio
+        self.max_cache = max_cache
+
+        self._slot_of: Dict[str, int] = {}
+        self._pids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._norm: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._owners: List[int] = []
+        self._postings: Dict[str, Set[int]] = {}
+
+        self.state = _IndexState([], np.empty(0, dtype=np.int32), np.empty(0), {}, [])
+
+    def _allocate(self, pid: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._pids[slot] = pid
+        else:
+            slot = len(self._pids)
+            self._pids.append(pid)
+        self._slot_of[pid] = slot
+        return slot
+
+    def _unindex(self, pid: str, touched: Set[str]):
+        slot = self._slot_of[pid]
+        norm = self._norm.pop(pid)
+        for key in _prefix_keys(norm):
+            i = bisect.bisect_left(self._keys, key)
+            while self._owners[i] != slot:
+                i += 1
+            del self._keys[i]
+            del self._owners[i]
+        for gram in _trigrams(norm):
+            self._postings[gram].discard(slot)
+            touched.add(gram)
+
+    def _index(self, pid: str, norm: str, touched: Set[str], sort_later: bool = False):
+        slot = self._slot_of.get(pid)
+        if slot is None:
+            slot = self._allocate(pid)
+        self._norm[pid] = norm
+        for key in _prefix_keys(norm):
+            if sort_later:
+                self._keys.append(key)
+                self._owners.append(slot)
+            else:
+                i = bisect.bisect_left(self._keys, key)
+                self._keys.insert(i, key)
+                self._owners.insert(i, slot)
+        for gram in _trigrams(norm):
+            self._postings.setdefault(gram, set()).add(slot)
+            touched.add(gram)
+
+    def sync(self, snapshot: CatalogSnapshot):
+        """Lleva el índice al estado de un snapshot del catálogo"""
+        names = {pid: _normalize_name(name) for pid, name in zip(snapshot.ids, snapshot.names)}
+        removed = [pid for pid in self._norm if pid not in names]
+        changed = {pid: norm for pid, norm in names.items() if self._norm.get(pid) != norm}
+        touched: Set[str] = set()
+
+        full_rebuild = len(removed) + len(changed) > self.rebuild_ratio * max(len(self._norm), 1)
+        if full_rebuild:
+            self._keys, self._owners = [], []
+            touched.update(self._postings)
+            for pid in removed:
+                self._norm.pop(pid)
+            for gram in self._postings.values():
+                gram.clear()
+        else:
+            for pid in removed:
+                self._unindex(pid, touched)
+            for pid in changed:
+                if pid in self._norm:
+                    self._unindex(pid, touched)
+
+        for pid in removed:
+            slot = self._slot_of.pop(pid)
+            self._pids[slot] = None
+            self._free.append(slot)
+
+        if full_rebuild:
+            self._norm.clear()
+            for pid, norm in names.items():
+                self._index(pid, norm, touched, sort_later=True)
+            order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+            self._keys = [self._keys[i] for i in order]
+            self._owners = [self._owners[i] for i in order]
+        else:
+            for pid, norm in changed.items():
+                self._index(pid, norm, touched)
+
+        self._publish(snapshot, touched)
+
+    def _publish(self, snapshot: CatalogSnapshot, touched: Set[str]):
+        popularity = np.zeros(len(self._pids))
+        slots = np.fromiter((self._slot_of[pid] for pid in snapshot.ids), dtype=np.int64, count=len(snapshot))
+        popularity[slots] = np.log1p(snapshot.sales)
+
+        postings = dict(self.state.postings)
+        for gram in touched:
+            members = self._postings.get(gram)
+            if members:
+                postings[gram] = np.fromiter(members, dtype=np.int32, count=len(members))
+            else:
+                postings.pop(gram, None)
+                self._postings.pop(gram, None)
+
+        self.state = _IndexState(
+            keys=list(self._keys),
+            owners=np.array(self._owners, dtype=np.int32),
+            popularity=popularity,
+            postings=postings,
+            pids=list(self._pids)
+        )
+
+    def complete(self, query: str, limit: int = 8, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """
+        Completa una consulta parcial
+
+        Args:
+            query: Texto escrito por el usuario
+            limit: Número máximo de sugerencias
+            fuzzy: Completar con coincidencias por trigramas si faltan resultados
+
+        Returns:
+            Lista de {id, score, match} ordenada por relevancia
+        """
+        state = self.state
+        q = _normalize_name(query)
+        if not q or limit <= 0:
+            return []
+
+        cache_key = (q, limit, fuzzy)
+        cached = state.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        results: Dict[int, Dict[str, Any]] = {}
+
+        # Prefijo: rango contiguo del arreglo ordenado
+        lo = bisect.bisect_left(state.keys, q)
+        hi = bisect.bisect_left(state.keys, q + _PREFIX_END, lo)
+        if hi > lo:
+            slots = state.owners[lo:hi]
+            scores = state.popularity[slots]
+            window = limit * 4
+            if len(slots) > window:
+                top = np.argpartition(-scores, window)[:window]
+                slots, scores = slots[top], scores[top]
+            for i in np.argsort(-scores, kind="stable"):
+                slot = int(slots[i])
+                if slot not in results:
+                    results[slot] = {"id": state.pids[slot], "score": float(scores[i]), "match": "prefix"}
+                    if len(results) >= limit:
+                        break
+
+        # Aproximado: fracción de trigramas de la consulta presentes en el nombre
+        if fuzzy and len(results) < limit and len(q) >= 3:
+            grams = _trigrams(q)
+            lists = [state.postings[g] for g in grams if g in state.postings]
+            if lists:
+                counts = np.bincount(np.concatenate(lists), minlength=len(state.pids))
+                similarity = counts / len(grams)
+                candidates = np.flatnonzero(similarity >= self.fuzzy_threshold)
+                if len(candidates):
+                    popularity = state.popularity[candidates]
+                    top_pop = popularity.max()
+                    ranked = similarity[candidates] + (0.1 * popularity / top_pop if top_pop > 0 else 0)
+                    for i in np.argsort(-ranked, kind="stable"):
+                        slot = int(candidates[i])
+                        if slot not in results:
+                            results[slot] = {"id": state.pids[slot], "score": float(ranked[i]), "match": "fuzzy"}
+                            if len(results) >= limit:
+                                break
+
+        suggestions = list(results.values())
+        if len(state.cache) >= self.max_cache:
+            state.cache.clear()
+        state.cache[cache_key] = suggestions
+        return suggestions
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "products": len(self._norm),
+            "keys": len(state.keys),
+            "trigrams": len(state.postings)
+        }
@@ -0,0 +1,211 @@
+"""
+Diversity Reranker - Post-scoring stage
+Re-ordena candidatos con MMR (Maximal Marginal Relevance) y aplica topes
+por proveedor y por categoría usando máscaras de NumPy
+"""
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+
+def _group_offsets(codes: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Agrupa las posiciones de los candidatos por código
+
+    Returns:
+        (order, offsets): los miembros del grupo g son order[offsets[g]:offsets[g + 1]]
+    """
+    order = codes.argsort()
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=n_groups), out=offsets[1:])
+    return order, offsets
+
+
+def factorize(values: List[Any]) -> Tuple[np.ndarray, int]:
+    """Convierte una lista de valores hashables en códigos enteros densos"""
+    mapping: Dict[Any, int] = {}
+    codes = np.fromiter(
+        (mapping.setdefault(value, len(mapping)) for value in values),
+        dtype=np.int64,
+        count=len(values)
+    )
+    return codes, len(mapping)
+
+
+class DiversityReranker:
+    """
+    Re-ranking por diversidad
+
+    La similitud entre dos candidatos es:
+        supplier_weight * [mismo proveedor] + category_weight * [misma categoría]
+
+    Como la similitud sólo depende de los códigos, al seleccionar un item
+    sólo cambia la similitud máxima de los candidatos que comparten su
+    proveedor o su categoría. Esos grupos se precalculan una vez, por lo que
+    cada paso cuesta un argmax más una actualización sobre el grupo afectado.
+    """
+
+    def __init__(
+        self,
+        diversity_lambda: float = 0.7,
+        max_per_supplier: Optional[int] = None,
+        max_per_category: Optional[int] = None,
+        supplier_weight: float = 0.6,
+        category_weight: float = 0.4,
+        strict_caps: bool = False
+    ):
+        """
+        Args:
+            diversity_lambda: 1.0 = sólo relevancia, 0.0 = sólo diversidad
+            max_per_supplier: Máximo de items por proveedor (None = sin tope)
+            max_per_category: Máximo de items por categoría (None = sin tope)
+            supplier_weight: Peso de compartir proveedor en la similitud
+            category_weight: Peso de compartir categoría en la similitud
+            strict_caps: Si es False y los topes dejan la lista incompleta,
+                se rellena con los mejores candidatos restantes
+        """
+        if not 0.0 <= diversity_lambda <= 1.0:
+            raise ValueError("diversity_lambda must be between 0 and 1")
+        self.diversity_lambda = diversity_lambda
+        self.max_per_supplier = max_per_supplier
+        self.max_per_category = max_per_category
+        self.supplier_weight = supplier_weight
+        self.category_weight = category_weight
+        self.strict_caps = strict_caps
+
+    def rerank_indices(
+        self,
+        scores: np.ndarray,
+        supplier_codes: np.ndarray,
+        category_codes: np.ndarray,
+        k: int,
+        n_suppliers: Optional[int] = None,
+        n_categories: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Selecciona k candidatos aplicando MMR y topes
+
+        Args:
+            scores: Relevancia de cada candidato (mayor es mejor)
+            supplier_codes: Código entero denso del proveedor de cada candidato
+            category_codes: Código entero denso de la categoría de cada candidato
+            k: Número de items a seleccionar
+            n_suppliers: Número de proveedores distintos (se infiere si es None)
+            n_categories: Número de categorías distintas (se infiere si es None)
+
+        Returns:
+            Posiciones de los candidatos seleccionados, en orden
+        """
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        scores = np.asarray(scores, dtype=np.float64)
+        supplier_codes = np.asarray(supplier_codes, dtype=np.int64)
+        category_codes = np.asarray(category_codes, dtype=np.int64)
+        if n_suppliers is None:
+            n_suppliers = int(supplier_codes.max()) + 1
+        if n_categories is None:
+            n_categories = int(category_codes.max()) + 1
+
+        # Relevancia normalizada a [0, 1] para que sea comparable con la similitud
+        lo, hi = scores.min(), scores.max()
+        relevance = (scores - lo) / (hi - lo) if hi > lo else np.ones(n)
+
+        # La penalización de un candidato sólo puede tomar los niveles
+        # cw (comparte categoría), sw (comparte proveedor) o sw + cw (ambos),
+        # y sólo sube cuando aparece por primera vez un proveedor, una
+        # categoría o un par (proveedor, categoría) en la selección
+        lam = self.diversity_lambda
+        penalty = 1.0 - lam
+        sw, cw = self.supplier_weight, self.category_weight
+        base = lam * relevance
+        mmr = base.copy()
+
+        sup_order, sup_offsets = _group_offsets(supplier_codes, n_suppliers)
+        cat_order, cat_offsets = _group_offsets(category_codes, n_categories)
+        sup_seen = np.zeros(n_suppliers, dtype=bool)
+        cat_seen = np.zeros(n_categories, dtype=bool)
+        pair_seen = set()
+        sup_taken = np.zeros(n_suppliers, dtype=np.int64)
+        cat_taken = np.zeros(n_categories, dtype=np.int64)
+
+        def lower(idx: np.ndarray, level: float):
+            # Actualización incremental del máximo de similitud
+            mmr[idx] = np.minimum(mmr[idx], base[idx] - penalty * level)
+
+        selected = np.empty(k, dtype=np.int64)
+        count = 0
+        while count < k:
+            j = int(mmr.argmax())
+            if mmr[j] == -np.inf:
+                break
+            selected[count] = j
+            count += 1
+            mmr[j] = -np.inf
+
+            s, c = supplier_codes.item(j), category_codes.item(j)
+            sup_members = sup_order[sup_offsets[s]:sup_offsets[s + 1]]
+            cat_members = cat_order[cat_offsets[c]:cat_offsets[c + 1]]
+            if not sup_seen[s]:
+                sup_seen[s] = True
+                lower(sup_members, sw)
+            if not cat_seen[c]:
+                cat_seen[c] = True
+                lower(cat_members, cw)
+            if (s, c) not in pair_seen:
+                pair_seen.add((s, c))
+                lower(sup_members[category_codes[sup_members] == c], sw + cw)
+
+            sup_taken[s] += 1
+            cat_taken[c] += 1
+            if self.max_per_supplier is not None and sup_taken[s] >= self.max_per_supplier:
+                mmr[sup_members] = -np.inf
+            if self.max_per_category is not None and cat_taken[c] >= self.max_per_category:
+                mmr[cat_members] = -np.inf
+
+        if count < k and not self.strict_caps:
+            # Los topes agotaron el pool: rellenar por relevancia
+            available = np.ones(n, dtype=bool)
+            available[selected[:count]] = False
+            rest = np.flatnonzero(available)
+            rest = rest[np.argsort(-scores[rest], kind="stable")][:k - count]
+            selected[count:count + len(rest)] = rest
+            count += len(rest)
+
+        return selected[:count]
+
+    def rerank(
+        self,
+        products: List[Dict[str, Any]],
+        limit: int,
+        score_key: str = "recommendation_score"
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-ordena una lista de productos ya puntuados
+
+        Args:
+            products: Candidatos con score, proveedor y categoría
+            limit: Número máximo de productos a retornar
+            score_key: Campo que contiene el score del modelo
+
+        Returns:
+            Lista de productos diversificada
+        """
+        if not products:
+            return []
+
+        scores = np.fromiter(
+            (p.get(score_key, 0.0) for p in products),
+            dtype=np.float64,
+            count=len(products)
+        )
+        supplier_codes, n_suppliers = factorize([p.get("provider_id") for p in products])
+        category_codes, n_categories = factorize([p.get("category") for p in products])
+
+        picked = self.rerank_indices(
+            scores, supplier_codes, category_codes, limit,
+            n_suppliers=n_suppliers, n_categories=n_categories
+        )
+        return [products[i] for i in picked]
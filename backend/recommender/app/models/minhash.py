@@ -0,0 +1,97 @@
+"""
+MinHash
+Firmas MinHash de textos, vectorizadas con NumPy
+
+Módulo liviano a propósito: los procesos del pool de jobs lo importan
+para firmar lotes grandes sin cargar el catálogo ni el origen de datos.
+"""
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.utils.jobs import SharedArray, share_array
+from app.utils.text import tokenize
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+class MinHasher:
+    """
+    Firmas MinHash de num_perm valores sobre shingles de palabras
+
+    Cada shingle se reduce a 32 bits con crc32 y cada permutación es el
+    finalizador de splitmix64 aplicado a (x XOR semilla_i). A diferencia de
+    (a * x + b) mod p con x de 32 bits, no favorece a los hashes pequeños,
+    y se calcula vectorizado con aritmética uint64 (el overflow es parte
+    de la mezcla).
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1, chunk_size: int = 65536):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.chunk_size = chunk_size
+        self.seeds = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64)
+
+    def _permute(self, hashes: np.ndarray) -> np.ndarray:
+        """Matriz (len(hashes), num_perm) con cada hash bajo cada permutación"""
+        z = hashes[:, None] ^ self.seeds
+        z ^= z >> np.uint64(30)
+        z *= _MIX_1
+        z ^= z >> np.uint64(27)
+        z *= _MIX_2
+        z ^= z >> np.uint64(31)
+        return z
+
+    @staticmethod
+    def shingles(text: str) -> np.ndarray:
+        """Hashes únicos de las palabras y pares de palabras del texto"""
+        tokens = tokenize(text)
+        grams = set(tokens)
+        grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        if not grams:
+            grams = {""}
+        return np.fromiter(
+            (zlib.crc32(g.encode("utf-8")) for g in grams),
+            dtype=np.uint64,
+            count=len(grams)
+        )
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """
+        Calcula las firmas de varios textos
+
+        Returns:
+            Matriz (len(texts), num_perm) de uint64
+        """
+        n = len(texts)
+        out = np.empty((n, self.num_perm), dtype=np.uint64)
+        if n == 0:
+            return out
+
+        hashed = [self.shingles(text) for text in texts]
+        lengths = np.fromiter((len(h) for h in hashed), dtype=np.int64, count=n)
+
+        # Procesa por bloques de productos para acotar la matriz intermedia
+        start = 0
+        while start < n:
+            end = start + 1
+            total = lengths[start]
+            while end < n and total + lengths[end] <= self.chunk_size:
+                total += lengths[end]
+                end += 1
+
+            flat = np.concatenate(hashed[start:end])
+            offsets = np.zeros(end - start, dtype=np.int64)
+            np.cumsum(lengths[start:end - 1], out=offsets[1:])
+
+            out[start:end] = np.minimum.reduceat(self._permute(flat), offsets, axis=0)
+            start = end
+
+        return out
+
+
+def shared_signatures(hasher: MinHasher, texts: List[str]) -> SharedArray:
+    """Firmas de texts calculadas en un proceso del pool, devueltas por memoria compartida"""
+    return share_array(hasher.signatures(texts))
@@ -0,0 +1,260 @@
+"""
+Near Duplicates - MinHash + LSH
+Agrupa publicaciones casi idénticas (clones entre proveedores) para que
+ocupen un solo lugar entre los candidatos
+"""
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from app.models.minhash import MinHasher
+from app.utils.catalog import CatalogSnapshot
+
+# Textos -> matriz de firmas (len(textos), num_perm)
+Signer = Callable[[List[str]], np.ndarray]
+
+
+class NearDuplicateIndex:
+    """
+    Índice LSH por bandas con clusters incrementales
+
+    Dos productos son candidatos si coinciden en al menos una banda de su
+    firma; el par se confirma si la similitud de Jaccard estimada supera el
+    umbral. Los clusters se mantienen con union-find y sólo se recalculan
+    los afectados cuando un producto cambia o desaparece.
+
+    La lectura (`clusters`, `dedupe`) usa un mapa publicado de una sola vez
+    al final de cada sync, por lo que es segura mientras sync corre en otro
+    hilo.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = 0.8,
+        max_bucket_candidates: int = 32,
+        seed: int = 1
+    ):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.hasher = MinHasher(num_perm=num_perm, seed=seed)
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.max_bucket_candidates = max_bucket_candidates
+
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._fingerprints: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._parent: Dict[str, str] = {}
+        self._members: Dict[str, List[str]] = {}
+
+        # id -> representante, sólo para productos en clusters de 2 o más
+        self.clusters: Dict[str, str] = {}
+        # (generación del snapshot, fila -> fila del representante)
+        self._row_clusters: Optional[Tuple[int, np.ndarray]] = None
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[bytes]:
+        r = self.rows_per_band
+        return (signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands))
+
+    def _find(self, pid: str) -> str:
+        parent = self._parent
+        root = pid
+        while parent[root] != root:
+            root = parent[root]
+        while parent[pid] != root:
+            parent[pid], pid = root, parent[pid]
+        return root
+
+    def _union(self, a: str, b: str):
+        ra, rb = self._find(a), self._find(b)
+        if ra != rb:
+            self._parent[max(ra, rb)] = min(ra, rb)
+
+    def _link(self, pid: str):
+        """Une pid con los candidatos de sus buckets que superen el umbral"""
+        signature = self._signatures[pid]
+        candidates: Set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket[-self.max_bucket_candidates:])
+        candidates.discard(pid)
+
+        for other in candidates:
+            if self._find(other) == self._find(pid):
+                continue
+            similarity = np.count_nonzero(self._signatures[other] == signature) / signature.size
+            if similarity >= self.threshold:
+                self._union(pid, other)
+
+    def _insert(self, pid: str, signature: np.ndarray):
+        self._signatures[pid] = signature
+        self._parent[pid] = pid
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(pid)
+
+    def _remove(self, pid: str):
+        signature = self._signatures.pop(pid)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.remove(pid)
+                if not bucket:
+                    del self._buckets[band][key]
+        self._fingerprints.pop(pid, None)
+
+    def update(
+        self,
+        items: Dict[str, str],
+        removed: Iterable[str] = (),
+        sign: Optional[Signer] = None
+    ):
+        """
+        Aplica altas, cambios y bajas al índice
+
+        Args:
+            items: {product_id: texto} de productos nuevos o modificados
+            removed: IDs que ya no están en el catálogo
+            sign: Calcula las firmas (por defecto self.hasher.signatures en
+                este hilo; el servicio manda los lotes grandes a otro proceso)
+        """
+        # Productos que salen (o cambian): sus clusters deben recalcularse
+        outgoing = {pid for pid in [*removed, *items] if pid in self._signatures}
+        dirty: Set[str] = set(outgoing)
+        for root in {self._find(pid) for pid in outgoing}:
+            dirty.update(self._members.get(root, (root,)))
+
+        # Deshace los clusters afectados antes de borrar, para que ningún
+        # miembro quede apuntando a una raíz eliminada
+        for pid in dirty:
+            self._parent[pid] = pid
+        for pid in outgoing:
+            self._remove(pid)
+            del self._parent[pid]
+
+        ids = list(items)
+        signatures = (sign or self.hasher.signatures)([items[pid] for pid in ids])
+        for pid, signature in zip(ids, signatures):
+            self._insert(pid, signature)
+            self._fingerprints[pid] = hash(items[pid])
+
+        # Reinicia los clusters afectados y vuelve a enlazarlos
+        dirty = {pid for pid in dirty if pid in self._parent}
+        for pid in dirty:
+            self._parent[pid] = pid
+        for pid in dirty:
+            self._link(pid)
+        for pid in ids:
+            self._link(pid)
+
+        self._publish()
+
+    def _publish(self):
+        members: Dict[str, List[str]] = {}
+        for pid in self._parent:
+            members.setdefault(self._find(pid), []).append(pid)
+
+        clusters: Dict[str, str] = {}
+        for root, group in members.items():
+            if len(group) > 1:
+                for pid in group:
+                    clusters[pid] = root
+
+        self._members = members
+        self.clusters = clusters
+
+    def sync(self, snapshot: CatalogSnapshot, sign: Optional[Signer] = None):
+        """Lleva el índice al estado de un snapshot del catálogo (sign: ver update)"""
+        current = set(snapshot.ids)
+        removed = [pid for pid in self._signatures if pid not in current]
+
+        items: Dict[str, str] = {}
+        for row, pid in enumerate(snapshot.ids):
+            text = snapshot.text(row)
+            if self._fingerprints.get(pid) != hash(text):
+                items[pid] = text
+
+        if items or removed:
+            self.update(items, removed, sign=sign)
+
+        # Las filas cambian entre snapshots: el mapa por fila se rehace siempre
+        row_clusters = np.arange(len(snapshot), dtype=np.int64)
+        id_to_row = snapshot.id_to_row
+        for pid, rep in self.clusters.items():
+            row = id_to_row.get(pid)
+            if row is not None:
+                row_clusters[row] = id_to_row.get(rep, row)
+        self._row_clusters = (snapshot.generation, row_clusters)
+
+    def representative(self, product_id: str) -> str:
+        """Representante del cluster del producto (él mismo si no tiene clones)"""
+        return self.clusters.get(product_id, product_id)
+
+    def members(self, product_id: str) -> List[str]:
+        """Productos del mismo cluster (incluido él mismo)"""
+        rep = self.clusters.get(product_id)
+        if rep is None:
+            return [product_id]
+        return list(self._members.get(rep, [product_id]))
+
+    def dedupe(
+        self,
+        products: List[Dict[str, Any]],
+        id_key: str = "id"
+    ) -> List[Dict[str, Any]]:
+        """
+        Conserva un solo producto por cluster, respetando el orden de entrada
+
+        Se queda con el primero que aparece, así un clon disponible sigue
+        apareciendo aunque el representante esté excluido o sin stock.
+        """
+        clusters = self.clusters
+        if not clusters:
+            return products
+
+        seen: Set[str] = set()
+        unique = []
+        for product in products:
+            rep = clusters.get(product[id_key], product[id_key])
+            if rep in seen:
+                continue
+            seen.add(rep)
+            unique.append(product)
+        return unique
+
+    def dedupe_rows(self, snapshot: CatalogSnapshot, rows: np.ndarray) -> np.ndarray:
+        """
+        Igual que dedupe, pero sobre filas de un snapshot y sin materializar
+
+        Si el índice aún no se sincronizó con ese snapshot, resuelve los
+        representantes por ID.
+        """
+        if not self.clusters or len(rows) == 0:
+            return rows
+
+        row_clusters = self._row_clusters
+        if row_clusters is not None and row_clusters[0] == snapshot.generation:
+            codes = row_clusters[1][rows]
+        else:
+            ids, clusters = snapshot.ids, self.clusters
+            index: Dict[str, int] = {}
+            codes = np.fromiter(
+                (index.setdefault(clusters.get(ids[row], ids[row]), len(index)) for row in rows.tolist()),
+                dtype=np.int64,
+                count=len(rows)
+            )
+
+        _, first = np.unique(codes, return_index=True)
+        return rows[np.sort(first)]
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [len(group) for group in self._members.values() if len(group) > 1]
+        return {
+            "products": len(self._signatures),
+            "clusters": len(sizes),
+            "clustered_products": sum(sizes),
+            "largest_cluster": max(sizes, default=0)
+        }
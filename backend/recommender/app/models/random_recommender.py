@@ -3,7 +3,9 @@ Random Recommender - MVP Strategy
 Randomiza el orden de los productos usando Fisher-Yates shuffle
 """
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
 
 
 class RandomRecommender:
@@ -11,6 +13,32 @@ class RandomRecommender:
     Estrategia de recomendación aleatoria
     MVP: Mezcla productos de forma aleatoria
     """
+
+    def score(
+        self,
+        candidates: np.ndarray,
+        limit: int = 6
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Elige y puntúa candidatos sin materializar productos
+
+        Args:
+            candidates: Identificadores de los candidatos (filas del catálogo)
+            limit: Número máximo de candidatos a retornar
+
+        Returns:
+            (candidatos elegidos, scores), ordenados por score descendente
+        """
+        k = min(len(candidates), limit)
+        if k <= 0:
+            return candidates[:0], np.empty(0)
+
+        # Muestra sin reemplazo en O(k), sin recorrer todo el pool
+        picked = candidates[random.sample(range(len(candidates)), k)]
+        scores = np.round(np.random.uniform(0.5, 1.0, k), 2)
+
+        order = np.argsort(-scores, kind="stable")
+        return picked[order], scores[order]
     
     def recommend(
         self,
@@ -30,14 +58,13 @@ class RandomRecommender:
         if not products:
             return []
         
-        # Fisher-Yates shuffle para aleatorización eficiente
-        shuffled = random.sample(products, min(len(products), limit))
+        picked, scores = self.score(np.arange(len(products)), limit)
         
         # Agregar score aleatorio para simular "confianza" del modelo
-        for product in shuffled:
-            product["recommendation_score"] = round(random.uniform(0.5, 1.0), 2)
-        
-        # Ordenar por score (de mayor a menor)
-        shuffled.sort(key=lambda x: x.get("recommendation_score", 0), reverse=True)
+        recommendations = []
+        for i, score in zip(picked.tolist(), scores.tolist()):
+            product = products[i]
+            product["recommendation_score"] = score
+            recommendations.append(product)
         
-        return shuffled
+        return recommendations
@@ -2,9 +2,44 @@
 Recommender Service
 Orquesta las diferentes estrategias de recomendación
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import os
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Container, Iterable, Sequence, Tuple, Callable, Awaitable
 from app.models.random_recommender import RandomRecommender
-from app.utils.database import fetch_products, fetch_product_by_id
+from app.models.diversity_reranker import DiversityReranker, factorize
+from app.models.minhash import shared_signatures
+from app.models.near_duplicates import NearDuplicateIndex
+from app.models.autocomplete_index import AutocompleteIndex
+from app.services.strategy_router import Scored, StrategyRouter, fallback_served, served_strategy
+from app.utils.catalog import CatalogStore, CatalogSnapshot
+from app.utils.database import query_executor
+from app.utils.data_sources import data_source
+from app.utils.jobs import JobScheduler, take_array
+from app.utils.product_cache import ProductCache
+from app.utils.serialization import ProductPage
+from app.utils.shared_cache import TieredCache, cache_key
+from app.utils.seen_filter import SeenStore, ExclusionSet
+from app.utils import request_budget, server_timing
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+strategy_seconds = registry.histogram(
+    "recommender_strategy_score_seconds",
+    "Strategy scoring plus diversity rerank time",
+    ("strategy", "mode")
+)
+
+
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Lee un entero opcional desde el entorno (vacío = None)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return int(value) if value.strip() else None
 
 
 class RecommenderService:
@@ -16,85 +51,820 @@ class RecommenderService:
             "random": RandomRecommender()
         }
         self.active_strategy = "random"
+        # Estrategia por usuario (STRATEGY_SPLIT) con presupuesto de latencia
+        self.router = StrategyRouter.from_env(default=self.active_strategy)
+        self.router.validate(self.strategies)
+
+        # Re-ranking por diversidad sobre un pool mayor que el límite pedido
+        self.reranker = DiversityReranker(
+            diversity_lambda=float(os.getenv("RERANK_DIVERSITY_LAMBDA", "0.7")),
+            max_per_supplier=_env_int("RERANK_MAX_PER_SUPPLIER", 3),
+            max_per_category=_env_int("RERANK_MAX_PER_CATEGORY")
+        )
+        self.candidate_pool_factor = _env_int("RERANK_POOL_FACTOR", 4) or 1
+
+        # Productos ya vistos por usuario (Bloom filters con rotación)
+        self.seen_store = SeenStore.from_env()
+
+        # Catálogo en memoria e índice de casi-duplicados derivado de él
+        self.catalog = CatalogStore.from_env()
+        self.duplicates = NearDuplicateIndex(
+            threshold=float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+        )
+        self.dedupe_enabled = os.getenv("DEDUPE_NEAR_DUPLICATES", "true").lower() == "true"
+        self.autocomplete_index = AutocompleteIndex(
+            fuzzy_threshold=float(os.getenv("AUTOCOMPLETE_FUZZY_THRESHOLD", "0.5"))
+        )
+        # Productos leídos desde Supabase (incluye IDs inexistentes)
+        self.product_cache = ProductCache.from_env()
+        # Resultados compartidos por todos los usuarios (L1 + L2 entre réplicas)
+        self.result_cache = TieredCache.from_env()
+        self.result_cache_ttl = float(os.getenv("SHARED_CACHE_TTL_SECONDS", "60"))
+        self.catalog.add_listener(self._on_catalog_refresh)
+
+        # Trabajo de fondo fuera de los requests; el CPU pesado va a otro proceso
+        self.jobs = JobScheduler.from_env(leases=self.result_cache.l2)
+        # Lotes de firmas MinHash desde este tamaño se calculan en el pool de procesos
+        self.offload_min_texts = int(os.getenv("JOB_OFFLOAD_MIN_TEXTS", "5000"))
+        self.trending_limits = [
+            int(limit) for limit in os.getenv("TRENDING_WARM_LIMITS", "10").split(",") if limit.strip()
+        ]
+        self.jobs.add("near_duplicates", self._sync_duplicates)
+        self.jobs.add("autocomplete", self._sync_autocomplete)
+        # Una réplica por versión de contenido recalcula las páginas en tendencia
+        # antes de que venzan en el caché compartido
+        self.jobs.add(
+            "trending", self._warm_trending,
+            interval=float(os.getenv("TRENDING_REFRESH_SECONDS", "45")),
+            single_instance=True,
+            scope=self.content_version
+        )
+
+    async def _on_catalog_refresh(
+        self,
+        previous: Optional[CatalogSnapshot],
+        snapshot: CatalogSnapshot
+    ):
+        """Actualiza los índices derivados del catálogo (como jobs, fuera del event loop)"""
+        self.product_cache.sync(snapshot)
+        if self.dedupe_enabled:
+            await self.jobs.run("near_duplicates", snapshot)
+        await self.jobs.run("autocomplete", snapshot)
+        # Corre con el snapshot ya publicado (el store lo publica al volver de los listeners)
+        self.jobs.trigger("trending")
+
+    def _signatures(self, texts: List[str]) -> np.ndarray:
+        """Firmas MinHash; los lotes grandes se calculan en el pool de procesos"""
+        hasher = self.duplicates.hasher
+        if len(texts) < self.offload_min_texts or self.jobs.pool is None:
+            return hasher.signatures(texts)
+        return take_array(self.jobs.call_in_process(shared_signatures, hasher, texts))
+
+    async def _sync_duplicates(self, snapshot: Optional[CatalogSnapshot] = None):
+        if snapshot is None:
+            snapshot = self.catalog.snapshot
+        if snapshot is not None:
+            await asyncio.to_thread(self.duplicates.sync, snapshot, self._signatures)
+
+    async def _sync_autocomplete(self, snapshot: Optional[CatalogSnapshot] = None):
+        if snapshot is None:
+            snapshot = self.catalog.snapshot
+        if snapshot is not None:
+            await asyncio.to_thread(self.autocomplete_index.sync, snapshot)
+
+    async def _warm_trending(self):
+        """Deja en el caché compartido las páginas en tendencia más pedidas (TRENDING_WARM_LIMITS)"""
+        snapshot = self.catalog.snapshot
+        if snapshot is None:
+            return
+        version = self.content_version()
+        for limit in self.trending_limits:
+            page, scored = await asyncio.to_thread(self._recommend_rows, snapshot, limit)
+            self._observe(scored)
+            data = page.to_bytes()
+            await self.result_cache.set(
+                cache_key("trending", version, limit=limit, fields=None, image_size="full"),
+                data,
+                self.result_cache_ttl
+            )
+
+    def start(self):
+        """Inicia las tareas de fondo del servicio"""
+        self.catalog.start()
+        self.jobs.start()
+
+    async def stop(self):
+        """Detiene las tareas de fondo del servicio"""
+        await self.catalog.stop()
+        await self.jobs.stop()
+        # Orígenes con conexiones propias (pool de asyncpg)
+        close = getattr(data_source, "close", None)
+        if close is not None:
+            await close()
         
     def get_available_strategies(self) -> List[str]:
         """Retorna las estrategias disponibles"""
         return list(self.strategies.keys())
     
     def get_active_strategy(self) -> str:
-        """Retorna la estrategia activa"""
+        """Retorna la estrategia activa (la de los requests sin usuario)"""
         return self.active_strategy
+
+    def strategy_for(self, user_id: Optional[str]) -> str:
+        """Estrategia asignada al usuario por el reparto de tráfico"""
+        return self.router.route(user_id)
+
+    def served_strategy(self, user_id: Optional[str]) -> str:
+        """
+        Estrategia que produjo la página del request en curso
+
+        Difiere de strategy_for cuando respondió el fallback; si el request
+        no puntuó (orden por precio), es la asignada.
+        """
+        return served_strategy.get() or self.strategy_for(user_id)
     
+    @property
+    def degraded(self) -> bool:
+        """
+        True mientras el circuito de Supabase no está cerrado
+
+        En ese estado las respuestas salen sólo del último snapshot bueno
+        (y de la cache de productos), sin esperar a la base de datos.
+        """
+        breaker = query_executor.breaker
+        return breaker is not None and not breaker.is_closed
+
+    def content_version(self) -> str:
+        """
+        Versión del contenido servido: huella del catálogo + asignación de modelos
+
+        Cambia cuando cambia el catálogo, la estrategia, el reparto de
+        tráfico o el modo degradado, e invalida los ETags de las respuestas
+        cacheables. Depende sólo del contenido (no de la generación local),
+        así las réplicas con el mismo catálogo comparten claves, ETags y el
+        lease de los jobs por versión.
+        """
+        snapshot = self.catalog.snapshot
+        content = snapshot.content_hash if snapshot is not None else "empty"
+        version = f"{content}:{self.router.version()}"
+        return version + ":degraded" if self.degraded else version
+
+    async def _cached_page(
+        self,
+        namespace: str,
+        compute: Callable[[], Awaitable[ProductPage]],
+        **params: Any
+    ) -> ProductPage:
+        """
+        Resultado desde el caché compartido, calculándolo una vez por clúster
+
+        La clave incluye content_version(), así un catálogo o modelo nuevo
+        nunca sirve páginas de la versión anterior. Una página de fallback
+        (la estrategia no alcanzó su presupuesto) se responde pero no se
+        guarda en ningún nivel: la próxima llamada recoge el resultado tardío.
+        """
+        key = cache_key(namespace, self.content_version(), **params)
+
+        async def encoded() -> bytes:
+            fallback_served.set(False)
+            return (await compute()).to_bytes()
+
+        data = await self.result_cache.get_or_compute(
+            key, self.result_cache_ttl, encoded,
+            cacheable=lambda: not fallback_served.get()
+        )
+        return ProductPage.from_bytes(data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado de los componentes en memoria y latencias de Supabase"""
+        snapshot = self.catalog.snapshot
+        return {
+            "data_source": data_source.name,
+            "catalog": {
+                "generation": snapshot.generation if snapshot is not None else None,
+                "content_hash": snapshot.content_hash if snapshot is not None else None,
+                "products": len(snapshot) if snapshot is not None else 0,
+                "age_seconds": round(snapshot.age_seconds, 1) if snapshot is not None else None
+            },
+            "seen": self.seen_store.stats(),
+            "near_duplicates": self.duplicates.stats(),
+            "autocomplete": self.autocomplete_index.stats(),
+            "product_cache": self.product_cache.stats(),
+            "result_cache": dict(self.result_cache.stats),
+            "database": query_executor.stats(),
+            "circuit": query_executor.breaker.stats() if query_executor.breaker else None,
+            "jobs": self.jobs.stats(),
+            "routing": self.router.stats()
+        }
+
+    def register_metrics(self):
+        """Expone en /metrics el estado que el servicio ya lleva (se lee al exportar)"""
+        def catalog(value: Callable[[CatalogSnapshot], float]) -> Callable[[], Optional[float]]:
+            return lambda: value(self.catalog.snapshot) if self.catalog.snapshot is not None else None
+
+        def cache_requests() -> Dict[Tuple[str, ...], float]:
+            product, result = self.product_cache.stats(), self.result_cache.stats
+            return {
+                ("product", "hit"): product["hits"],
+                ("product", "negative_hit"): product["negative_hits"],
+                ("product", "miss"): product["misses"],
+                ("result", "l1_hit"): result["l1_hits"],
+                ("result", "l2_hit"): result["l2_hits"],
+                ("result", "miss"): result["misses"]
+            }
+
+        def hit_ratios() -> Dict[Tuple[str, ...], Optional[float]]:
+            requests = cache_requests()
+            ratios = {}
+            for cache in ("product", "result"):
+                counts = {k[1]: v for k, v in requests.items() if k[0] == cache}
+                total = sum(counts.values())
+                ratios[(cache,)] = (total - counts["miss"]) / total if total else None
+            return ratios
+
+        registry.callback("recommender_catalog_products", "Products in the in-memory catalog",
+                          catalog(len))
+        registry.callback("recommender_catalog_generation", "Catalog snapshot generation",
+                          catalog(lambda s: s.generation))
+        registry.callback("recommender_catalog_age_seconds", "Age of the catalog snapshot",
+                          catalog(lambda s: s.age_seconds))
+        registry.callback("recommender_cache_requests_total", "Cache lookups by outcome",
+                          cache_requests, ("cache", "result"), kind="counter")
+        registry.callback("recommender_cache_hit_ratio", "Fraction of cache lookups that hit",
+                          hit_ratios, ("cache",))
+        registry.callback("recommender_degraded", "1 while the Supabase circuit is not closed",
+                          lambda: float(self.degraded))
+
     def set_strategy(self, strategy_name: str):
-        """Cambia la estrategia activa"""
+        """Cambia la estrategia activa para todos (descarta el reparto por usuario)"""
         if strategy_name not in self.strategies:
             raise ValueError(f"Strategy '{strategy_name}' not found")
         self.active_strategy = strategy_name
+        self.router.default = strategy_name
+        self.router.set_split({})
+
+    def _score(
+        self,
+        candidates: np.ndarray,
+        supplier_codes: np.ndarray,
+        category_codes: np.ndarray,
+        limit: int,
+        n_suppliers: Optional[int] = None,
+        n_categories: Optional[int] = None,
+        strategy: Optional[str] = None
+    ) -> Scored:
+        """
+        Puntúa con una estrategia y diversifica, sólo con IDs y códigos
+
+        No escribe métricas, así que se puede llamar desde un hilo; el
+        resultado se registra con _observe en el event loop.
+
+        Args:
+            candidates: Posiciones de los candidatos
+            supplier_codes: Código de proveedor indexado por posición
+            category_codes: Código de categoría indexado por posición
+            strategy: Nombre de la estrategia (por defecto la activa)
+
+        Returns:
+            Scored con las posiciones elegidas y sus scores en el orden final
+
+        Bajo carga (request_budget.cheap_mode) se omite el re-ranking y se
+        puntúa sólo `limit` candidatos.
+        """
+        request_budget.check()
+        name = strategy or self.active_strategy
+        model = self.strategies[name]
+        started = time.perf_counter()
+        if request_budget.cheap_mode():
+            rows, scores = model.score(candidates, limit=limit)
+            return Scored(rows, scores, name, "cheap", time.perf_counter() - started)
+        pool, scores = model.score(candidates, limit=limit * self.candidate_pool_factor)
+        picked = self.reranker.rerank_indices(
+            scores, supplier_codes[pool], category_codes[pool], limit,
+            n_suppliers=n_suppliers, n_categories=n_categories
+        )
+        return Scored(pool[picked], scores[picked], name, "full", time.perf_counter() - started)
+
+    def _observe(self, scored: Scored, request: bool = True):
+        """
+        Registra la latencia de una puntuación (sólo en el event loop)
+
+        Con request=False no se suma al Server-Timing: el request que la
+        pidió ya respondió (resultado tardío).
+        """
+        strategy_seconds.observe(scored.seconds, scored.strategy, scored.mode)
+        self.router.observe(scored.strategy, scored.seconds)
+        if request:
+            server_timing.add("score", scored.seconds)
+
+    def _observe_task(self, task: "asyncio.Future[Scored]"):
+        """Callback de una puntuación en hilo: la registra al terminar, a tiempo o tarde"""
+        if not task.cancelled() and task.exception() is None:
+            self._observe(task.result(), request=False)
+
+    async def _score_within_budget(
+        self,
+        strategy: str,
+        key: str,
+        snapshot: CatalogSnapshot,
+        rows: np.ndarray,
+        limit: int
+    ) -> Scored:
+        """
+        Puntúa las filas con `strategy` en un hilo, esperando a lo más su presupuesto
+
+        Si la estrategia no alcanza (o falla) responde la de fallback; el
+        cálculo sigue y su resultado queda guardado bajo `key` para la
+        próxima llamada. Un resultado guardado se sirve filtrado a las filas
+        candidatas de ahora (las exclusiones pudieron cambiar), siempre que
+        alcance para la página.
+
+        Returns:
+            Scored de la estrategia que produjo la página
+        """
+        router = self.router
+        late = router.take_late(key)
+        if late is not None:
+            keep = np.isin(late.rows, rows)
+            if np.count_nonzero(keep) >= min(limit, len(rows)):
+                router.record(strategy, "late_hit")
+                return late._replace(rows=late.rows[keep][:limit], scores=late.scores[keep][:limit])
+
+        def score(name: str) -> Scored:
+            return self._score(
+                rows, snapshot.supplier_codes, snapshot.category_codes, limit,
+                n_suppliers=len(snapshot.supplier_index),
+                n_categories=len(snapshot.category_index),
+                strategy=name
+            )
+
+        task = router.inflight.get(key)
+        if task is None:
+            task = router.inflight[key] = asyncio.ensure_future(asyncio.to_thread(score, strategy))
+            task.add_done_callback(lambda t: router.finish(key, t))
+            task.add_done_callback(self._observe_task)
+
+        # El deadline del request manda si vence antes que el presupuesto
+        budget = router.budget(strategy)
+        left = request_budget.remaining()
+        if left is not None:
+            budget = max(min(budget, left), 0.0)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), budget)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            router.want_late(key)
+        except request_budget.DeadlineExceeded:
+            raise
+        except Exception:
+            outcome = "error"
+            logger.exception("Strategy %s failed; serving %s", strategy, router.fallback)
+        else:
+            router.record(strategy, "ok")
+            server_timing.add("score", result.seconds)
+            return result
+
+        router.record(strategy, outcome)
+        fallback_served.set(True)
+        scored = score(router.fallback)
+        self._observe(scored)
+        return scored
+
+    async def _hydrate(
+        self,
+        product_ids: List[str],
+        scores: np.ndarray,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
+        """
+        Materializa la página final desde la cache o con una sola consulta por lotes
+
+        Con una proyección (fields / image_size) se piden sólo esas columnas
+        y el resultado no se guarda en la cache de productos completos.
+        """
+        if fields is None and image_size == "full":
+            found, missing = self.product_cache.get_many(product_ids)
+            if missing:
+                fetched = await data_source.fetch_products_by_ids(missing)
+                self.product_cache.put_many(fetched, missing=missing)
+                found.update(fetched)
+        else:
+            found = await data_source.fetch_products_by_ids(product_ids, fields=fields, image_size=image_size)
+
+        include_score = fields is None or "recommendation_score" in fields
+        products = []
+        for pid, score in zip(product_ids, scores.tolist()):
+            product = found.get(pid)
+            if product is not None:
+                products.append({**product, "recommendation_score": score} if include_score else product)
+        return ProductPage.from_products(products)
+
+    async def get_product(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca un producto por ID
+
+        Primero en el snapshot, luego en la cache (que recuerda también los
+        IDs inexistentes) y por último en Supabase.
+        """
+        snapshot = self.catalog.snapshot
+        if snapshot is not None:
+            product = snapshot.get(product_id)
+            if product is not None:
+                return product
+
+        cached, product = self.product_cache.get(product_id)
+        if cached:
+            return dict(product) if product is not None else None
+
+        product = await data_source.fetch_product_by_id(product_id)
+        self.product_cache.put(product_id, product)
+        return dict(product) if product is not None else None
+
+    async def _recommend(
+        self,
+        limit: int,
+        category: Optional[str] = None,
+        exclude: Optional[Container[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full",
+        user_id: Optional[str] = None
+    ) -> ProductPage:
+        """
+        Recomienda entre los productos con stock que cumplen los filtros
+
+        Con el snapshot en memoria, el filtrado, la puntuación y el
+        re-ranking trabajan sobre filas y sólo la página final se convierte
+        en dicts. Mientras el catálogo no está cargado se piden a Supabase
+        sólo las columnas de puntuación (con precio plano) y la página final
+        se hidrata en una consulta. El filtro por región necesita el
+        snapshot, así que espera la carga.
+
+        La estrategia sale del reparto por user_id. Con el snapshot, una
+        estrategia con presupuesto de latencia se espera a lo más ese
+        tiempo (ver _score_within_budget); sin snapshot se espera completa,
+        porque las posiciones de candidatos de Supabase no sirven para
+        guardar un resultado tardío.
+        """
+        strategy = self.router.route(user_id)
+        snapshot = self.catalog.snapshot
+        if snapshot is None and region:
+            snapshot = await self.catalog.get_snapshot()
+
+        if snapshot is None:
+            candidates = [
+                c for c in await data_source.fetch_candidates(category=category, min_stock=1, exclude_ids=exclude)
+                if (min_price is None or c["price"] >= min_price)
+                and (max_price is None or c["price"] <= max_price)
+            ]
+            if self.dedupe_enabled:
+                # Un solo candidato por cluster de publicaciones clonadas
+                candidates = self.duplicates.dedupe(candidates)
+            if not candidates:
+                return ProductPage([], [])
+            supplier_codes, n_suppliers = factorize([c["provider_id"] for c in candidates])
+            category_codes, n_categories = factorize([c["category"] for c in candidates])
+            scored = self._score(
+                np.arange(len(candidates)), supplier_codes, category_codes, limit,
+                n_suppliers=n_suppliers, n_categories=n_categories, strategy=strategy
+            )
+            self._observe(scored)
+            self.router.record(strategy, "ok")
+            served_strategy.set(strategy)
+            return await self._hydrate(
+                [candidates[i]["id"] for i in scored.rows.tolist()], scored.scores,
+                fields=fields, image_size=image_size
+            )
+
+        filters = {
+            "category": category,
+            "min_price": min_price,
+            "max_price": max_price,
+            "quantity": quantity,
+            "region": region,
+            "max_delivery_days": max_delivery_days
+        }
+        if self.router.budget(strategy) is None:
+            page, scored = self._recommend_rows(
+                snapshot, limit, exclude=exclude, fields=fields, image_size=image_size,
+                strategy=strategy, **filters
+            )
+            self._observe(scored)
+            self.router.record(strategy, "ok")
+            served_strategy.set(strategy)
+            return page
+
+        rows = self._candidate_rows(snapshot, exclude=exclude, **filters)
+        # Las exclusiones no entran en la clave: el resultado tardío se filtra al servirlo
+        key = cache_key("late", str(snapshot.generation), strategy=strategy, user_id=user_id,
+                        limit=limit, **filters)
+        scored = await self._score_within_budget(strategy, key, snapshot, rows, limit)
+        served_strategy.set(scored.strategy)
+        return snapshot.page(
+            scored.rows, quantity=quantity, region=region, scores=scored.scores,
+            fields=fields, image_size=image_size
+        )
+
+    def _candidate_rows(
+        self,
+        snapshot: CatalogSnapshot,
+        category: Optional[str] = None,
+        exclude: Optional[Container[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None
+    ) -> np.ndarray:
+        """Filas con stock que cumplen los filtros, una por cluster de clones"""
+        rows = snapshot.select(
+            category=category,
+            min_stock=1,  # Solo productos con stock
+            exclude=exclude,
+            min_price=min_price,
+            max_price=max_price,
+            quantity=quantity,
+            region=region,
+            max_delivery_days=max_delivery_days
+        )
+        if self.dedupe_enabled:
+            rows = self.duplicates.dedupe_rows(snapshot, rows)
+        return rows
+
+    def _recommend_rows(
+        self,
+        snapshot: CatalogSnapshot,
+        limit: int,
+        category: Optional[str] = None,
+        exclude: Optional[Container[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full",
+        strategy: Optional[str] = None
+    ) -> Tuple[ProductPage, Scored]:
+        """
+        Rama de _recommend sobre el snapshot: sin I/O, se puede llamar desde un hilo
+
+        Retorna también la puntuación, para registrarla en el event loop.
+        """
+        rows = self._candidate_rows(
+            snapshot,
+            category=category,
+            exclude=exclude,
+            min_price=min_price,
+            max_price=max_price,
+            quantity=quantity,
+            region=region,
+            max_delivery_days=max_delivery_days
+        )
+        scored = self._score(
+            rows, snapshot.supplier_codes, snapshot.category_codes, limit,
+            n_suppliers=len(snapshot.supplier_index),
+            n_categories=len(snapshot.category_index),
+            strategy=strategy
+        )
+
+        page = snapshot.page(
+            scored.rows, quantity=quantity, region=region, scores=scored.scores,
+            fields=fields, image_size=image_size
+        )
+        return page, scored
+
+    def _sorted_by_price(
+        self,
+        snapshot: CatalogSnapshot,
+        limit: int,
+        descending: bool,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full",
+        **filters: Any
+    ) -> ProductPage:
+        """Primeros `limit` productos por precio efectivo, uno por cluster de clones"""
+        rows = snapshot.select(
+            min_stock=1,
+            sort_by_price="desc" if descending else "asc",
+            **filters
+        )
+        picked = []
+        clusters = set()
+        for row in rows.tolist():
+            rep = self.duplicates.representative(snapshot.ids[row]) if self.dedupe_enabled else row
+            if rep in clusters:
+                continue
+            clusters.add(rep)
+            picked.append(row)
+            if len(picked) >= limit:
+                break
+        return snapshot.page(
+            np.array(picked, dtype=np.int64),
+            quantity=filters.get("quantity"),
+            region=filters.get("region"),
+            fields=fields,
+            image_size=image_size
+        )
+
+    def _exclusions(
+        self,
+        user_id: Optional[str],
+        exclude_ids: Optional[Container[str]],
+        exclude_seen: bool
+    ) -> ExclusionSet:
+        """Combina los IDs excluidos explícitamente con lo ya visto por el usuario"""
+        if isinstance(exclude_ids, (list, tuple)):
+            exclude_ids = set(exclude_ids)
+        seen = self.seen_store.get(user_id) if exclude_seen and user_id else None
+        return ExclusionSet(exclude_ids, seen)
+
+    def mark_seen(self, user_id: str, product_ids: Iterable[str]):
+        """Registra productos como vistos por el usuario"""
+        self.seen_store.mark_seen(user_id, product_ids)
+
+    def clear_seen(self, user_id: str):
+        """Olvida los productos vistos por el usuario"""
+        self.seen_store.clear(user_id)
     
     async def get_recommendations(
         self,
         user_id: Optional[str] = None,
         category: Optional[str] = None,
         limit: int = 6,
-        exclude_ids: List[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Obtiene recomendaciones generales desde Supabase"""
-        products = await fetch_products(
-            category=category, 
-            min_stock=1,  # Solo productos con stock
-            exclude_ids=exclude_ids
-        )
+        exclude_ids: Optional[Container[str]] = None,
+        exclude_seen: bool = False,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        quantity: Optional[int] = None,
+        sort_by: str = "relevance",
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
+        """
+        Obtiene recomendaciones generales del catálogo
+
+        Con exclude_seen=True (y user_id) se omiten los productos ya
+        mostrados a ese usuario y los nuevos quedan registrados como vistos.
+
+        Los filtros de precio usan el precio unitario efectivo para
+        `quantity` unidades según product_quantity_ranges (sin quantity,
+        el precio a la cantidad mínima de cada producto). sort_by
+        "price_asc" / "price_desc" ordena por ese precio en vez de puntuar.
+
+        Con region sólo se consideran productos que despachan a ella
+        (opcionalmente en max_delivery_days días o menos). Igual que el
+        filtro por región, el orden por precio necesita el snapshot (los
+        tramos por cantidad viven ahí), así que espera la carga en vez de
+        caer al orden por relevancia.
+
+        fields limita los campos de cada producto (id siempre va) y
+        image_size elige la miniatura retornada como image_url.
+        """
+        filters = {
+            "category": category,
+            "exclude": self._exclusions(user_id, exclude_ids, exclude_seen),
+            "min_price": min_price,
+            "max_price": max_price,
+            "quantity": quantity,
+            "region": region,
+            "max_delivery_days": max_delivery_days
+        }
+        output = {"fields": fields, "image_size": image_size}
         
-        strategy = self.strategies[self.active_strategy]
-        return strategy.recommend(products, limit=limit)
+        by_price = sort_by in ("price_asc", "price_desc")
+        snapshot = self.catalog.snapshot
+        if snapshot is None and (region or by_price):
+            snapshot = await self.catalog.get_snapshot()
+        if by_price:
+            recommendations = self._sorted_by_price(
+                snapshot, limit, descending=sort_by == "price_desc", **output, **filters
+            )
+        else:
+            recommendations = await self._recommend(limit, user_id=user_id, **output, **filters)
+        if exclude_seen and user_id:
+            self.mark_seen(user_id, recommendations.ids)
+        return recommendations
     
     async def get_similar_products(
         self,
         product_id: str,
-        limit: int = 6
-    ) -> List[Dict[str, Any]]:
-        """Obtiene productos similares desde Supabase"""
-        # Buscar el producto base
-        base_product = await fetch_product_by_id(product_id)
-        
-        if not base_product:
-            raise ValueError(f"Product {product_id} not found")
-        
-        # Obtener productos de la misma categoría
-        similar_products = await fetch_products(
-            category=base_product["category"],
-            min_stock=1,
-            exclude_ids=[product_id]
+        limit: int = 6,
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
+        """Obtiene productos similares (misma categoría, opcionalmente por región)"""
+        async def compute() -> ProductPage:
+            # Buscar el producto base
+            base_product = await self.get_product(product_id)
+            
+            if not base_product:
+                raise ValueError(f"Product {product_id} not found")
+            
+            # Productos de la misma categoría (sin clones del producto base)
+            return await self._recommend(
+                limit,
+                category=base_product["category"],
+                exclude=set(self.duplicates.members(product_id)),
+                region=region,
+                max_delivery_days=max_delivery_days,
+                fields=fields,
+                image_size=image_size
+            )
+
+        return await self._cached_page(
+            "similar", compute,
+            product_id=product_id, limit=limit, region=region,
+            max_delivery_days=max_delivery_days, fields=fields, image_size=image_size
         )
-        
-        strategy = self.strategies[self.active_strategy]
-        return strategy.recommend(similar_products, limit=limit)
     
     async def get_personalized_recommendations(
         self,
         user_id: str,
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
-        """Obtiene recomendaciones personalizadas"""
+        limit: int = 10,
+        exclude_seen: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
+        """
+        Obtiene recomendaciones personalizadas
+
+        Sin exclude_seen la lista de cada usuario se reutiliza desde el
+        caché compartido; con exclude_seen cambia en cada llamada.
+        """
         # MVP: Por ahora retorna productos aleatorios desde Supabase
         # TODO: Implementar basado en historial del usuario
-        products = await fetch_products(min_stock=1)
-        
-        strategy = self.strategies[self.active_strategy]
-        return strategy.recommend(products, limit=limit)
+        async def compute() -> ProductPage:
+            return await self._recommend(
+                limit,
+                exclude=self._exclusions(user_id, None, exclude_seen),
+                fields=fields,
+                image_size=image_size,
+                user_id=user_id
+            )
+
+        if not exclude_seen:
+            return await self._cached_page(
+                "personalized", compute,
+                user_id=user_id, limit=limit, fields=fields, image_size=image_size
+            )
+
+        recommendations = await compute()
+        self.mark_seen(user_id, recommendations.ids)
+        return recommendations
     
     async def get_trending_products(
         self,
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
+        limit: int = 10,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
         """Obtiene productos en tendencia"""
         # MVP: Por ahora retorna productos aleatorios desde Supabase
         # TODO: Implementar basado en métricas reales
-        products = await fetch_products(min_stock=1)
-        
-        strategy = self.strategies[self.active_strategy]
-        return strategy.recommend(products, limit=limit)
+        return await self._cached_page(
+            "trending",
+            lambda: self._recommend(limit, fields=fields, image_size=image_size),
+            limit=limit, fields=fields, image_size=image_size
+        )
+    
+    def autocomplete(
+        self,
+        query: str,
+        limit: int = 8,
+        fuzzy: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Sugerencias de productos para búsqueda mientras se escribe"""
+        snapshot = self.catalog.snapshot
+        if snapshot is None:
+            return []
+
+        suggestions = []
+        for match in self.autocomplete_index.complete(query, limit=limit, fuzzy=fuzzy):
+            row = snapshot.id_to_row.get(match["id"])
+            if row is None:
+                continue
+            suggestions.append({
+                "id": match["id"],
+                "name": snapshot.names[row],
+                "category": snapshot.categories[row],
+                "price": float(snapshot.price[row]),
+                "image_url": snapshot.image_urls[row],
+                "score": round(match["score"], 3),
+                "match": match["match"]
+            })
+        return suggestions
 
 
 # Singleton instance
 recommender_service = RecommenderService()
+recommender_service.register_metrics()
@@ -0,0 +1,208 @@
+"""
+Strategy Router
+Elige la estrategia de cada request y la acota a su presupuesto de latencia
+
+El tráfico se reparte por hash del usuario (STRATEGY_SPLIT): el mismo
+usuario cae siempre en la misma estrategia, en todas las réplicas. Los
+requests sin usuario usan la estrategia por defecto.
+
+Una estrategia con presupuesto (STRATEGY_BUDGET_MS) se espera a lo más ese
+tiempo; si no alcanza, el request recibe la estrategia de fallback y el
+resultado que llega tarde queda guardado para la próxima llamada igual.
+"""
+import asyncio
+import os
+from bisect import bisect_right
+from collections import OrderedDict
+from contextvars import ContextVar
+from hashlib import blake2b
+from itertools import accumulate
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from app.utils.metrics import registry
+from app.utils.query_executor import LatencyWindow
+
+strategy_requests = registry.counter(
+    "recommender_strategy_requests_total",
+    "Routed strategy calls by outcome (ok, timeout, error, late_hit)",
+    ("strategy", "outcome")
+)
+
+# True si el request en curso recibió la estrategia de fallback: esa página
+# no debe quedar en el caché de resultados en lugar de la tardía
+fallback_served: ContextVar[bool] = ContextVar("strategy_fallback_served", default=False)
+# Estrategia que produjo la última página puntuada en el request en curso
+served_strategy: ContextVar[Optional[str]] = ContextVar("strategy_served", default=None)
+
+
+class Scored(NamedTuple):
+    """
+    Resultado de una puntuación y lo que tardó
+
+    Se calcula también en hilos, así que no escribe métricas: quien lo
+    recibe en el event loop lo registra.
+    """
+    rows: np.ndarray
+    scores: np.ndarray
+    strategy: str
+    mode: str           # "full" o "cheap" (sin re-ranking)
+    seconds: float
+
+# Resultados que sirvió otra estrategia en lugar de la elegida
+FALLBACK_OUTCOMES = ("timeout", "error")
+OUTCOMES = ("ok", "late_hit") + FALLBACK_OUTCOMES
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """'a=90,b=10' -> {"a": 90.0, "b": 10.0}"""
+    weights = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, _, value = part.partition("=")
+            weights[name.strip()] = float(value)
+    return weights
+
+
+class StrategyRouter:
+    """
+    Asignación de estrategias por usuario y resultados tardíos
+
+    El router no puntúa: RecommenderService le pide la estrategia de cada
+    request (route), su presupuesto (budget) y le reporta el resultado
+    (record / observe).
+    """
+
+    def __init__(
+        self,
+        default: str,
+        split: Optional[Dict[str, float]] = None,
+        budgets_ms: Optional[Dict[str, float]] = None,
+        fallback: str = "random",
+        late_cache_size: int = 10_000
+    ):
+        """
+        Args:
+            default: Estrategia de los requests sin usuario (o sin split)
+            split: {estrategia: peso} del reparto por usuario (vacío = todos a default)
+            budgets_ms: {estrategia: ms} de espera máxima (sin entrada = sin límite)
+            fallback: Estrategia barata que responde cuando otra no alcanza
+            late_cache_size: Resultados tardíos guardados (LRU)
+        """
+        self.default = default
+        self.budgets_ms = dict(budgets_ms or {})
+        self.fallback = fallback
+        self.late_cache_size = late_cache_size
+        self.set_split(split or {})
+
+        self._late: "OrderedDict[str, Scored]" = OrderedDict()
+        # Cálculos en curso por clave, para no lanzar uno nuevo por cada reintento
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self._wanted: set = set()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._latency: Dict[str, LatencyWindow] = {}
+
+    def set_split(self, split: Dict[str, float]):
+        """Reemplaza el reparto de tráfico"""
+        split = {name: weight for name, weight in split.items() if weight > 0}
+        self.split = split
+        self._names = list(split)
+        self._cumulative = list(accumulate(split.values()))
+
+    def validate(self, strategies: Iterable[str]):
+        """
+        Raises:
+            ValueError: Si la configuración nombra una estrategia que no existe
+        """
+        known = set(strategies)
+        for name in [self.default, self.fallback, *self.split, *self.budgets_ms]:
+            if name not in known:
+                raise ValueError(f"Strategy '{name}' not found")
+
+    def route(self, user_id: Optional[str]) -> str:
+        """Estrategia asignada al usuario (estable mientras no cambie el split)"""
+        if user_id is None or not self.split:
+            return self.default
+        digest = blake2b(user_id.encode(), digest_size=8).digest()
+        point = int.from_bytes(digest, "big") / 2 ** 64 * self._cumulative[-1]
+        return self._names[min(bisect_right(self._cumulative, point), len(self._names) - 1)]
+
+    def budget(self, strategy: str) -> Optional[float]:
+        """Segundos de espera máxima de la estrategia (None = sin límite)"""
+        budget = self.budgets_ms.get(strategy)
+        return budget / 1000 if budget is not None else None
+
+    def version(self) -> str:
+        """Parte de content_version: cambia cuando cambia la asignación"""
+        if not self.split:
+            return self.default
+        split = ",".join(f"{name}={weight:g}" for name, weight in self.split.items())
+        return f"{self.default}+{blake2b(split.encode(), digest_size=4).hexdigest()}"
+
+    def take_late(self, key: str) -> Optional[Scored]:
+        """Resultado tardío guardado para la clave (se consume al leerlo)"""
+        return self._late.pop(key, None)
+
+    def want_late(self, key: str):
+        """El request de `key` no esperó: guardar el resultado cuando llegue"""
+        self._wanted.add(key)
+
+    def finish(self, key: str, future: asyncio.Future):
+        """Callback de fin de un cálculo en curso (corre en el event loop)"""
+        self.inflight.pop(key, None)
+        wanted = key in self._wanted
+        self._wanted.discard(key)
+        if not wanted or future.cancelled() or future.exception() is not None:
+            return
+        self._late[key] = future.result()
+        self._late.move_to_end(key)
+        while len(self._late) > self.late_cache_size:
+            self._late.popitem(last=False)
+
+    def record(self, strategy: str, outcome: str):
+        counts = self._counts.setdefault(strategy, dict.fromkeys(OUTCOMES, 0))
+        counts[outcome] += 1
+        strategy_requests.inc(strategy, outcome)
+
+    def observe(self, strategy: str, seconds: float):
+        """Latencia real de una puntuación (también las que llegaron tarde; sólo desde el event loop)"""
+        window = self._latency.get(strategy)
+        if window is None:
+            window = self._latency.setdefault(strategy, LatencyWindow())
+        window.add(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        strategies = {}
+        for name in sorted(set(self._counts) | set(self._latency)):
+            counts = self._counts.get(name, dict.fromkeys(OUTCOMES, 0))
+            total = sum(counts.values())
+            window = self._latency.get(name)
+            strategies[name] = {
+                **counts,
+                "requests": total,
+                "timeout_rate": counts["timeout"] / total if total else None,
+                "fallback_rate": sum(counts[o] for o in FALLBACK_OUTCOMES) / total if total else None,
+                "budget_ms": self.budgets_ms.get(name),
+                "p50_ms": round(window.quantile(0.5) * 1000, 2) if window and window.samples else None,
+                "p95_ms": round(window.quantile(0.95) * 1000, 2) if window and window.samples else None
+            }
+        return {
+            "default": self.default,
+            "split": self.split,
+            "fallback": self.fallback,
+            "late_results": len(self._late),
+            "inflight": len(self.inflight),
+            "strategies": strategies
+        }
+
+    @classmethod
+    def from_env(cls, default: str) -> "StrategyRouter":
+        """Crea el router con la configuración del entorno"""
+        return cls(
+            default=default,
+            split=_parse_weights(os.getenv("STRATEGY_SPLIT", "")),
+            budgets_ms=_parse_weights(os.getenv("STRATEGY_BUDGET_MS", "")),
+            fallback=os.getenv("STRATEGY_FALLBACK", "random"),
+            late_cache_size=int(os.getenv("STRATEGY_LATE_CACHE_SIZE", "10000"))
+        )
@@ -0,0 +1,596 @@
+"""
+Catalog Snapshot
+Copia en memoria del catálogo activo, refrescada periódicamente en segundo plano
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections.abc import Set as AbstractSet
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Container, Iterable, Union, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from app.utils import server_timing
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.database import fetch_catalog, select_image
+from app.utils.data_sources import data_source
+from app.utils.seen_filter import ExclusionSet, key_hashes
+from app.utils.serialization import ProductPage, dumps, with_fields
+
+logger = logging.getLogger(__name__)
+
+# Proyecciones (fields, image_size) con fragmentos cacheados por snapshot
+_MAX_PROJECTIONS = 32
+# Tramos de cantidad con precios efectivos cacheados por snapshot (un float64 por producto cada uno)
+_MAX_PRICE_BRACKETS = 16
+
+# Filas por bloque al calcular la huella del contenido
+_DIGEST_CHUNK = 65536
+# Filas por bloque al consultar los filtros de vistos (acota la memoria temporal)
+_PROBE_CHUNK = 1024
+
+# Listener que recibe (snapshot anterior, snapshot nuevo) tras cada refresco
+CatalogListener = Callable[[Optional["CatalogSnapshot"], "CatalogSnapshot"], Any]
+
+
+def _factorize(values: List[str]) -> "tuple[np.ndarray, Dict[str, int]]":
+    """Códigos enteros densos para una columna de texto"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(value, len(index)) for value in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return codes, index
+
+
+def _split_exclude(exclude: Container[str]) -> "tuple[List[Iterable[str]], List[Container[str]]]":
+    """
+    Separa la exclusión en IDs enumerables y contenedores que sólo responden `in`
+
+    Los primeros se traducen a filas de una vez; los otros (Bloom filters) se
+    consultan por candidato.
+    """
+    sources = exclude.sources if isinstance(exclude, ExclusionSet) else [exclude]
+    explicit: List[Iterable[str]] = []
+    probes: List[Container[str]] = []
+    for source in sources:
+        if isinstance(source, (AbstractSet, list, tuple, dict)):
+            explicit.append(source)
+        else:
+            probes.append(source)
+    return explicit, probes
+
+
+def normalize_region(region: str) -> str:
+    """Las regiones se comparan sin mayúsculas ni espacios sobrantes"""
+    return region.strip().lower()
+
+
+class RegionColumn:
+    """Productos que despachan a una región, ordenados por fila"""
+
+    def __init__(self, rows: np.ndarray, shipping_price: np.ndarray, delivery_days: np.ndarray):
+        order = np.argsort(rows, kind="stable")
+        self.rows = rows[order]
+        self.shipping_price = shipping_price[order]
+        self.delivery_days = delivery_days[order]
+
+    def rows_within(self, max_delivery_days: Optional[int] = None) -> np.ndarray:
+        if max_delivery_days is None:
+            return self.rows
+        return self.rows[self.delivery_days <= max_delivery_days]
+
+    def lookup(self, rows: np.ndarray) -> "tuple[List[Optional[float]], List[Optional[int]]]":
+        """(precios de despacho, días) por fila; None donde la fila no despacha a la región"""
+        if not len(self.rows):
+            return [None] * len(rows), [None] * len(rows)
+        pos = np.minimum(np.searchsorted(self.rows, rows), len(self.rows) - 1)
+        hit = (self.rows[pos] == rows).tolist()
+        shipping = self.shipping_price[pos].tolist()
+        days = self.delivery_days[pos].tolist()
+        return (
+            [price if ok else None for price, ok in zip(shipping, hit)],
+            [delivery if ok else None for delivery, ok in zip(days, hit)]
+        )
+
+
+class CatalogSnapshot:
+    """
+    Catálogo columnar e inmutable
+
+    Cada producto ocupa una fila; las columnas numéricas son arrays de NumPy
+    y las de texto listas de Python. Un snapshot nunca se modifica: cada
+    refresco crea uno nuevo con generation + 1.
+
+    generation es un contador del proceso; content_hash es una huella de lo
+    que se sirve (filas, precios, stock, textos, tramos y despachos), igual
+    en todas las réplicas que cargaron el mismo catálogo. Las claves y ETags
+    compartidos entre réplicas usan content_hash.
+
+    Los precios por tramo (product_quantity_ranges) se guardan aplanados:
+    los tramos de la fila r son tier_*[tier_offsets[r]:tier_offsets[r + 1]],
+    ordenados por min_quantity. Un producto sin tramos tiene uno implícito
+    desde su min_quantity con el precio plano.
+
+    product_delivery_regions se indexa al revés: región -> columnas de
+    (fila, precio de despacho, días), para filtrar por región con una
+    intersección de arrays.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]], generation: int = 0):
+        self.generation = generation
+        self.loaded_at = time.time()
+
+        self.ids: List[str] = [p["id"] for p in products]
+        self.id_to_row: Dict[str, int] = {pid: row for row, pid in enumerate(self.ids)}
+        self.names: List[str] = [p.get("name", "") for p in products]
+        self.categories: List[str] = [p.get("category") or "Sin categoría" for p in products]
+        self.image_urls: List[str] = [p.get("image_url", "") for p in products]
+        self.thumbnail_urls: List[Optional[str]] = [p.get("thumbnail_url") for p in products]
+        self.thumbnails: List[Dict[str, str]] = [p.get("thumbnails") or {} for p in products]
+        self.provider_ids: List[str] = [p.get("provider_id") or "" for p in products]
+        self.provider_names: List[str] = [p.get("provider_name", "Desconocido") for p in products]
+        self.descriptions: List[str] = [p.get("description", "") for p in products]
+        self.spec_names: List[str] = [p.get("spec_name", "") for p in products]
+        self.spec_values: List[str] = [p.get("spec_value", "") for p in products]
+
+        n = len(products)
+        self.price = np.fromiter((p.get("price", 0.0) for p in products), dtype=np.float64, count=n)
+        self.stock = np.fromiter((p.get("stock") or 0 for p in products), dtype=np.int64, count=n)
+        self.active = np.fromiter((bool(p.get("active", True)) for p in products), dtype=bool, count=n)
+        self.sales = np.fromiter((p.get("sales") or 0 for p in products), dtype=np.int64, count=n)
+        self.min_quantity = np.fromiter((p.get("min_quantity") or 1 for p in products), dtype=np.int64, count=n)
+
+        self.category_codes, self.category_index = _factorize(self.categories)
+        self.supplier_codes, self.supplier_index = _factorize(self.provider_ids)
+
+        tiers = [
+            p.get("price_tiers") or [{"min_quantity": p.get("min_quantity") or 1, "price": p.get("price", 0.0)}]
+            for p in products
+        ]
+        self.tier_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(t) for t in tiers), dtype=np.int64, count=n), out=self.tier_offsets[1:])
+        total = int(self.tier_offsets[-1])
+        self.tier_min_quantity = np.fromiter(
+            (tier["min_quantity"] for product_tiers in tiers for tier in product_tiers),
+            dtype=np.int64,
+            count=total
+        )
+        self.tier_price = np.fromiter(
+            (tier["price"] for product_tiers in tiers for tier in product_tiers),
+            dtype=np.float64,
+            count=total
+        )
+        self._tier_rows = np.repeat(np.arange(n), np.diff(self.tier_offsets))
+        # Cantidades donde cambia algún precio: entre dos seguidas los precios son iguales
+        self._tier_breaks = np.unique(self.tier_min_quantity)
+        self._price_cache: Dict[int, np.ndarray] = {}
+
+        if n:
+            self.min_unit_price = np.minimum.reduceat(self.tier_price, self.tier_offsets[:-1])
+        else:
+            self.min_unit_price = np.empty(0)
+        self.price_at_min_quantity = self.effective_price(self.min_quantity)
+
+        by_region: Dict[str, List[tuple]] = {}
+        for row, p in enumerate(products):
+            for delivery in p.get("delivery_regions") or ():
+                by_region.setdefault(normalize_region(delivery["region"]), []).append(
+                    (row, delivery["price"], delivery["delivery_days"])
+                )
+        self.regions: Dict[str, RegionColumn] = {
+            region: RegionColumn(
+                np.fromiter((e[0] for e in entries), dtype=np.int64, count=len(entries)),
+                np.fromiter((e[1] for e in entries), dtype=np.float64, count=len(entries)),
+                np.fromiter((e[2] for e in entries), dtype=np.int64, count=len(entries))
+            )
+            for region, entries in by_region.items()
+        }
+
+        self.content_hash = self._digest()
+        # (h1, h2) de cada ID para consultar los Bloom filters de vistos con NumPy
+        self.id_hashes = key_hashes(self.ids)
+
+        # JSON de cada fila por proyección, codificado la primera vez que se sirve
+        self._fragments: Dict[Tuple[Optional[Tuple[str, ...]], str], List[Optional[bytes]]] = {}
+
+    def _digest(self) -> str:
+        """Huella del contenido: blake2b sobre las columnas, por bloques"""
+        digest = hashlib.blake2b(digest_size=8)
+        texts = (
+            self.ids, self.names, self.categories, self.image_urls, self.thumbnail_urls,
+            self.thumbnails, self.provider_ids, self.provider_names, self.descriptions,
+            self.spec_names, self.spec_values
+        )
+        for column in texts:
+            for start in range(0, len(column), _DIGEST_CHUNK):
+                digest.update(orjson.dumps(column[start:start + _DIGEST_CHUNK], option=orjson.OPT_SORT_KEYS))
+        arrays = (
+            self.price, self.stock, self.active, self.sales, self.min_quantity,
+            self.tier_offsets, self.tier_min_quantity, self.tier_price
+        )
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).data)
+        for region in sorted(self.regions):
+            column = self.regions[region]
+            digest.update(region.encode())
+            for array in (column.rows, column.shipping_price, column.delivery_days):
+                digest.update(np.ascontiguousarray(array).data)
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.loaded_at
+
+    def product(
+        self,
+        row: int,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> Dict[str, Any]:
+        """
+        Materializa una fila con el mismo formato que fetch_products
+
+        Args:
+            row: Fila del snapshot
+            fields: Sólo estos campos, además de id (None = todos)
+            image_size: Variante de imagen retornada como image_url
+        """
+        product = {
+            "id": self.ids[row],
+            "name": self.names[row],
+            "category": self.categories[row],
+            "price": float(self.price[row]),
+            "stock": int(self.stock[row]),
+            "image_url": select_image(
+                self.image_urls[row], self.thumbnail_urls[row], self.thumbnails[row], image_size
+            ),
+            "active": bool(self.active[row]),
+            "provider_id": self.provider_ids[row],
+            "provider_name": self.provider_names[row]
+        }
+        if fields is not None:
+            product = {key: value for key, value in product.items() if key == "id" or key in fields}
+        return product
+
+    def effective_price(self, quantity: Union[int, np.ndarray]) -> np.ndarray:
+        """
+        Precio unitario de cada producto al comprar `quantity` unidades
+
+        Toma el último tramo con min_quantity <= quantity; por debajo del
+        primer tramo se usa el precio del primero. Vectorizado sobre todos
+        los tramos, sin recorrer productos en Python.
+
+        Los precios de una cantidad única se cachean por tramo (cuántos
+        min_quantity distintos del catálogo alcanza), no por la cantidad
+        pedida, y sólo para los primeros _MAX_PRICE_BRACKETS tramos.
+
+        Args:
+            quantity: Cantidad única o array con una cantidad por fila
+        """
+        scalar = np.isscalar(quantity)
+        if scalar:
+            bracket = int(np.searchsorted(self._tier_breaks, quantity, side="right"))
+            cached = self._price_cache.get(bracket)
+            if cached is not None:
+                return cached
+
+        n = len(self)
+        if n == 0:
+            return np.empty(0)
+
+        per_tier = quantity if scalar else np.asarray(quantity)[self._tier_rows]
+        starts = self.tier_offsets[:-1]
+        position = np.arange(len(self.tier_price))
+        applicable = np.where(self.tier_min_quantity <= per_tier, position, -1)
+        last = np.maximum.reduceat(applicable, starts)
+        prices = self.tier_price[np.maximum(last, starts)]
+
+        if scalar and len(self._price_cache) < _MAX_PRICE_BRACKETS:
+            self._price_cache.setdefault(bracket, prices)
+        return prices
+
+    def tiers(self, row: int) -> List[Dict[str, Any]]:
+        """Tramos de precio de una fila"""
+        lo, hi = self.tier_offsets[row], self.tier_offsets[row + 1]
+        return [
+            {"min_quantity": int(q), "price": float(p)}
+            for q, p in zip(self.tier_min_quantity[lo:hi], self.tier_price[lo:hi])
+        ]
+
+    def select(
+        self,
+        category: Optional[str] = None,
+        min_stock: int = 0,
+        exclude: Optional[Container[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        quantity: Optional[int] = None,
+        sort_by_price: Optional[str] = None,
+        region: Optional[str] = None,
+        max_delivery_days: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Filas que cumplen los filtros, con máscaras de NumPy
+
+        Args:
+            category: Filtrar por categoría
+            min_stock: Stock mínimo requerido
+            exclude: IDs a excluir (set, Bloom filter o cualquier contenedor)
+            min_price: Precio unitario efectivo mínimo
+            max_price: Precio unitario efectivo máximo
+            quantity: Cantidad para el precio efectivo (None = min_quantity de cada producto)
+            sort_by_price: "asc" o "desc" para ordenar por precio efectivo
+            region: Sólo productos que despachan a esta región
+            max_delivery_days: Plazo máximo de despacho a `region`
+
+        Returns:
+            Array de filas
+        """
+        mask = self.active.copy()
+        if min_stock > 0:
+            mask &= self.stock >= min_stock
+        if category:
+            code = self.category_index.get(category)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.category_codes == code
+        if region:
+            column = self.regions.get(normalize_region(region))
+            if column is None:
+                return np.empty(0, dtype=np.int64)
+            in_region = np.zeros(len(self), dtype=bool)
+            in_region[column.rows_within(max_delivery_days)] = True
+            mask &= in_region
+
+        prices = None
+        if min_price is not None or max_price is not None or sort_by_price:
+            prices = self.price_at_min_quantity if quantity is None else self.effective_price(quantity)
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+
+        if exclude:
+            explicit, probes = _split_exclude(exclude)
+            id_to_row = self.id_to_row
+            for source in explicit:
+                excluded = np.fromiter((id_to_row.get(pid, -1) for pid in source), dtype=np.int64, count=len(source))
+                mask[excluded[excluded >= 0]] = False
+            if probes:
+                self._exclude_probed(mask, probes)
+
+        rows = np.flatnonzero(mask)
+        if sort_by_price:
+            order = np.argsort(prices[rows], kind="stable")
+            rows = rows[order[::-1]] if sort_by_price == "desc" else rows[order]
+        return rows
+
+    def _exclude_probed(self, mask: np.ndarray, probes: List[Container[str]]):
+        """
+        Quita de mask las filas que están en los filtros de vistos
+
+        Sólo se consultan las filas que sobrevivieron a las otras máscaras,
+        por bloques, con los hashes precalculados del snapshot; un contenedor
+        sin contains_hashed se consulta por ID.
+        """
+        h1, h2 = self.id_hashes
+        ids = self.ids
+        candidates = np.flatnonzero(mask)
+        for start in range(0, len(candidates), _PROBE_CHUNK):
+            rows = candidates[start:start + _PROBE_CHUNK]
+            for probe in probes:
+                contains_hashed = getattr(probe, "contains_hashed", None)
+                if contains_hashed is not None:
+                    found = contains_hashed(h1[rows], h2[rows])
+                else:
+                    found = np.fromiter((ids[row] in probe for row in rows.tolist()), dtype=bool, count=len(rows))
+                mask[rows[found]] = False
+
+    def _extras(
+        self,
+        rows: np.ndarray,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Campos que dependen de la consulta: precio efectivo y despacho a la región"""
+        extras: List[Dict[str, Any]] = [{} for _ in range(len(rows))]
+        if quantity is not None:
+            prices = self.effective_price(quantity)[rows]
+            for extra, price in zip(extras, prices.tolist()):
+                extra["effective_price"] = price
+        column = self.regions.get(normalize_region(region)) if region else None
+        if column is not None and len(rows):
+            shipping, days = column.lookup(rows)
+            for extra, price, delivery_days in zip(extras, shipping, days):
+                extra["shipping_price"] = price
+                extra["delivery_days"] = delivery_days
+        return extras
+
+    def products(
+        self,
+        rows: np.ndarray,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Materializa varias filas
+
+        Con quantity agrega el precio efectivo; con region, el precio y los
+        días de despacho (None en las filas que no despachan a esa región).
+        """
+        extras = self._extras(rows, quantity, region)
+        return [{**self.product(row), **extra} for row, extra in zip(rows.tolist(), extras)]
+
+    def fragment(
+        self,
+        row: int,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> bytes:
+        """JSON de una fila (mismo contenido que product), codificado una vez por snapshot"""
+        key = (tuple(fields) if fields is not None else None, image_size)
+        fragments = self._fragments.get(key)
+        if fragments is None:
+            if len(self._fragments) >= _MAX_PROJECTIONS:
+                return dumps(self.product(row, fields, image_size))
+            fragments = self._fragments.setdefault(key, [None] * len(self))
+        fragment = fragments[row]
+        if fragment is None:
+            fragment = fragments[row] = dumps(self.product(row, fields, image_size))
+        return fragment
+
+    def page(
+        self,
+        rows: np.ndarray,
+        quantity: Optional[int] = None,
+        region: Optional[str] = None,
+        scores: Optional[np.ndarray] = None,
+        score_key: str = "recommendation_score",
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> ProductPage:
+        """
+        Igual que products, pero ya codificado: cada producto es su fragmento
+        JSON más los campos propios de la consulta
+
+        Con fields, tanto las columnas como los campos de la consulta
+        (precio efectivo, despacho, score) se limitan a los pedidos.
+        """
+        with server_timing.stage("transform"):
+            extras = self._extras(rows, quantity, region)
+            if scores is not None:
+                for extra, score in zip(extras, scores.tolist()):
+                    extra[score_key] = score
+            if fields is not None:
+                extras = [{k: v for k, v in extra.items() if k in fields} for extra in extras]
+            row_list = rows.tolist()
+            return ProductPage(
+                [self.ids[row] for row in row_list],
+                [
+                    with_fields(self.fragment(row, fields, image_size), extra)
+                    for row, extra in zip(row_list, extras)
+                ]
+            )
+
+    def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna un producto por ID, o None si no está en el snapshot"""
+        row = self.id_to_row.get(product_id)
+        return self.product(row) if row is not None else None
+
+    def text(self, row: int) -> str:
+        """Texto usado para comparar productos (nombre, descripción y specs)"""
+        return " ".join((
+            self.names[row],
+            self.descriptions[row],
+            self.spec_names[row],
+            self.spec_values[row]
+        ))
+
+
+class CatalogStore:
+    """
+    Mantiene el snapshot vigente y lo refresca en segundo plano
+
+    Los componentes que derivan índices del catálogo se registran con
+    add_listener y se recalculan después de cada refresco exitoso.
+
+    Si un refresco falla se conserva el snapshot anterior (el último bueno)
+    y se reintenta cada retry_seconds; con el circuito de Supabase abierto
+    ese reintento es la llamada de prueba que lo vuelve a cerrar.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[Dict[str, Any]]]] = fetch_catalog,
+        refresh_seconds: float = 300.0,
+        retry_seconds: float = 30.0
+    ):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._listeners: List[CatalogListener] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: CatalogListener):
+        """Registra un callback (sync o async) para cada snapshot nuevo"""
+        self._listeners.append(listener)
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Carga un snapshot nuevo y notifica a los listeners"""
+        async with self._lock:
+            return await self._load()
+
+    async def _load(self) -> CatalogSnapshot:
+        products = await self.loader()
+        previous = self.snapshot
+        generation = previous.generation + 1 if previous else 1
+        snapshot = CatalogSnapshot(products, generation=generation)
+
+        for listener in self._listeners:
+            result = listener(previous, snapshot)
+            if asyncio.iscoroutine(result):
+                await result
+
+        # Se publica después de los listeners para que los índices
+        # derivados nunca queden atrás del snapshot visible
+        self.snapshot = snapshot
+        logger.info("Catalog generation %s loaded (%s products, content %s)",
+                    generation, len(snapshot), snapshot.content_hash)
+        return snapshot
+
+    async def get_snapshot(self) -> CatalogSnapshot:
+        """Retorna el snapshot vigente, esperando la primera carga si hace falta"""
+        if self.snapshot is None:
+            async with self._lock:
+                if self.snapshot is None:
+                    return await self._load()
+        return self.snapshot
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self.refresh_seconds
+            try:
+                await self.refresh()
+            except CircuitOpenError as e:
+                logger.warning("Catalog refresh skipped (%s); keeping generation %s",
+                               e, self.snapshot.generation if self.snapshot else None)
+                delay = min(delay, max(e.retry_after, 1.0))
+            except Exception:
+                logger.exception("Catalog refresh failed; keeping generation %s",
+                                 self.snapshot.generation if self.snapshot else None)
+                delay = min(delay, self.retry_seconds)
+            await asyncio.sleep(delay)
+
+    def start(self):
+        """Inicia el refresco periódico (llamar dentro del event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Detiene el refresco periódico"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @classmethod
+    def from_env(cls) -> "CatalogStore":
+        """Crea el store con la configuración del entorno (origen según DATA_SOURCE)"""
+        return cls(
+            loader=data_source.fetch_catalog,
+            refresh_seconds=float(os.getenv("CATALOG_REFRESH_SECONDS", "300")),
+            retry_seconds=float(os.getenv("CATALOG_RETRY_SECONDS", "30"))
+        )
@@ -0,0 +1,143 @@
+"""
+Circuit Breaker
+Corta las llamadas a una dependencia que está fallando o respondiendo lento
+"""
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la llamada se rechaza sin intentarla"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de fallas y de llamadas lentas
+
+    - closed: las llamadas pasan; se abre si, sobre las últimas `window`
+      llamadas (con al menos min_calls), la fracción de fallas o de
+      llamadas más lentas que slow_call_seconds supera su umbral.
+    - open: se rechaza todo durante open_seconds.
+    - half_open: se deja pasar hasta probe_calls llamadas de prueba; si
+      todas salen bien se cierra, si una falla se vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.8,
+        slow_call_seconds: float = 3.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        probe_calls: int = 1
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probe_calls = probe_calls
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._outcomes: Deque[tuple] = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._probes_ok = 0
+
+    def retry_after(self) -> float:
+        """Segundos hasta el próximo intento de prueba"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def before_call(self):
+        """
+        Pide permiso para una llamada
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay pruebas en curso
+        """
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probes_ok = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.probe_calls:
+                raise CircuitOpenError(self.open_seconds)
+            self._probes_in_flight += 1
+
+    def record(self, success: bool, seconds: float):
+        """Registra el resultado de una llamada autorizada por before_call"""
+        slow = seconds >= self.slow_call_seconds
+
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not success or slow:
+                self._open()
+                return
+            self._probes_ok += 1
+            if self._probes_ok >= self.probe_calls:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+
+        if self.state != self.CLOSED:
+            return
+
+        self._outcomes.append((success, slow))
+        n = len(self._outcomes)
+        if n < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+        if failures / n >= self.failure_rate or slow_calls / n >= self.slow_call_rate:
+            self._open()
+
+    def abandon(self):
+        """Libera una llamada autorizada que terminó sin resultado (p. ej. cancelada)"""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "times_opened": self.times_opened,
+            "retry_after_seconds": round(self.retry_after(), 1)
+        }
+
+    @classmethod
+    def from_env(cls, prefix: str = "SUPABASE_BREAKER") -> "CircuitBreaker":
+        """Crea el breaker con la configuración del entorno"""
+        return cls(
+            failure_rate=float(os.getenv(f"{prefix}_FAILURE_RATE", "0.5")),
+            slow_call_rate=float(os.getenv(f"{prefix}_SLOW_CALL_RATE", "0.8")),
+            slow_call_seconds=float(os.getenv(f"{prefix}_SLOW_CALL_SECONDS", "3")),
+            window=int(os.getenv(f"{prefix}_WINDOW", "20")),
+            min_calls=int(os.getenv(f"{prefix}_MIN_CALLS", "10")),
+            open_seconds=float(os.getenv(f"{prefix}_OPEN_SECONDS", "30"))
+        )
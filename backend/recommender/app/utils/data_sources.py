@@ -0,0 +1,395 @@
+"""
+Data Sources
+Origen de los productos: Supabase, datos mock en memoria o un archivo local
+"""
+import asyncio
+import json
+import os
+import sqlite3
+from typing import Any, Container, Dict, Iterable, List, Optional, Protocol, Sequence
+
+from app.utils import database, server_timing
+from app.utils.database import select_image
+from app.utils.mock_data import MOCK_PRODUCTS
+
+# Columnas del formato de catálogo en archivos locales (las JSON van como texto)
+CATALOG_COLUMNS = (
+    "id", "name", "category", "price", "stock", "image_url", "thumbnail_url",
+    "thumbnails", "active", "provider_id", "provider_name", "description",
+    "spec_name", "spec_value", "min_quantity", "sales", "price_tiers", "delivery_regions"
+)
+JSON_COLUMNS = ("thumbnails", "price_tiers", "delivery_regions")
+
+_SQLITE_SCHEMA = """
+CREATE TABLE products (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL,
+    image_url TEXT NOT NULL,
+    thumbnail_url TEXT,
+    thumbnails TEXT,
+    active INTEGER NOT NULL,
+    provider_id TEXT NOT NULL,
+    provider_name TEXT NOT NULL,
+    description TEXT,
+    spec_name TEXT,
+    spec_value TEXT,
+    min_quantity INTEGER NOT NULL,
+    sales INTEGER NOT NULL,
+    price_tiers TEXT,
+    delivery_regions TEXT
+);
+CREATE INDEX products_category ON products (category, stock);
+"""
+
+
+def _file_row(record: Dict[str, Any]) -> tuple:
+    return tuple(
+        json.dumps(record.get(c), ensure_ascii=False) if c in JSON_COLUMNS else record.get(c)
+        for c in CATALOG_COLUMNS
+    )
+
+
+class DataSource(Protocol):
+    """
+    Operaciones de lectura que usan el servicio y el catálogo
+
+    Los productos salen en el formato de fetch_products; fetch_catalog
+    agrega los campos que necesita CatalogSnapshot (descripción, specs,
+    ventas, tramos de precio, regiones de despacho, miniaturas). Los
+    registros del catálogo pueden ser dicts o cualquier objeto que se lea
+    como uno (record["id"], record.get(...)), como app.utils.rows.CatalogRecord.
+    """
+
+    name: str
+
+    async def fetch_products(
+        self,
+        category: Optional[str] = None,
+        min_stock: int = 0,
+        exclude_ids: Optional[Container[str]] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> List[Dict[str, Any]]: ...
+
+    async def fetch_product_by_id(self, product_id: str) -> Optional[Dict[str, Any]]: ...
+
+    async def fetch_products_by_ids(
+        self,
+        product_ids: Iterable[str],
+        fields: Optional[Sequence[str]] = None,
+        image_size: str = "full"
+    ) -> Dict[str, Dict[str, Any]]: ...
+
+    async def fetch_candidates(
+        self,
+        category: Optional[str] = None,
+        min_stock: int = 0,
+        exclude_ids: Optional[Container[str]] = None
+    ) -> List[Dict[str, Any]]: ...
+
+    async def fetch_catalog(self) -> List[Dict[str, Any]]: ...
+
+
+def to_product(
+    record: Dict[str, Any],
+    fields: Optional[Sequence[str]] = None,
+    image_size: str = "full"
+) -> Dict[str, Any]:
+    """Convierte un registro en formato de catálogo al formato de respuesta"""
+    product = {
+        "id": str(record["id"]),
+        "name": record.get("name", ""),
+        "category": record.get("category") or "Sin categoría",
+        "price": float(record.get("price") or 0),
+        "stock": record.get("stock") or 0,
+        "image_url": select_image(
+            record.get("image_url") or "",
+            record.get("thumbnail_url"),
+            record.get("thumbnails"),
+            image_size
+        ),
+        "active": bool(record.get("active", True)),
+        "provider_id": record.get("provider_id") or "",
+        "provider_name": record.get("provider_name") or "Desconocido"
+    }
+    if fields is not None:
+        product = {key: value for key, value in product.items() if key == "id" or key in fields}
+    return product
+
+
+def to_candidate(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(record["id"]),
+        "category": record.get("category") or "Sin categoría",
+        "price": float(record.get("price") or 0),
+        "provider_id": record.get("provider_id") or ""
+    }
+
+
+def _excluded(exclude_ids: Optional[Container[str]]) -> Optional[Container[str]]:
+    return set(exclude_ids) if isinstance(exclude_ids, (list, tuple)) else exclude_ids
+
+
+class SupabaseSource:
+    """Las consultas de app.utils.database (PostgREST)"""
+
+    name = "supabase"
+
+    def __init__(self, page_size: int = 1000):
+        self.page_size = page_size
+
+    async def fetch_products(self, category=None, min_stock=0, exclude_ids=None, limit=None,
+                             fields=None, image_size="full"):
+        return await database.fetch_products(
+            category=category, min_stock=min_stock, exclude_ids=exclude_ids,
+            limit=limit, fields=fields, image_size=image_size
+        )
+
+    async def fetch_product_by_id(self, product_id):
+        return await database.fetch_product_by_id(product_id)
+
+    async def fetch_products_by_ids(self, product_ids, fields=None, image_size="full"):
+        return await database.fetch_products_by_ids(product_ids, fields=fields, image_size=image_size)
+
+    async def fetch_candidates(self, category=None, min_stock=0, exclude_ids=None):
+        return await database.fetch_candidates(
+            category=category, min_stock=min_stock, exclude_ids=exclude_ids
+        )
+
+    async def fetch_catalog(self):
+        return await database.fetch_catalog(page_size=self.page_size)
+
+
+class MemorySource:
+    """
+    Registros en formato de catálogo guardados en memoria
+
+    Con los productos de mock_data por defecto; también sirve para
+    catálogos generados (ver app.utils.synthetic_catalog).
+    """
+
+    name = "memory"
+
+    def __init__(self, records: Optional[Iterable[Dict[str, Any]]] = None):
+        self.records = list(records) if records is not None else [dict(p) for p in MOCK_PRODUCTS]
+        self.by_id = {str(r["id"]): r for r in self.records}
+
+    def _select(self, category, min_stock, exclude_ids) -> Iterable[Dict[str, Any]]:
+        exclude_ids = _excluded(exclude_ids)
+        for record in self.records:
+            if not record.get("active", True):
+                continue
+            if min_stock > 0 and (record.get("stock") or 0) < min_stock:
+                continue
+            if category and record.get("category") != category:
+                continue
+            if exclude_ids and str(record["id"]) in exclude_ids:
+                continue
+            yield record
+
+    async def fetch_products(self, category=None, min_stock=0, exclude_ids=None, limit=None,
+                             fields=None, image_size="full"):
+        products = []
+        for record in self._select(category, min_stock, exclude_ids):
+            products.append(to_product(record, fields, image_size))
+            if limit and len(products) >= limit:
+                break
+        return products
+
+    async def fetch_product_by_id(self, product_id):
+        record = self.by_id.get(product_id)
+        return to_product(record) if record is not None else None
+
+    async def fetch_products_by_ids(self, product_ids, fields=None, image_size="full"):
+        return {
+            pid: to_product(self.by_id[pid], fields, image_size)
+            for pid in dict.fromkeys(product_ids) if pid in self.by_id
+        }
+
+    async def fetch_candidates(self, category=None, min_stock=0, exclude_ids=None):
+        return [to_candidate(r) for r in self._select(category, min_stock, exclude_ids)]
+
+    async def fetch_catalog(self):
+        return [r for r in self.records if r.get("active", True)]
+
+
+class SQLiteSource:
+    """
+    Catálogo en un archivo SQLite (tabla products, ver synthetic_catalog)
+
+    Cada consulta abre una conexión de sólo lectura en un thread, así que
+    no bloquea el event loop ni comparte conexiones entre threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ids_per_query: int = 500):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"SQLite catalog not found: {path}")
+        self.path = path
+        self.ids_per_query = ids_per_query
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        records = []
+        for row in rows:
+            record = dict(row)
+            for column in JSON_COLUMNS:
+                if isinstance(record.get(column), str):
+                    record[column] = json.loads(record[column])
+            records.append(record)
+        return records
+
+    async def _run(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        with server_timing.stage("db"):
+            return await asyncio.to_thread(self._query, sql, params)
+
+    @staticmethod
+    def _where(category: Optional[str], min_stock: int):
+        clauses, params = ["active = 1"], []
+        if min_stock > 0:
+            clauses.append("stock >= ?")
+            params.append(min_stock)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        return " AND ".join(clauses), params
+
+    async def fetch_products(self, category=None, min_stock=0, exclude_ids=None, limit=None,
+                             fields=None, image_size="full"):
+        where, params = self._where(category, min_stock)
+        exclude_ids = _excluded(exclude_ids)
+        products = []
+        for record in await self._run(f"SELECT * FROM products WHERE {where} ORDER BY id", params):
+            if exclude_ids and record["id"] in exclude_ids:
+                continue
+            products.append(to_product(record, fields, image_size))
+            if limit and len(products) >= limit:
+                break
+        return products
+
+    async def fetch_product_by_id(self, product_id):
+        records = await self._run("SELECT * FROM products WHERE id = ?", (product_id,))
+        return to_product(records[0]) if records else None
+
+    async def fetch_products_by_ids(self, product_ids, fields=None, image_size="full"):
+        ids = list(dict.fromkeys(product_ids))
+        products = {}
+        for start in range(0, len(ids), self.ids_per_query):
+            chunk = ids[start:start + self.ids_per_query]
+            placeholders = ",".join("?" * len(chunk))
+            for record in await self._run(f"SELECT * FROM products WHERE id IN ({placeholders})", chunk):
+                products[record["id"]] = to_product(record, fields, image_size)
+        return products
+
+    async def fetch_candidates(self, category=None, min_stock=0, exclude_ids=None):
+        where, params = self._where(category, min_stock)
+        exclude_ids = _excluded(exclude_ids)
+        records = await self._run(
+            f"SELECT id, category, price, provider_id FROM products WHERE {where}", params
+        )
+        return [to_candidate(r) for r in records if not (exclude_ids and r["id"] in exclude_ids)]
+
+    async def fetch_catalog(self):
+        return await self._run("SELECT * FROM products WHERE active = 1 ORDER BY id")
+
+    @staticmethod
+    def write(path: str, chunks: Iterable[List[Dict[str, Any]]]) -> int:
+        """Crea el archivo con los registros (en lotes); retorna cuántos escribió"""
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        try:
+            conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + _SQLITE_SCHEMA)
+            placeholders = ",".join("?" * len(CATALOG_COLUMNS))
+            total = 0
+            for chunk in chunks:
+                conn.executemany(f"INSERT INTO products VALUES ({placeholders})", map(_file_row, chunk))
+                total += len(chunk)
+            conn.commit()
+        finally:
+            conn.close()
+        return total
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet catalogs need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def write_parquet(path: str, chunks: Iterable[List[Dict[str, Any]]]) -> int:
+    """Escribe los registros en Parquet, un row group por lote (requiere pyarrow)"""
+    pa = _pyarrow()
+    writer = None
+    total = 0
+    try:
+        for chunk in chunks:
+            columns = list(zip(*map(_file_row, chunk)))
+            table = pa.table({name: list(values) for name, values in zip(CATALOG_COLUMNS, columns)})
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            total += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def read_parquet(path: str) -> List[Dict[str, Any]]:
+    """Registros de un catálogo en Parquet (requiere pyarrow)"""
+    records = _pyarrow().parquet.read_table(path).to_pylist()
+    for record in records:
+        for column in JSON_COLUMNS:
+            if isinstance(record.get(column), str):
+                record[column] = json.loads(record[column])
+    return records
+
+
+def create_data_source(spec: str) -> DataSource:
+    """
+    Crea el origen de datos desde DATA_SOURCE
+
+    supabase (por defecto), postgresql://... (directo con asyncpg), mock,
+    sqlite:///ruta/catalogo.db, parquet:///ruta/catalogo.parquet o
+    synthetic://N[?seed=S]. Parquet y synthetic se cargan completos en
+    memoria al iniciar.
+    """
+    spec = spec.strip() or "supabase"
+    if spec == "supabase":
+        return SupabaseSource(page_size=int(os.getenv("CATALOG_PAGE_SIZE", "1000")))
+    if spec.startswith(("postgres://", "postgresql://")):
+        from app.utils.postgres_source import PostgresSource
+        return PostgresSource.from_env(spec)
+    if spec == "mock":
+        return MemorySource()
+    if spec.startswith("sqlite://"):
+        return SQLiteSource(spec[len("sqlite://"):])
+    if spec.startswith("parquet://"):
+        source = MemorySource(read_parquet(spec[len("parquet://"):]))
+        source.name = "parquet"
+        return source
+    if spec.startswith("synthetic://"):
+        from app.utils.synthetic_catalog import generate_catalog
+        size, _, query = spec[len("synthetic://"):].partition("?")
+        options = dict(part.split("=", 1) for part in query.split("&") if part)
+        source = MemorySource(generate_catalog(int(size), seed=int(options.get("seed", 42))))
+        source.name = "synthetic"
+        return source
+    raise ValueError(f"Unknown DATA_SOURCE '{spec}'")
+
+
+data_source: DataSource = create_data_source(os.getenv("DATA_SOURCE", "supabase"))
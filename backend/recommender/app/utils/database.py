@@ -2,16 +2,125 @@
 Supabase Database Utilities
 Handles all database connections and queries
 """
+import json
+import logging
 import os
-from typing import List, Dict, Any, Optional
+import sys
+from typing import List, Dict, Any, Optional, Container, Callable, Iterable, Sequence, AsyncIterator
+import httpx
+import msgspec
+import orjson
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
 
+from app.utils import rows as row_types
+from app.utils import server_timing
+from app.utils.metrics import ROW_BUCKETS, registry
+from app.utils.query_executor import QueryExecutor
+from app.utils.rows import CatalogRecord, ImageRow, ProductRow
+
+try:
+    # postgrest internals (tested with 2.33, pinned in requirements.txt):
+    # send the built request without materializing response.data
+    from postgrest._sync.request_builder import send_with_retry
+    from postgrest.exceptions import generate_default_error_message
+except ImportError:  # other postgrest versions: _send falls back to execute()
+    send_with_retry = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Supabase client singleton
 _supabase_client: Optional[Client] = None
 
+# Runs every query off the event loop with deadlines and optional hedging
+query_executor = QueryExecutor.from_env()
+
+db_rows = registry.histogram(
+    "recommender_db_rows",
+    "Rows returned per Supabase response",
+    ("operation",),
+    buckets=ROW_BUCKETS
+)
+
+# Columns (with users / product_images joins) used for product queries
+PRODUCT_COLUMNS = """
+    productid,
+    productnm,
+    category,
+    price,
+    productqty,
+    is_active,
+    supplier_id,
+    users!supplier_id(user_nm),
+    product_images!product_id(image_url, thumbnail_url, thumbnails)
+"""
+
+# Product field -> column (or join) it is read from, for sparse fieldsets
+FIELD_COLUMNS = {
+    "id": "productid",
+    "name": "productnm",
+    "category": "category",
+    "price": "price",
+    "stock": "productqty",
+    "active": "is_active",
+    "provider_id": "supplier_id",
+    "provider_name": "users!supplier_id(user_nm)",
+    "image_url": "product_images!product_id(image_url, thumbnail_url, thumbnails)"
+}
+
+# Fields computed per request (not stored in products)
+QUERY_FIELDS = ("effective_price", "shipping_price", "delivery_days", "recommendation_score")
+
+# "full" is the original upload; the rest are keys of product_images.thumbnails
+IMAGE_SIZES = ("full", "desktop", "tablet", "mobile", "minithumb")
+
+# Scoring only needs these (no joins); full rows are fetched for the final page
+CANDIDATE_COLUMNS = "productid, category, price, supplier_id"
+
+# Ids per in.(...) filter, keeps the request URL well under proxy limits
+IDS_PER_QUERY = 200
+
+# Catalog loads also need the text used for near-duplicate detection
+CATALOG_COLUMNS = PRODUCT_COLUMNS + """,
+    description,
+    spec_name,
+    spec_value,
+    min_quantity
+"""
+
+
+def _build_http_client() -> httpx.Client:
+    """
+    HTTP client shared by the Supabase sub-clients
+    
+    Keeps a bounded pool of keep-alive connections (HTTP/2 when h2 is
+    installed) and applies per-request timeouts from the environment.
+    """
+    http2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("SUPABASE_HTTP2 is set but h2 is not installed; using HTTP/1.1")
+            http2 = False
+    
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "30"))
+        ),
+        timeout=httpx.Timeout(
+            float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "5")),
+            connect=float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "2"))
+        )
+    )
+
 
 def get_supabase_client() -> Client:
     """Get or create Supabase client instance"""
@@ -24,16 +133,172 @@ def get_supabase_client() -> Client:
         if not url or not key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
         
-        _supabase_client = create_client(url, key)
+        _supabase_client = create_client(url, key, options=SyncClientOptions(
+            httpx_client=_build_http_client()
+        ))
     
     return _supabase_client
 
 
+def _send(query: Any) -> bytes:
+    """
+    Send a PostgREST query and return the raw JSON body
+    
+    Same request, retries and errors as query.execute(), without building
+    response.data: callers decode the bytes straight into row structs.
+    Without the postgrest internals it uses execute() and re-encodes the rows.
+    """
+    request = getattr(query, "request", None)
+    if send_with_retry is None or request is None:
+        return orjson.dumps(query.execute().data)
+    response = send_with_retry(request)
+    if response.is_success:
+        return response.content
+    try:
+        error = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        error = None
+    raise APIError(error if isinstance(error, dict) else generate_default_error_message(response))
+
+
+async def _fetch_rows(operation: str, query: Any, decoder: msgspec.json.Decoder) -> List[Any]:
+    """
+    Run a PostgREST query through the executor and decode its rows
+    
+    Decoding happens in the executor thread, next to the request, so the
+    event loop never parses JSON.
+    """
+    rows = await query_executor.run(operation, lambda: decoder.decode(_send(query)))
+    db_rows.observe(len(rows), operation)
+    return rows
+
+
+def validate_fields(fields: Optional[Iterable[str]]) -> Optional[Sequence[str]]:
+    """
+    Check a sparse fieldset
+    
+    Args:
+        fields: Requested product fields (None = all)
+        
+    Returns:
+        The fields in request order, without duplicates
+        
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if fields is None:
+        return None
+    fields = list(dict.fromkeys(f.strip() for f in fields if f.strip()))
+    unknown = [f for f in fields if f not in FIELD_COLUMNS and f not in QUERY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+
+def select_columns(fields: Optional[Sequence[str]] = None) -> str:
+    """Columns to select for a sparse fieldset (productid is always included)"""
+    if fields is None:
+        return PRODUCT_COLUMNS
+    columns = ["productid"]
+    columns.extend(FIELD_COLUMNS[f] for f in fields if f in FIELD_COLUMNS and f != "id")
+    return ", ".join(columns)
+
+
+def parse_thumbnails(value: Any) -> Dict[str, str]:
+    """product_images.thumbnails may come as an object or as a JSON string"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def select_image(
+    image_url: str,
+    thumbnail_url: Optional[str],
+    thumbnails: Optional[Dict[str, str]],
+    size: str = "full"
+) -> str:
+    """
+    Pick the image variant for a size
+    
+    Falls back to thumbnail_url (the desktop thumbnail) and then to the
+    full image when the variant has not been generated.
+    """
+    if size == "full":
+        return image_url
+    if thumbnails and thumbnails.get(size):
+        return thumbnails[size]
+    return thumbnail_url or image_url
+
+
+# Shared stand-in for products without product_images rows
+_NO_IMAGE = ImageRow()
+
+
+def _first_image(item: ProductRow) -> ImageRow:
+    """First product_images row of a products row (empty if none)"""
+    return item.product_images[0] if item.product_images else _NO_IMAGE
+
+
+def _transform_product(
+    item: ProductRow,
+    fields: Optional[Sequence[str]] = None,
+    image_size: str = "full"
+) -> Dict[str, Any]:
+    """Map a decoded products row to the service product format"""
+    # Get first product image if available
+    image = _first_image(item)
+    image_url = select_image(
+        image.image_url or "",
+        image.thumbnail_url,
+        parse_thumbnails(image.thumbnails) if image_size != "full" else None,
+        image_size
+    )
+    
+    product = {
+        "id": item.productid,
+        "name": item.productnm or "",
+        "category": item.category or "Sin categoría",
+        "price": item.price or 0.0,
+        "stock": item.productqty or 0,
+        "image_url": image_url,
+        "active": item.is_active if item.is_active is not None else True,
+        "provider_id": item.supplier_id or "",
+        "provider_name": (item.users.user_nm if item.users else None) or "Desconocido"
+    }
+    
+    if fields is not None:
+        product = {key: value for key, value in product.items() if key == "id" or key in fields}
+    return product
+
+
+def transform_rows(
+    rows: Iterable[ProductRow],
+    exclude_ids: Optional[Container[str]] = None,
+    fields: Optional[Sequence[str]] = None,
+    image_size: str = "full"
+) -> List[Dict[str, Any]]:
+    """Transform decoded products rows, skipping excluded IDs before building each product"""
+    if isinstance(exclude_ids, (list, tuple)):
+        exclude_ids = set(exclude_ids)
+    
+    products = []
+    for item in rows:
+        if exclude_ids and item.productid in exclude_ids:
+            continue
+        products.append(_transform_product(item, fields=fields, image_size=image_size))
+    return products
+
+
 async def fetch_products(
     category: Optional[str] = None,
     min_stock: int = 0,
-    exclude_ids: Optional[List[str]] = None,
-    limit: Optional[int] = None
+    exclude_ids: Optional[Container[str]] = None,
+    limit: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+    image_size: str = "full"
 ) -> List[Dict[str, Any]]:
     """
     Fetch products from Supabase
@@ -41,8 +306,11 @@ async def fetch_products(
     Args:
         category: Filter by category
         min_stock: Minimum stock required
-        exclude_ids: Product IDs to exclude
+        exclude_ids: Product IDs to exclude (set, Bloom filter or any container;
+            lists are converted to a set so each check is O(1))
         limit: Maximum number of products to return
+        fields: Only select and return these fields (None = all)
+        image_size: Image variant returned as image_url (see IMAGE_SIZES)
         
     Returns:
         List of products
@@ -50,17 +318,7 @@ async def fetch_products(
     client = get_supabase_client()
     
     # Start query with JOIN to product_images
-    query = client.table("products").select("""
-        productid,
-        productnm,
-        category,
-        price,
-        productqty,
-        is_active,
-        supplier_id,
-        users!supplier_id(user_nm),
-        product_images!product_id(image_url)
-    """)
+    query = client.table("products").select(select_columns(fields))
     
     # Filter by active products
     query = query.eq("is_active", True)
@@ -74,37 +332,14 @@ async def fetch_products(
         query = query.eq("category", category)
     
     # Execute query
-    response = query.execute()
+    rows = await _fetch_rows("fetch_products", query, row_types.product_rows)
     
-    if not response.data:
+    if not rows:
         return []
     
     # Transform data to match expected format
-    products = []
-    for item in response.data:
-        # Get first product image if available
-        product_images = item.get("product_images", [])
-        image_url = ""
-        if product_images and len(product_images) > 0:
-            image_url = product_images[0].get("image_url", "")
-        
-        product = {
-            "id": str(item["productid"]),
-            "name": item["productnm"],
-            "category": item.get("category", "Sin categoría"),
-            "price": float(item.get("price", 0)),
-            "stock": item.get("productqty", 0),
-            "image_url": image_url,
-            "active": item.get("is_active", True),
-            "provider_id": item.get("supplier_id", ""),
-            "provider_name": item.get("users", {}).get("user_nm", "Desconocido") if item.get("users") else "Desconocido"
-        }
-        
-        # Exclude specific IDs
-        if exclude_ids and product["id"] in exclude_ids:
-            continue
-            
-        products.append(product)
+    with server_timing.stage("transform"):
+        products = transform_rows(rows, exclude_ids=exclude_ids, fields=fields, image_size=image_size)
     
     # Limit results if specified
     if limit and len(products) > limit:
@@ -125,40 +360,319 @@ async def fetch_product_by_id(product_id: str) -> Optional[Dict[str, Any]]:
     """
     client = get_supabase_client()
     
-    response = client.table("products").select("""
-        productid,
-        productnm,
-        category,
-        price,
-        productqty,
-        is_active,
-        supplier_id,
-        users!supplier_id(user_nm),
-        product_images!product_id(image_url)
-    """).eq("productid", product_id).execute()
-    
-    if not response.data or len(response.data) == 0:
+    query = client.table("products").select(PRODUCT_COLUMNS).eq("productid", product_id)
+    rows = await _fetch_rows("fetch_product_by_id", query, row_types.product_rows)
+    
+    if not rows:
         return None
     
-    item = response.data[0]
+    with server_timing.stage("transform"):
+        return _transform_product(rows[0])
+
+
+async def fetch_products_by_ids(
+    product_ids: Iterable[str],
+    chunk_size: int = IDS_PER_QUERY,
+    fields: Optional[Sequence[str]] = None,
+    image_size: str = "full"
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch several products in one round trip
+    
+    Uses a single in.(...) filter per chunk_size ids instead of one
+    fetch_product_by_id call per product.
     
-    # Get first product image if available
-    product_images = item.get("product_images", [])
-    image_url = ""
-    if product_images and len(product_images) > 0:
-        image_url = product_images[0].get("image_url", "")
-    
-    return {
-        "id": str(item["productid"]),
-        "name": item["productnm"],
-        "category": item.get("category", "Sin categoría"),
-        "price": float(item.get("price", 0)),
-        "stock": item.get("productqty", 0),
-        "image_url": image_url,
-        "active": item.get("is_active", True),
-        "provider_id": item.get("supplier_id", ""),
-        "provider_name": item.get("users", {}).get("user_nm", "Desconocido") if item.get("users") else "Desconocido"
-    }
+    Args:
+        product_ids: Product IDs (duplicates are fetched once)
+        chunk_size: Maximum IDs per request
+        fields: Only select and return these fields (None = all)
+        image_size: Image variant returned as image_url (see IMAGE_SIZES)
+        
+    Returns:
+        Dict of product_id -> product; missing IDs are left out
+    """
+    ids = list(dict.fromkeys(str(pid) for pid in product_ids))
+    if not ids:
+        return {}
+    
+    client = get_supabase_client()
+    columns = select_columns(fields)
+    
+    products: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        query = client.table("products").select(columns).in_("productid", chunk)
+        rows = await _fetch_rows("fetch_products_by_ids", query, row_types.product_rows)
+        with server_timing.stage("transform"):
+            for item in rows:
+                product = _transform_product(item, fields=fields, image_size=image_size)
+                products[product["id"]] = product
+    
+    return products
+
+
+async def fetch_candidates(
+    category: Optional[str] = None,
+    min_stock: int = 0,
+    exclude_ids: Optional[Container[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch the minimal fields needed to score and diversify products
+    
+    Skips the users / product_images joins; the chosen products are
+    hydrated afterwards with fetch_products_by_ids.
+    
+    Args:
+        category: Filter by category
+        min_stock: Minimum stock required
+        exclude_ids: Product IDs to exclude
+        
+    Returns:
+        List of {id, category, price, provider_id}
+    """
+    client = get_supabase_client()
+    
+    query = client.table("products").select(CANDIDATE_COLUMNS).eq("is_active", True)
+    if min_stock > 0:
+        query = query.gte("productqty", min_stock)
+    if category:
+        query = query.eq("category", category)
+    
+    rows = await _fetch_rows("fetch_candidates", query, row_types.product_rows)
+    
+    if isinstance(exclude_ids, (list, tuple)):
+        exclude_ids = set(exclude_ids)
+    
+    candidates = []
+    for item in rows:
+        if exclude_ids and item.productid in exclude_ids:
+            continue
+        candidates.append({
+            "id": item.productid,
+            "category": item.category or "Sin categoría",
+            "price": item.price or 0.0,
+            "provider_id": item.supplier_id or ""
+        })
+    
+    return candidates
+
+
+async def _fetch_pages(
+    operation: str,
+    build_query: Callable[[], Any],
+    page_size: int,
+    decoder: msgspec.json.Decoder
+) -> AsyncIterator[List[Any]]:
+    """
+    Run a query page by page until a short page comes back
+    
+    Yields each decoded page so callers can fold it into their result and
+    let it go before the next one arrives.
+    
+    Args:
+        operation: Name used for latency and hedging stats
+        build_query: Returns a fresh, ordered query builder for each page
+        page_size: Rows per request (must not exceed the API max-rows)
+        decoder: Decoder for the rows of one page
+    """
+    start = 0
+    while True:
+        query = build_query().range(start, start + page_size - 1)
+        page = await _fetch_rows(operation, query, decoder)
+        yield page
+        
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+def _group(groups: Dict[str, List[Any]], row: Any):
+    """
+    Append a satellite row to its product's list
+    
+    Rows of the same product share one product_id string instead of each
+    keeping the copy it was decoded with.
+    """
+    group = groups.get(row.product_id)
+    if group is None:
+        groups[row.product_id] = [row]
+    else:
+        row.product_id = group[0].product_id
+        group.append(row)
+
+
+async def fetch_sales_totals(page_size: int = 1000) -> Dict[str, int]:
+    """
+    Fetch units sold per product from product_sales
+    
+    Args:
+        page_size: Rows per request (must not exceed the API max-rows)
+        
+    Returns:
+        Dict of product_id -> total quantity sold
+    """
+    client = get_supabase_client()
+    totals: Dict[str, int] = {}
+    async for page in _fetch_pages(
+        "fetch_sales_totals",
+        lambda: client.table("product_sales").select("product_id, quantity").order("id"),
+        page_size,
+        row_types.sale_rows
+    ):
+        for row in page:
+            totals[row.product_id] = totals.get(row.product_id, 0) + (row.quantity or 0)
+    
+    return totals
+
+
+async def fetch_price_tiers(page_size: int = 1000) -> Dict[str, List[row_types.TierRow]]:
+    """
+    Fetch tiered prices from product_quantity_ranges
+    
+    Args:
+        page_size: Rows per request (must not exceed the API max-rows)
+        
+    Returns:
+        Dict of product_id -> tiers sorted by min_quantity (TierRow records,
+        readable as {min_quantity, max_quantity, price})
+    """
+    client = get_supabase_client()
+    tiers: Dict[str, List[row_types.TierRow]] = {}
+    async for page in _fetch_pages(
+        "fetch_price_tiers",
+        lambda: (
+            client.table("product_quantity_ranges")
+            .select("product_id, min_quantity, max_quantity, price")
+            .order("product_qty_id")
+        ),
+        page_size,
+        row_types.tier_rows
+    ):
+        for row in page:
+            if row.product_id is not None:
+                _group(tiers, row)
+    
+    for product_tiers in tiers.values():
+        product_tiers.sort(key=lambda tier: tier.min_quantity)
+    
+    return tiers
+
+
+async def fetch_delivery_regions(page_size: int = 1000) -> Dict[str, List[row_types.DeliveryRow]]:
+    """
+    Fetch delivery regions from product_delivery_regions
+    
+    Args:
+        page_size: Rows per request (must not exceed the API max-rows)
+        
+    Returns:
+        Dict of product_id -> DeliveryRow records, readable as
+        {region, price, delivery_days}
+    """
+    client = get_supabase_client()
+    regions: Dict[str, List[row_types.DeliveryRow]] = {}
+    async for page in _fetch_pages(
+        "fetch_delivery_regions",
+        lambda: (
+            client.table("product_delivery_regions")
+            .select("product_id, region, price, delivery_days")
+            .order("id")
+        ),
+        page_size,
+        row_types.delivery_rows
+    ):
+        for row in page:
+            row.region = sys.intern(row.region)
+            _group(regions, row)
+    
+    return regions
+
+
+async def fetch_catalog(page_size: int = 1000) -> List[CatalogRecord]:
+    """
+    Fetch every active product, paging past the PostgREST row limit
+    
+    Each page is turned into records as soon as it arrives; only the
+    compact records outlive the page.
+    
+    Args:
+        page_size: Rows per request (must not exceed the API max-rows)
+        
+    Returns:
+        List of CatalogRecord (read like product dicts), including
+        description, spec fields, units sold, price tiers and delivery regions
+    """
+    client = get_supabase_client()
+    sales = await fetch_sales_totals(page_size=page_size)
+    tiers = await fetch_price_tiers(page_size=page_size)
+    regions = await fetch_delivery_regions(page_size=page_size)
+    
+    products: List[CatalogRecord] = []
+    async for page in _fetch_pages(
+        "fetch_catalog",
+        lambda: (
+            client.table("products")
+            .select(CATALOG_COLUMNS)
+            .eq("is_active", True)
+            .order("productid")
+        ),
+        page_size,
+        row_types.product_rows
+    ):
+        for item in page:
+            image = _first_image(item)
+            record = CatalogRecord(
+                **_transform_product(item),
+                thumbnail_url=image.thumbnail_url,
+                thumbnails=parse_thumbnails(image.thumbnails),
+                description=item.description or "",
+                spec_name=item.spec_name or "",
+                spec_value=item.spec_value or "",
+                min_quantity=item.min_quantity or 1,
+                sales=sales.get(item.productid, 0),
+                price_tiers=tiers.get(item.productid, []),
+                delivery_regions=regions.get(item.productid, [])
+            )
+            # Repeated across many products: one string each
+            record.category = sys.intern(record.category)
+            record.provider_name = sys.intern(record.provider_name)
+            record.provider_id = sys.intern(record.provider_id)
+            record.spec_name = sys.intern(record.spec_name)
+            products.append(record)
+    
+    return products
+
+
+async def fetch_purchase_history(page_size: int = 1000) -> List[row_types.PurchaseRow]:
+    """
+    Fetch every product_sales row that belongs to an order, oldest first
+    
+    Used by offline evaluation to replay purchases in time order.
+    
+    Args:
+        page_size: Rows per request (must not exceed the API max-rows)
+        
+    Returns:
+        PurchaseRow records (product_id, trx_date, order_id and the
+        buyer as orders.user_id)
+    """
+    client = get_supabase_client()
+    purchases: List[row_types.PurchaseRow] = []
+    async for page in _fetch_pages(
+        "fetch_purchase_history",
+        lambda: (
+            client.table("product_sales")
+            .select("product_id, trx_date, order_id, orders!order_id(user_id)")
+            .not_.is_("order_id", "null")
+            .order("trx_date")
+            .order("id")
+        ),
+        page_size,
+        row_types.purchase_rows
+    ):
+        purchases.extend(page)
+    
+    return purchases
 
 
 async def fetch_user_interactions(user_id: str) -> List[Dict[str, Any]]:
@@ -0,0 +1,329 @@
+"""
+Job Scheduler
+Tareas de fondo periódicas o disparadas, fuera del camino de los requests
+
+Cada job tiene su propia tarea en el event loop: espera su intervalo (con
+jitter, para que las réplicas no coincidan) o un trigger, y nunca se
+solapa consigo mismo. El trabajo de CPU se manda a un pool de procesos
+(run_in_process); los arrays grandes vuelven por memoria compartida
+(share_array / take_array) en vez de serializarse con pickle.
+
+Un job single_instance toma antes de correr un lease en el caché
+compartido (SET NX con TTL): en todo el clúster corre a lo más una vez
+por lease. Sin caché compartido el lease es sólo del proceso.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.utils.metrics import JOB_BUCKETS, registry
+from app.utils.shared_cache import CacheBackend, MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+job_seconds = registry.histogram(
+    "recommender_job_duration_seconds",
+    "Background job run time",
+    ("job", "outcome"),
+    buckets=JOB_BUCKETS
+)
+job_runs = registry.counter(
+    "recommender_job_runs_total",
+    "Background job runs by outcome (ok, error, skipped)",
+    ("job", "outcome")
+)
+job_last_success = registry.gauge(
+    "recommender_job_last_success_timestamp_seconds",
+    "Unix time of the last successful run of each job",
+    ("job",)
+)
+
+
+class SharedArray(NamedTuple):
+    """Referencia a un array en un segmento de memoria compartida"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def share_array(array: np.ndarray) -> SharedArray:
+    """
+    Copia un array a un segmento nuevo de memoria compartida
+
+    Se llama en el proceso del pool; el segmento queda vivo hasta que el
+    proceso que recibe la referencia lo libera con take_array.
+    """
+    array = np.ascontiguousarray(array)
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+        view[...] = array
+        del view
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    segment.close()
+    return SharedArray(segment.name, array.shape, array.dtype.str)
+
+
+def take_array(shared: SharedArray) -> np.ndarray:
+    """Copia el array de un segmento compartido y libera el segmento"""
+    segment = shared_memory.SharedMemory(name=shared.name)
+    try:
+        view = np.ndarray(shared.shape, dtype=np.dtype(shared.dtype), buffer=segment.buf)
+        array = view.copy()
+        del view
+    finally:
+        segment.close()
+        segment.unlink()
+    return array
+
+
+class Job:
+    """Una tarea registrada en el scheduler y su historial"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        interval: Optional[float] = None,
+        jitter: float = 0.1,
+        run_at_start: bool = False,
+        single_instance: bool = False,
+        lease_seconds: Optional[float] = None,
+        scope: Optional[Callable[[], str]] = None
+    ):
+        """
+        Args:
+            name: Nombre (etiqueta de las métricas y clave del lease)
+            func: Corrutina a ejecutar; los triggers la llaman sin argumentos
+            interval: Segundos entre corridas (None = sólo por trigger)
+            jitter: Variación aleatoria del intervalo, como fracción (0.1 = ±10%)
+            run_at_start: Correr apenas arranca el scheduler
+            single_instance: Tomar un lease compartido antes de cada corrida
+            lease_seconds: Vida del lease (por defecto el intervalo menos el
+                jitter, para que la corrida siguiente lo encuentre vencido; o 60 s)
+            scope: Sufijo de la clave del lease (p. ej. la versión de
+                contenido): un lease distinto por cada valor
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.run_at_start = run_at_start
+        self.single_instance = single_instance
+        self.lease_seconds = lease_seconds or (interval * (1 - jitter) if interval else 60.0)
+        self.scope = scope
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._trigger = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def next_delay(self) -> Optional[float]:
+        """Espera hasta la próxima corrida periódica (None = sólo por trigger)"""
+        if self.interval is None:
+            return None
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def lease_key(self) -> str:
+        key = f"job:{self.name}"
+        return f"{key}:{self.scope()}" if self.scope is not None else key
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "single_instance": self.single_instance,
+            "running": self._lock.locked(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started,
+            "last_duration_seconds": round(self.last_duration, 4) if self.last_duration is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class JobScheduler:
+    """
+    Corre los jobs registrados mientras el servicio está arriba
+
+    start() y stop() se llaman desde el lifespan de FastAPI (a través de
+    RecommenderService). Un error en un job se registra y se cuenta; el
+    job vuelve a correr en su próximo intervalo.
+    """
+
+    def __init__(self, leases: Optional[CacheBackend] = None, process_workers: int = 1):
+        """
+        Args:
+            leases: Backend de los leases de single_instance (None = en memoria)
+            process_workers: Procesos del pool de CPU (0 = sin pool, corre en un hilo)
+        """
+        self.leases = leases if leases is not None else MemoryBackend()
+        self.process_workers = process_workers
+        self.instance = uuid.uuid4().hex.encode()
+        self.jobs: Dict[str, Job] = {}
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], **options: Any) -> Job:
+        """Registra un job (ver Job para las opciones)"""
+        if name in self.jobs:
+            raise ValueError(f"Job '{name}' already registered")
+        job = self.jobs[name] = Job(name, func, **options)
+        return job
+
+    def start(self):
+        """Inicia la tarea de cada job (llamar dentro del event loop)"""
+        for job in self.jobs.values():
+            if job._task is None:
+                job._task = asyncio.create_task(self._loop(job))
+
+    async def stop(self):
+        """Detiene los jobs y el pool de procesos"""
+        tasks = [job._task for job in self.jobs.values() if job._task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            job._task = None
+
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def trigger(self, name: str):
+        """
+        Pide una corrida lo antes posible, sin esperarla
+
+        Varios triggers antes de que el job arranque producen una sola corrida.
+
+        Raises:
+            KeyError: Si el job no existe
+        """
+        self.jobs[name]._trigger.set()
+
+    async def run(self, name: str, *args: Any) -> bool:
+        """
+        Corre un job ahora y espera a que termine
+
+        Si ya está corriendo, espera a que esa corrida termine y corre de
+        nuevo. Los errores del job no se propagan (quedan en métricas y log).
+
+        Returns:
+            True si corrió sin errores; False si falló o si otra instancia
+            tiene el lease
+
+        Raises:
+            KeyError: Si el job no existe
+        """
+        job = self.jobs[name]
+        async with job._lock:
+            if not await self._acquire(job):
+                job.skipped += 1
+                job_runs.inc(name, "skipped")
+                return False
+
+            job.last_started = time.time()
+            started = time.perf_counter()
+            # Sólo queda así si la corrida se cancela (stop del servicio)
+            outcome = "cancelled"
+            try:
+                await job.func(*args)
+            except Exception as e:
+                outcome = "error"
+                job.failures += 1
+                job.last_error = repr(e)
+                logger.exception("Job %s failed", name)
+            else:
+                outcome = "ok"
+                job.last_error = None
+                job_last_success.set(time.time(), name)
+            finally:
+                job.runs += 1
+                job.last_duration = time.perf_counter() - started
+                job_seconds.observe(job.last_duration, name, outcome)
+            job_runs.inc(name, outcome)
+            return outcome == "ok"
+
+    async def _acquire(self, job: Job) -> bool:
+        """Toma el lease de un job single_instance (si el backend falla, corre igual)"""
+        if not job.single_instance:
+            return True
+        try:
+            return await self.leases.set(job.lease_key(), self.instance, job.lease_seconds, True)
+        except Exception as e:
+            logger.warning("Lease for job %s failed (%s); running anyway", job.name, e)
+            return True
+
+    async def _loop(self, job: Job):
+        if not job.run_at_start:
+            await self._wait(job)
+        while True:
+            await self.run(job.name)
+            await self._wait(job)
+
+    async def _wait(self, job: Job):
+        try:
+            await asyncio.wait_for(job._trigger.wait(), job.next_delay())
+        except asyncio.TimeoutError:
+            pass
+        job._trigger.clear()
+
+    @property
+    def pool(self) -> Optional[Executor]:
+        """Pool de procesos, creado con la primera tarea (None con process_workers=0)"""
+        if self.process_workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                # forkserver: los procesos no heredan hilos ni sockets del servidor
+                method = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=get_context(method)
+                )
+            return self._pool
+
+    async def run_in_process(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecuta fn(*args) en el pool de procesos
+
+        fn debe ser una función de módulo y sus argumentos serializables
+        con pickle; para devolver arrays grandes conviene share_array.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def call_in_process(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Igual que run_in_process, bloqueando (para código que ya corre en un hilo)"""
+        pool = self.pool
+        if pool is None:
+            return fn(*args)
+        return pool.submit(fn, *args).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: job.stats() for name, job in self.jobs.items()}
+
+    @classmethod
+    def from_env(cls, leases: Optional[CacheBackend] = None) -> "JobScheduler":
+        """Crea el scheduler con la configuración del entorno"""
+        return cls(
+            leases=leases,
+            process_workers=int(os.getenv("JOB_PROCESS_WORKERS", "1"))
+        )
@@ -0,0 +1,272 @@
+"""
+Metrics
+Contadores, histogramas y gauges en formato de exposición de Prometheus
+"""
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+# Starlette agrega "; charset=utf-8" a los media types text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Latencias de 1 ms a 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Filas por respuesta de Supabase
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000)
+# Jobs de fondo, de 10 ms a 10 min
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Contador monótono por combinación de labels
+
+    No usa locks: todas las actualizaciones ocurren en el event loop, así
+    que incrementar es una suma en un dict.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos (cuentas no acumuladas hasta exportar)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [cuenta por bucket..., +Inf, suma]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager que observa la duración del bloque"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, counts in self._values.items():
+            base = self._labels(labels)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, counts[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Gauge(_Metric):
+    """Valor que se fija directamente"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, self._labels(labels), value
+
+
+Collected = Union[Optional[float], Dict[LabelValues, float]]
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge o contador calculado al exportar
+
+    Para estado que ya existe en otro lado (tamaño del catálogo, contadores
+    de las cachés): no agrega costo en el camino caliente.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Collected],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterable[Sample]:
+        value = self.collect()
+        if value is None:
+            return
+        if isinstance(value, dict):
+            for labels, v in value.items():
+                if v is not None:
+                    yield self.name, self._labels(labels), v
+        else:
+            yield self.name, {}, value
+
+
+class Registry:
+    """Conjunto de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Collected],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ) -> CallbackMetric:
+        return self._add(CallbackMetric(name, help, collect, labelnames, kind))
+
+    def render(self) -> str:
+        """Exposición de texto (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class LoopLagMonitor:
+    """
+    Mide el retraso del event loop
+
+    Duerme `interval` segundos y registra cuánto más tardó en despertar:
+    ese exceso es el tiempo en que el loop estuvo ocupado con código
+    síncrono y no pudo atender requests.
+    """
+
+    def __init__(self, interval: float = 0.5, target: Registry = registry):
+        self.interval = interval
+        self.lag = target.histogram(
+            "recommender_event_loop_lag_seconds",
+            "Delay between the scheduled and actual wake-up of the event loop",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
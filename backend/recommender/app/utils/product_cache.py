@@ -0,0 +1,154 @@
+"""
+Product Cache
+Productos materializados por ID, para hidratar resultados sin volver a Supabase
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.utils.catalog import CatalogSnapshot
+
+
+class ProductCache:
+    """
+    Cache LRU acotada de productos por ID, con TTL por entrada
+
+    También guarda los IDs que no existen (caché negativa, con un TTL más
+    corto) para que las consultas repetidas por IDs inexistentes no lleguen
+    a Supabase. Los dicts se guardan tal como los retorna la base de datos;
+    quien los lee debe copiarlos antes de agregarles campos.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        ttl_seconds: float = 300.0,
+        negative_ttl_seconds: float = 30.0
+    ):
+        """
+        Args:
+            max_entries: Máximo de entradas (positivas y negativas)
+            ttl_seconds: Vida de un producto encontrado
+            negative_ttl_seconds: Vida de un "no existe"
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # id -> (expira en, producto o None si no existe)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _lookup(self, product_id: str, now: float) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        entry = self._entries.get(product_id)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, product = entry
+        if expires_at <= now:
+            del self._entries[product_id]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(product_id)
+        if product is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, product
+
+    def get(self, product_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Busca un ID
+
+        Returns:
+            (hay entrada vigente, producto o None si se sabe que no existe)
+        """
+        return self._lookup(product_id, time.monotonic())
+
+    def get_many(self, product_ids: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Busca varios IDs
+
+        Returns:
+            (productos encontrados por ID, IDs que no están en cache)
+        """
+        now = time.monotonic()
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for pid in product_ids:
+            cached, product = self._lookup(pid, now)
+            if not cached:
+                missing.append(pid)
+            elif product is not None:
+                found[pid] = product
+        return found, missing
+
+    def _store(self, product_id: str, product: Optional[Dict[str, Any]], ttl: float):
+        self._entries[product_id] = (time.monotonic() + ttl, product)
+        self._entries.move_to_end(product_id)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, product_id: str, product: Optional[Dict[str, Any]]):
+        """Guarda un producto, o None para recordar que el ID no existe"""
+        ttl = self.ttl_seconds if product is not None else self.negative_ttl_seconds
+        self._store(product_id, product, ttl)
+        self._evict()
+
+    def put_many(self, products: Dict[str, Dict[str, Any]], missing: Iterable[str] = ()):
+        """Guarda productos por ID y, opcionalmente, los IDs que no existen"""
+        for pid, product in products.items():
+            self._store(pid, product, self.ttl_seconds)
+        for pid in missing:
+            if pid not in products:
+                self._store(pid, None, self.negative_ttl_seconds)
+        self._evict()
+
+    def invalidate(self, product_ids: Iterable[str]):
+        """Descarta las entradas de esos IDs"""
+        for pid in product_ids:
+            self._entries.pop(pid, None)
+
+    def sync(self, snapshot: "CatalogSnapshot"):
+        """
+        Invalida lo que un refresco del catálogo pudo cambiar
+
+        Las entradas negativas se descartan (el producto pudo crearse) y
+        los productos cacheados se reemplazan por su versión del snapshot,
+        o se descartan si ya no están en él.
+        """
+        for pid, (_, product) in list(self._entries.items()):
+            current = snapshot.get(pid) if product is not None else None
+            if current is None:
+                del self._entries[pid]
+            elif current != product:
+                self._store(pid, current, self.ttl_seconds)
+
+    def clear(self):
+        """Vacía la cache"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses
+        }
+
+    @classmethod
+    def from_env(cls) -> "ProductCache":
+        """Crea la cache con la configuración del entorno"""
+        return cls(
+            max_entries=int(os.getenv("PRODUCT_CACHE_SIZE", "5000")),
+            ttl_seconds=float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300")),
+            negative_ttl_seconds=float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+        )
@@ -0,0 +1,121 @@
+"""
+Profiler
+Profiler estadístico por muestreo y snapshot de tracemalloc dentro del worker
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+# Frames en los que un thread está esperando trabajo, no ejecutando
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Ya hay un perfilado en curso en este worker"""
+
+
+def _location(frame: FrameType) -> str:
+    code = frame.f_code
+    parent, name = os.path.split(code.co_filename)
+    return f"{code.co_name} ({os.path.basename(parent)}/{name}:{code.co_firstlineno})"
+
+
+def _stack(frame: Optional[FrameType]) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_location(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _is_idle(frame: FrameType) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def profile(
+    seconds: float,
+    interval: float = 0.005,
+    top: int = 25,
+    include_idle: bool = False,
+    trace_memory: bool = True
+) -> Dict[str, Any]:
+    """
+    Muestrea las pilas de todos los threads durante `seconds`
+
+    Bloquea al thread que la llama (usar con asyncio.to_thread); el event
+    loop sigue atendiendo requests y aparece en las muestras como
+    MainThread. Si trace_memory, tracemalloc corre durante la ventana y se
+    reportan las líneas que más memoria asignaron y siguen vivas.
+
+    Returns:
+        stacks en formato "collapsed" (thread;frame;...;frame cuenta),
+        listo para flamegraph.pl o speedscope, y las asignaciones top.
+
+    Raises:
+        ProfilerBusy: Si ya hay otro perfilado corriendo
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    started_tracing = False
+    try:
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+        own = threading.get_ident()
+        samples: Counter = Counter()
+        ticks = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (not include_idle and _is_idle(frame)):
+                    continue
+                samples[";".join([names.get(ident, str(ident))] + _stack(frame))] += 1
+            ticks += 1
+            time.sleep(interval)
+
+        result: Dict[str, Any] = {
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "ticks": ticks,
+            "samples": sum(samples.values()),
+            "stacks": [f"{stack} {count}" for stack, count in samples.most_common()]
+        }
+
+        if trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            )).statistics("lineno")
+            result["memory"] = {
+                "traced_kb": round(current / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+                "top": [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_kb": round(stat.size / 1024, 1),
+                        "count": stat.count
+                    }
+                    for stat in statistics[:top]
+                ]
+            }
+        return result
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _running.release()
@@ -0,0 +1,237 @@
+"""
+Query Executor
+Ejecuta las consultas síncronas de Supabase fuera del event loop, con
+deadline por llamada, hedging de lecturas lentas e instrumentación
+"""
+import asyncio
+import inspect
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from app.utils import request_budget, server_timing
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.metrics import registry
+
+T = TypeVar("T")
+
+query_seconds = registry.histogram(
+    "recommender_db_query_seconds",
+    "Supabase call latency, hedges included",
+    ("operation", "outcome")
+)
+
+
+class QueryTimeout(Exception):
+    """La consulta no terminó antes de su deadline"""
+
+
+class LatencyWindow:
+    """Latencias recientes de una operación, para estimar percentiles"""
+
+    def __init__(self, size: int = 512):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class QueryExecutor:
+    """
+    Corre consultas bloqueantes en threads con deadline y hedging opcional
+
+    Con hedging, si una lectura supera el percentil hedge_quantile de las
+    latencias recientes de su operación, se lanza una copia y se usa la
+    primera que responda. Si la consulta es síncrona la que pierde no se
+    puede cancelar y termina en su thread sin afectar la respuesta; si es
+    una corrutina (asyncpg) se cancela.
+
+    Con un breaker, cada llamada pide permiso antes de empezar (lanza
+    CircuitOpenError sin esperar si el circuito está abierto) y reporta
+    su resultado y latencia al terminar.
+
+    El deadline efectivo es el menor entre el de la llamada y lo que le
+    queda al request en curso (request_budget); si se corta por el
+    presupuesto del request no cuenta como falla de la base de datos.
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: Optional[float] = 10.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            deadline_seconds: Tiempo máximo por llamada, con hedges (None = sin deadline)
+            hedge: Activa las lecturas duplicadas
+            hedge_quantile: Percentil de latencia desde el que se duplica
+            hedge_min_delay: Espera mínima antes de duplicar
+            hedge_min_samples: Muestras necesarias antes de duplicar
+            breaker: Circuit breaker de la dependencia (None = sin breaker)
+        """
+        self.deadline_seconds = deadline_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker
+        self._latency: Dict[str, LatencyWindow] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, operation: str, counter: str):
+        counters = self._counters.setdefault(
+            operation,
+            {"calls": 0, "errors": 0, "timeouts": 0, "rejected": 0, "hedges_fired": 0, "hedges_won": 0}
+        )
+        counters[counter] += 1
+
+    def _hedge_delay(self, operation: str) -> Optional[float]:
+        window = self._latency.get(operation)
+        if not self.hedge or window is None or len(window.samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, window.quantile(self.hedge_quantile))
+
+    async def run(
+        self,
+        operation: str,
+        call: Callable[[], T],
+        hedge: bool = True,
+        deadline_seconds: Optional[float] = None
+    ) -> T:
+        """
+        Ejecuta call() en un thread, o como tarea si es una función async
+
+        Args:
+            operation: Nombre para agrupar latencias y contadores
+            call: Función bloqueante (p. ej. query.execute) o corrutina
+            hedge: Permite duplicarla (sólo para lecturas idempotentes)
+            deadline_seconds: Reemplaza el deadline por defecto
+
+        Raises:
+            QueryTimeout: Si no hay respuesta antes del deadline
+            DeadlineExceeded: Si el request se queda sin presupuesto
+            CircuitOpenError: Si el breaker rechaza la llamada
+        """
+        deadline = deadline_seconds if deadline_seconds is not None else self.deadline_seconds
+        budget = request_budget.remaining()
+        by_budget = budget is not None and (deadline is None or budget < deadline)
+        if by_budget:
+            if budget <= 0:
+                self._count(operation, "rejected")
+                raise request_budget.DeadlineExceeded(f"{operation} skipped, request deadline exceeded")
+            deadline = budget
+
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except Exception:
+                self._count(operation, "rejected")
+                raise
+        self._count(operation, "calls")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._run_hedged(operation, call, hedge), deadline)
+        except asyncio.TimeoutError:
+            self._count(operation, "timeouts")
+            query_seconds.observe(time.perf_counter() - started, operation, "timeout")
+            if by_budget:
+                self._abandon()
+                raise request_budget.DeadlineExceeded(f"{operation} cut by request deadline") from None
+            self._record(False, started)
+            raise QueryTimeout(f"{operation} exceeded {deadline}s") from None
+        except asyncio.CancelledError:
+            # El request se canceló (cliente desconectado): no dice nada de la base
+            self._abandon()
+            raise
+        except BaseException:
+            self._count(operation, "errors")
+            self._record(False, started)
+            query_seconds.observe(time.perf_counter() - started, operation, "error")
+            raise
+        finally:
+            server_timing.add("db", time.perf_counter() - started)
+        elapsed = time.perf_counter() - started
+        self._record(True, started)
+        self._latency.setdefault(operation, LatencyWindow()).add(elapsed)
+        query_seconds.observe(elapsed, operation, "ok")
+        return result
+
+    def _record(self, success: bool, started: float):
+        if self.breaker is not None:
+            self.breaker.record(success, time.perf_counter() - started)
+
+    def _abandon(self):
+        if self.breaker is not None:
+            self.breaker.abandon()
+
+    @staticmethod
+    def _start(call: Callable[[], Any]) -> "asyncio.Future":
+        if inspect.iscoroutinefunction(call):
+            return asyncio.ensure_future(call())
+        return asyncio.ensure_future(asyncio.to_thread(call))
+
+    async def _run_hedged(self, operation: str, call: Callable[[], T], hedge: bool) -> T:
+        primary = self._start(call)
+        delay = self._hedge_delay(operation) if hedge else None
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count(operation, "hedges_fired")
+        backup = self._start(call)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count(operation, "hedges_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                if inspect.iscoroutinefunction(call):
+                    task.cancel()
+                # Un thread sigue corriendo; sólo se descarta su resultado
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Contadores y percentiles de latencia por operación"""
+        stats = {}
+        for operation, counters in self._counters.items():
+            window = self._latency.get(operation)
+            stats[operation] = {
+                **counters,
+                "p50_ms": round(window.quantile(0.5) * 1000, 2) if window and window.samples else None,
+                "p95_ms": round(window.quantile(0.95) * 1000, 2) if window and window.samples else None
+            }
+        return stats
+
+    @classmethod
+    def from_env(cls) -> "QueryExecutor":
+        """Crea el executor con la configuración del entorno"""
+        deadline = os.getenv("SUPABASE_DEADLINE_SECONDS", "10")
+        return cls(
+            deadline_seconds=float(deadline) if deadline else None,
+            hedge=os.getenv("SUPABASE_HEDGE_REQUESTS", "false").lower() == "true",
+            hedge_quantile=float(os.getenv("SUPABASE_HEDGE_QUANTILE", "0.95")),
+            hedge_min_delay=float(os.getenv("SUPABASE_HEDGE_MIN_DELAY_SECONDS", "0.05")),
+            breaker=CircuitBreaker.from_env()
+        )
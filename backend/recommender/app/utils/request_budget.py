@@ -0,0 +1,54 @@
+"""
+Request Budget
+Deadline y modo económico del request en curso, propagados con contextvars
+"""
+import time
+from contextvars import ContextVar, Token
+from typing import Optional, Tuple
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+_cheap: ContextVar[bool] = ContextVar("request_cheap", default=False)
+
+
+class DeadlineExceeded(Exception):
+    """El request agotó su presupuesto de tiempo"""
+
+
+def start(budget_seconds: Optional[float], cheap: bool = False) -> Tuple[Token, Token]:
+    """
+    Fija el presupuesto del request actual (None = sin deadline)
+
+    Las tareas creadas después heredan el contexto, así que el deadline
+    llega a las consultas y a la puntuación sin pasarlo como argumento.
+    """
+    deadline = time.monotonic() + budget_seconds if budget_seconds is not None else None
+    return _deadline.set(deadline), _cheap.set(cheap)
+
+
+def reset(tokens: Tuple[Token, Token]):
+    """Restaura el contexto anterior a start()"""
+    _deadline.reset(tokens[0])
+    _cheap.reset(tokens[1])
+
+
+def remaining() -> Optional[float]:
+    """Segundos que le quedan al request (None = sin deadline)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check():
+    """
+    Raises:
+        DeadlineExceeded: Si el presupuesto ya se agotó
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def cheap_mode() -> bool:
+    """True si el request fue admitido bajo presión y debe usar el camino barato"""
+    return _cheap.get()
@@ -0,0 +1,125 @@
+"""
+Row Decoders
+Decodificación compilada (msgspec) de las respuestas de PostgREST
+
+Las respuestas se decodifican de bytes directo a structs tipados, sin
+pasar por los dicts anidados de response.data (un dict por fila, otro por
+users y otro por cada product_images). Los structs usan gc=False: no
+forman ciclos y el recolector no los recorre.
+
+Record da acceso por clave (record["id"], record.get("sales")) para que los
+registros de catálogo sirvan donde se esperaban dicts (CatalogSnapshot),
+ocupando una fracción de la memoria.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+import msgspec
+
+
+class Record(msgspec.Struct, gc=False):
+    """Struct con acceso de sólo lectura por clave, como el dict que reemplaza"""
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+
+class ImageRow(Record):
+    """product_images!product_id(image_url, thumbnail_url, thumbnails)"""
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    # jsonb, aunque algunas filas antiguas lo traen como string JSON
+    thumbnails: Union[Dict[str, str], str, None] = None
+
+
+class SupplierRow(Record):
+    """users!supplier_id(user_nm)"""
+    user_nm: Optional[str] = None
+
+
+class ProductRow(Record):
+    """Fila de products; las columnas no seleccionadas quedan en su default"""
+    productid: str
+    productnm: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    productqty: Optional[int] = None
+    is_active: Optional[bool] = None
+    supplier_id: Optional[str] = None
+    users: Optional[SupplierRow] = None
+    product_images: Optional[List[ImageRow]] = None
+    description: Optional[str] = None
+    spec_name: Optional[str] = None
+    spec_value: Optional[str] = None
+    min_quantity: Optional[int] = None
+
+
+class SaleRow(Record):
+    """Fila de product_sales"""
+    product_id: str
+    quantity: Optional[int] = None
+
+
+class TierRow(Record):
+    """Fila de product_quantity_ranges (y tramo de precio de un registro de catálogo)"""
+    product_id: Optional[str] = None
+    min_quantity: int = 1
+    max_quantity: Optional[int] = None
+    price: float = 0.0
+
+
+class DeliveryRow(Record):
+    """Fila de product_delivery_regions (y región de despacho de un registro de catálogo)"""
+    product_id: str
+    region: str
+    price: float = 0.0
+    delivery_days: int = 0
+
+
+class OrderUserRow(Record):
+    """orders!order_id(user_id)"""
+    user_id: str
+
+
+class PurchaseRow(Record):
+    """Fila de product_sales con el comprador de su orden"""
+    product_id: str
+    trx_date: datetime
+    order_id: Optional[str] = None
+    orders: Optional[OrderUserRow] = None
+
+
+class CatalogRecord(Record):
+    """Registro con el formato de fetch_catalog"""
+    id: str
+    name: str
+    category: str
+    price: float
+    stock: int
+    image_url: str
+    active: bool
+    provider_id: str
+    provider_name: str
+    thumbnail_url: Optional[str]
+    thumbnails: Dict[str, str]
+    description: str
+    spec_name: str
+    spec_value: str
+    min_quantity: int
+    sales: int
+    price_tiers: List[TierRow]
+    delivery_regions: List[DeliveryRow]
+
+
+# Los decoders compilan el esquema una vez; decode() es seguro entre hilos
+product_rows = msgspec.json.Decoder(List[ProductRow])
+sale_rows = msgspec.json.Decoder(List[SaleRow])
+tier_rows = msgspec.json.Decoder(List[TierRow])
+delivery_rows = msgspec.json.Decoder(List[DeliveryRow])
+purchase_rows = msgspec.json.Decoder(List[PurchaseRow])
@@ -0,0 +1,240 @@
+"""
+Seen Filters
+Conjuntos compactos de productos ya vistos / excluidos por usuario
+"""
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Container, Dict, Any, Sequence, Tuple
+
+import numpy as np
+
+
+def _hashes(key: str) -> Tuple[int, int]:
+    """(h1, h2) del doble hashing: las dos mitades de un blake2b de 128 bits"""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+def key_hashes(keys: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (h1, h2) de muchos IDs como arrays uint64, para consultar con contains_hashed
+
+    El catálogo los calcula una vez por snapshot; después cada consulta a un
+    filtro son operaciones de NumPy sobre las filas candidatas.
+    """
+    digests = b"".join(hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest() for key in keys)
+    pairs = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+    return pairs[:, 0].astype(np.uint64), pairs[:, 1] | np.uint64(1)
+
+
+class BloomFilter:
+    """
+    Bloom filter sobre IDs de producto
+
+    Usa doble hashing (Kirsch-Mitzenmacher) sobre un digest blake2b de 128
+    bits, así cada consulta cuesta un hash y k accesos a bits. Con los
+    hashes ya calculados (key_hashes) la consulta se vectoriza.
+    """
+
+    def __init__(self, capacity: int = 2000, error_rate: float = 0.01):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0.0 < error_rate < 1.0:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        h1, h2 = _hashes(key)
+        m = self.num_bits
+        return ((h1 + i * h2) % m for i in range(self.num_hashes))
+
+    def add(self, key: str):
+        """Agrega un ID al filtro"""
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, keys: Iterable[str]):
+        """Agrega varios IDs al filtro"""
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def contains_hashed(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """
+        `in` vectorizado: máscara de los IDs (por sus hashes) que están en el filtro
+
+        (h1 + i * h2) % m se calcula como (h1 % m + i * (h2 % m)) % m, que da
+        las mismas posiciones que _positions sin desbordar uint64.
+        """
+        m = np.uint64(self.num_bits)
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        step = h2 % m
+        pos = h1 % m
+        found = np.ones(len(h1), dtype=bool)
+        for i in range(self.num_hashes):
+            if i:
+                pos += step
+                pos %= m
+            found &= ((bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).view(bool)
+        return found
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class RotatingBloomFilter:
+    """
+    Par de Bloom filters con rotación por generaciones
+
+    Los IDs nuevos van a la generación actual. Cuando ésta se llena o supera
+    su edad máxima, pasa a ser la generación anterior y la más antigua se
+    descarta, de modo que lo visto "decae" después de una o dos rotaciones.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 2000,
+        error_rate: float = 0.01,
+        rotate_seconds: Optional[float] = None
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_seconds = rotate_seconds
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        self.rotated_at = time.monotonic()
+
+    def _maybe_rotate(self):
+        expired = (
+            self.rotate_seconds is not None
+            and time.monotonic() - self.rotated_at >= self.rotate_seconds
+        )
+        if self.current.is_full or expired:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = time.monotonic()
+
+    def add(self, key: str):
+        """Agrega un ID, rotando la generación si corresponde"""
+        self._maybe_rotate()
+        self.current.add(key)
+
+    def update(self, keys: Iterable[str]):
+        """Agrega varios IDs"""
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        self._maybe_rotate()
+        if key in self.current:
+            return True
+        return self.previous is not None and key in self.previous
+
+    def contains_hashed(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """`in` vectorizado sobre las dos generaciones (ver BloomFilter.contains_hashed)"""
+        self._maybe_rotate()
+        found = self.current.contains_hashed(h1, h2)
+        if self.previous is not None:
+            found |= self.previous.contains_hashed(h1, h2)
+        return found
+
+    @property
+    def nbytes(self) -> int:
+        return self.current.nbytes + (self.previous.nbytes if self.previous else 0)
+
+
+class ExclusionSet:
+    """
+    Une varias fuentes de exclusión detrás de un único `in`
+
+    Acepta sets, frozensets, Bloom filters o cualquier contenedor, así la
+    exclusión por candidato es O(1) sin importar de dónde venga.
+    """
+
+    def __init__(self, *sources: Optional[Container[str]]):
+        self.sources = [source for source in sources if source]
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in source for source in self.sources)
+
+    def __bool__(self) -> bool:
+        return bool(self.sources)
+
+
+class SeenStore:
+    """
+    Conjuntos de productos vistos por usuario
+
+    Mantiene un RotatingBloomFilter por usuario, con un máximo de usuarios
+    en memoria (se descarta el menos usado recientemente).
+    """
+
+    def __init__(
+        self,
+        capacity: int = 2000,
+        error_rate: float = 0.01,
+        rotate_seconds: Optional[float] = 7 * 24 * 3600,
+        max_users: int = 10000
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_seconds = rotate_seconds
+        self.max_users = max_users
+        self._filters: "OrderedDict[str, RotatingBloomFilter]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[RotatingBloomFilter]:
+        """Retorna el filtro del usuario, o None si no tiene historial"""
+        seen = self._filters.get(user_id)
+        if seen is not None:
+            self._filters.move_to_end(user_id)
+        return seen
+
+    def mark_seen(self, user_id: str, product_ids: Iterable[str]):
+        """Registra productos como vistos por el usuario"""
+        seen = self.get(user_id)
+        if seen is None:
+            seen = RotatingBloomFilter(self.capacity, self.error_rate, self.rotate_seconds)
+            self._filters[user_id] = seen
+            while len(self._filters) > self.max_users:
+                self._filters.popitem(last=False)
+        seen.update(product_ids)
+
+    def clear(self, user_id: str):
+        """Olvida el historial de un usuario"""
+        self._filters.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._filters),
+            "bytes": sum(seen.nbytes for seen in self._filters.values())
+        }
+
+    @classmethod
+    def from_env(cls) -> "SeenStore":
+        """Crea el store con la configuración del entorno"""
+        rotate = os.getenv("SEEN_FILTER_ROTATE_SECONDS", str(7 * 24 * 3600))
+        return cls(
+            capacity=int(os.getenv("SEEN_FILTER_CAPACITY", "2000")),
+            error_rate=float(os.getenv("SEEN_FILTER_ERROR_RATE", "0.01")),
+            rotate_seconds=float(rotate) if rotate else None,
+            max_users=int(os.getenv("SEEN_FILTER_MAX_USERS", "10000"))
+        )
@@ -0,0 +1,132 @@
+"""
+Serialization
+Respuestas JSON con orjson y productos pre-codificados como fragmentos de bytes
+"""
+import struct
+import zlib
+from collections.abc import Sequence
+from typing import List, Dict, Any, Optional, Iterable
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from app.utils import server_timing
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content: Any) -> bytes:
+    """Codifica a JSON con orjson (acepta escalares y arrays de NumPy)"""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ProductPage):
+        return list(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def with_fields(fragment: bytes, fields: Optional[Dict[str, Any]]) -> bytes:
+    """
+    Agrega campos a un objeto JSON ya codificado sin decodificarlo
+
+    '{"id":"a"}' + {"score": 1} -> '{"id":"a","score":1}'
+    """
+    if not fields:
+        return fragment
+    return fragment[:-1] + b"," + dumps(fields)[1:]
+
+
+class ProductPage(Sequence):
+    """
+    Página de productos lista para enviar
+
+    Guarda cada producto como un objeto JSON ya codificado, de modo que la
+    respuesta se arma concatenando bytes. Indexarla o iterarla decodifica
+    los productos a dicts (para usos fuera del camino caliente).
+    """
+
+    def __init__(self, ids: List[str], fragments: List[bytes]):
+        self.ids = ids
+        self.fragments = fragments
+
+    @classmethod
+    def from_products(cls, products: Iterable[Dict[str, Any]]) -> "ProductPage":
+        """Codifica una lista de dicts de producto"""
+        products = list(products)
+        return cls([p["id"] for p in products], [dumps(p) for p in products])
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ProductPage(self.ids[index], self.fragments[index])
+        return orjson.loads(self.fragments[index])
+
+    def encode(self) -> bytes:
+        """Arreglo JSON con todos los productos"""
+        return b"[" + b",".join(self.fragments) + b"]"
+
+    def to_bytes(self) -> bytes:
+        """
+        Formato binario compacto para cachés compartidos
+
+        Cabecera (n, largo de ids), largos de cada fragmento, ids separados
+        por saltos de línea y los fragmentos, todo comprimido con zlib.
+        """
+        n = len(self.fragments)
+        ids = "\n".join(self.ids).encode("utf-8")
+        payload = b"".join((
+            struct.pack("<II", n, len(ids)),
+            struct.pack(f"<{n}I", *map(len, self.fragments)),
+            ids,
+            *self.fragments
+        ))
+        return zlib.compress(payload, 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ProductPage":
+        """Inverso de to_bytes"""
+        payload = zlib.decompress(data)
+        n, ids_length = struct.unpack_from("<II", payload)
+        offset = 8
+        lengths = struct.unpack_from(f"<{n}I", payload, offset)
+        offset += 4 * n
+        ids = payload[offset:offset + ids_length].decode("utf-8").split("\n") if n else []
+        offset += ids_length
+        fragments = []
+        for length in lengths:
+            fragments.append(payload[offset:offset + length])
+            offset += length
+        return cls(ids, fragments)
+
+
+def encode(content: Any) -> bytes:
+    """
+    Codifica una respuesta, insertando las ProductPage tal como están
+
+    Sólo se recorren los dicts de primer nivel; cualquier otro valor se
+    delega completo a orjson.
+    """
+    if isinstance(content, ProductPage):
+        return content.encode()
+    if isinstance(content, dict) and any(isinstance(v, ProductPage) for v in content.values()):
+        parts = [dumps(str(key)) + b":" + encode(value) for key, value in content.items()]
+        return b"{" + b",".join(parts) + b"}"
+    return dumps(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse codificada con orjson
+
+    Retornarla desde un endpoint evita jsonable_encoder y la validación
+    genérica de FastAPI; el contenido ya debe ser serializable.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with server_timing.stage("serialize"):
+            return encode(content)
@@ -0,0 +1,51 @@
+"""
+Server Timing
+Acumula la duración de cada etapa del request en curso (db, score, ...)
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional
+
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("server_timing", default=None)
+
+
+def start() -> Token:
+    """Empieza a registrar etapas para el request actual"""
+    return _stages.set({})
+
+
+def reset(token: Token):
+    _stages.reset(token)
+
+
+def current() -> Optional[Dict[str, float]]:
+    """Etapas registradas hasta ahora (None fuera de un request medido)"""
+    return _stages.get()
+
+
+def add(stage: str, seconds: float):
+    """Suma `seconds` a la etapa (no hace nada si el request no se mide)"""
+    stages = _stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Mide el bloque como parte de la etapa `name`"""
+    if _stages.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+def header(stages: Dict[str, float], total: float) -> bytes:
+    """Valor del header Server-Timing, en milisegundos"""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
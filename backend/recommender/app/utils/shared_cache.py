@@ -0,0 +1,349 @@
+"""
+Shared Cache
+Caché de dos niveles: L1 en el proceso y L2 compartido entre réplicas (Redis)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
+from urllib.parse import urlparse
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(namespace: str, version: str, **params: Any) -> str:
+    """
+    Clave estable entre réplicas y reinicios
+
+    Los parámetros se ordenan y se resumen con blake2b (no con hash(), que
+    cambia por proceso), así la misma consulta produce la misma clave.
+    """
+    encoded = orjson.dumps(params, option=orjson.OPT_SORT_KEYS)
+    digest = hashlib.blake2b(encoded, digest_size=12).hexdigest()
+    return f"rec:{namespace}:{version}:{digest}"
+
+
+class CacheBackend(Protocol):
+    """Almacén clave -> bytes con TTL por clave"""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl: float, only_if_absent: bool = False) -> bool: ...
+
+    async def delete(self, key: str): ...
+
+
+class MemoryBackend:
+    """
+    Backend en memoria con LRU y TTL
+
+    Es el L1 de cada réplica y sirve también como reemplazo local del L2
+    (misma interfaz que RedisBackend) en desarrollo.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float, only_if_absent: bool = False) -> bool:
+        if only_if_absent and await self.get(key) is not None:
+            return False
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisError(Exception):
+    """Respuesta de error del servidor Redis"""
+
+
+class RedisBackend:
+    """
+    Cliente mínimo del protocolo de Redis (RESP) sobre asyncio
+
+    Sólo usa GET, SET (PX / NX) y DEL, así que funciona con Redis, Valkey,
+    KeyDB o cualquier servidor compatible. Mantiene un pool pequeño de
+    conexiones y cada comando tiene un timeout: el caché nunca debe hacer
+    esperar a una respuesta.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 0.1,
+        pool_size: int = 4
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool: "asyncio.LifoQueue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisBackend":
+        """redis://[:password@]host[:port][/db]"""
+        parsed = urlparse(url)
+        db = parsed.path.lstrip("/")
+        return cls(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=parsed.password,
+            **kwargs
+        )
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await cls._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unexpected reply type {kind!r}")
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(self._encode("AUTH", self.password))
+            await writer.drain()
+            await self._read_reply(reader)
+        if self.db:
+            writer.write(self._encode("SELECT", self.db))
+            await writer.drain()
+            await self._read_reply(reader)
+        return reader, writer
+
+    async def _execute(self, *args: Any) -> Any:
+        async with self._slots:
+            conn = self._pool.get_nowait() if not self._pool.empty() else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout)
+                reader, writer = conn
+                writer.write(self._encode(*args))
+                await asyncio.wait_for(writer.drain(), self.timeout)
+                reply = await asyncio.wait_for(self._read_reply(reader), self.timeout)
+            except BaseException:
+                # Una conexión con una respuesta a medio leer no se reutiliza
+                if conn is not None:
+                    conn[1].close()
+                raise
+            self._pool.put_nowait(conn)
+            return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float, only_if_absent: bool = False) -> bool:
+        args: List[Any] = ["SET", key, value, "PX", max(1, int(ttl * 1000))]
+        if only_if_absent:
+            args.append("NX")
+        return await self._execute(*args) is not None
+
+    async def delete(self, key: str):
+        await self._execute("DEL", key)
+
+    async def close(self):
+        while not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+
+
+class TieredCache:
+    """
+    L1 por réplica delante de un L2 compartido
+
+    Un valor se calcula una vez por clúster: la réplica que no lo encuentra
+    toma un lock en el L2 (SET NX) y las demás esperan a que aparezca. Los
+    errores del L2 se registran y se tratan como un miss.
+    """
+
+    def __init__(
+        self,
+        l1: Optional[MemoryBackend] = None,
+        l2: Optional[CacheBackend] = None,
+        l1_ttl: float = 10.0,
+        lock_ttl: float = 5.0,
+        lock_wait: float = 0.5
+    ):
+        """
+        Args:
+            l1: Caché del proceso
+            l2: Caché compartido (None = sólo L1)
+            l1_ttl: TTL máximo en L1 (acota cuánto puede divergir una réplica)
+            lock_ttl: Vida del lock de cálculo en L2
+            lock_wait: Máximo que se espera a otra réplica antes de calcular
+        """
+        self.l1 = l1 if l1 is not None else MemoryBackend()
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self._inflight: Dict[str, "asyncio.Future[bytes]"] = {}
+        self.stats: Dict[str, int] = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0}
+
+    async def _l2(self, method: str, *args: Any) -> Any:
+        if self.l2 is None:
+            return None
+        try:
+            return await getattr(self.l2, method)(*args)
+        except Exception as e:
+            self.stats["l2_errors"] += 1
+            logger.warning("Shared cache %s failed: %s", method, e)
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Busca en L1 y luego en L2"""
+        value = await self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        value = await self._l2("get", key)
+        if value is not None:
+            self.stats["l2_hits"] += 1
+            await self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        """Guarda en ambos niveles"""
+        await self.l1.set(key, value, min(ttl, self.l1_ttl))
+        await self._l2("set", key, value, ttl)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[bytes]],
+        cacheable: Optional[Callable[[], bool]] = None
+    ) -> bytes:
+        """
+        Retorna el valor cacheado o lo calcula una sola vez
+
+        Dentro de la réplica, las llamadas concurrentes para la misma clave
+        comparten un único cálculo. Si cacheable() es False después de
+        calcular, el valor se retorna sin guardarse en ningún nivel.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future: "asyncio.Future[bytes]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_once(key, ttl, compute, cacheable)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita el warning de excepción no leída si nadie esperaba
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _compute_once(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[bytes]],
+        cacheable: Optional[Callable[[], bool]] = None
+    ) -> bytes:
+        lock_key = key + ":lock"
+        # True: lock tomado, False: otra réplica lo tiene, None: sin L2 o L2 caído
+        acquired = await self._l2("set", lock_key, b"1", self.lock_ttl, True)
+        owns_lock = acquired is True
+        if acquired is False:
+            # Otra réplica lo está calculando
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                value = await self._l2("get", key)
+                if value is not None:
+                    self.stats["l2_hits"] += 1
+                    await self.l1.set(key, value, min(ttl, self.l1_ttl))
+                    return value
+
+        self.stats["misses"] += 1
+        try:
+            value = await compute()
+            if cacheable is None or cacheable():
+                await self.set(key, value, ttl)
+        finally:
+            if owns_lock:
+                await self._l2("delete", lock_key)
+        return value
+
+    @classmethod
+    def from_env(cls) -> "TieredCache":
+        """Crea el caché con la configuración del entorno (sin SHARED_CACHE_URL, sólo L1)"""
+        url = os.getenv("SHARED_CACHE_URL", "")
+        l2: Optional[CacheBackend] = None
+        if url.startswith("memory://"):
+            l2 = MemoryBackend()
+        elif url:
+            l2 = RedisBackend.from_url(
+                url,
+                timeout=float(os.getenv("SHARED_CACHE_TIMEOUT_SECONDS", "0.1"))
+            )
+        return cls(
+            l1=MemoryBackend(int(os.getenv("SHARED_CACHE_L1_SIZE", "10000"))),
+            l2=l2,
+            l1_ttl=float(os.getenv("SHARED_CACHE_L1_TTL_SECONDS", "10"))
+        )
@@ -0,0 +1,316 @@
+"""
+Synthetic Catalog
+Catálogos sintéticos reproducibles (10k a millones de productos) para
+desarrollo sin Supabase y benchmarks
+
+    python -m app.utils.synthetic_catalog --products 1000000 --output catalog.db
+    DATA_SOURCE=sqlite://catalog.db uvicorn app.main:app
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+# (categoría, peso, precio mediano en CLP, productos, (spec, valores))
+CATEGORIES = (
+    ("Alimentos y Bebidas", 0.16, 6_000,
+     ("Café en grano", "Aceite de oliva", "Arroz grado 1", "Miel de ulmo", "Té verde",
+      "Galletas de avena", "Mermelada de frambuesa", "Harina integral", "Jugo natural"),
+     ("Formato", ("250 g", "500 g", "1 kg", "5 kg", "1 L", "5 L", "Caja 12 un"))),
+    ("Hogar y Muebles", 0.12, 35_000,
+     ("Silla de comedor", "Lámpara de pie", "Juego de sábanas", "Cojín decorativo",
+      "Repisa flotante", "Alfombra", "Cortina blackout", "Set de ollas"),
+     ("Material", ("Madera", "Metal", "Algodón", "Poliéster", "Vidrio", "Acero inoxidable"))),
+    ("Ferretería y Construcción", 0.11, 18_000,
+     ("Taladro percutor", "Set de llaves", "Pintura látex", "Huincha de medir",
+      "Escalera de aluminio", "Caja de tornillos", "Sierra circular", "Guantes de trabajo"),
+     ("Potencia", ("500 W", "750 W", "1000 W", "1500 W", "No aplica"))),
+    ("Electrónica", 0.10, 90_000,
+     ("Audífonos inalámbricos", "Parlante bluetooth", "Monitor", "Teclado mecánico",
+      "Mouse ergonómico", "Cargador USB-C", "Smartwatch", "Cámara web"),
+     ("Conectividad", ("Bluetooth", "USB-C", "Wi-Fi", "HDMI", "Inalámbrico 2.4 GHz"))),
+    ("Vestuario y Calzado", 0.10, 22_000,
+     ("Polera de algodón", "Chaqueta cortaviento", "Zapatilla urbana", "Jeans recto",
+      "Polerón canguro", "Pack de calcetines", "Gorro de lana"),
+     ("Talla", ("S", "M", "L", "XL", "38", "40", "42"))),
+    ("Salud y Belleza", 0.09, 12_000,
+     ("Crema hidratante", "Shampoo sólido", "Protector solar", "Jabón artesanal",
+      "Aceite esencial", "Cepillo de dientes de bambú"),
+     ("Contenido", ("50 ml", "100 ml", "250 ml", "500 ml", "Pack 3 un"))),
+    ("Deportes y Outdoor", 0.07, 30_000,
+     ("Mochila de trekking", "Botella térmica", "Colchoneta de yoga", "Mancuernas",
+      "Carpa 2 personas", "Bicicleta estática"),
+     ("Capacidad", ("1 L", "20 L", "40 L", "2 personas", "10 kg"))),
+    ("Oficina y Papelería", 0.07, 8_000,
+     ("Resma de papel", "Cuaderno universitario", "Set de destacadores", "Archivador",
+      "Silla ergonómica", "Calculadora científica"),
+     ("Formato", ("Carta", "Oficio", "A4", "Pack 10 un", "Unidad"))),
+    ("Juguetes y Bebés", 0.06, 15_000,
+     ("Bloques de construcción", "Peluche", "Rompecabezas", "Pañales", "Mamadera",
+      "Juego de mesa"),
+     ("Edad", ("0-12 meses", "1-3 años", "3-6 años", "6+ años", "Familiar"))),
+    ("Mascotas", 0.05, 14_000,
+     ("Alimento para perro", "Arena sanitaria", "Cama para gato", "Collar ajustable",
+      "Juguete mordedor"),
+     ("Tamaño", ("Pequeño", "Mediano", "Grande", "3 kg", "15 kg"))),
+    ("Automotriz", 0.04, 25_000,
+     ("Aceite de motor", "Limpiaparabrisas", "Cubre asientos", "Cargador para auto",
+      "Kit de emergencia"),
+     ("Compatibilidad", ("Universal", "Sedán", "SUV", "Camioneta"))),
+    ("Jardín y Terraza", 0.03, 28_000,
+     ("Manguera", "Set de macetas", "Tierra de hoja", "Silla de terraza", "Tijera de podar"),
+     ("Medida", ("15 m", "25 m", "Set 3 un", "50 L", "Unidad"))),
+)
+
+BRANDS = (
+    "Andes Pro", "Kütral", "Maipo", "Nativa", "Copihue", "Pacífico", "Altiplano",
+    "Cordillera", "Huemul", "Pudú", "Araucaria", "Quillay", "Boldo", "Raulí",
+    "Coihue", "Lenga", "Tepa", "Ulmo", "Chilco", "Calafate", "Maqui", "Peumo",
+)
+
+ADJECTIVES = (
+    "resistente", "liviano", "de alta calidad", "ideal para uso profesional",
+    "con garantía de 12 meses", "fabricado en Chile", "de bajo consumo", "ecológico",
+    "de uso diario", "compacto", "con envío rápido", "para venta al por mayor",
+)
+
+COMPANY_SUFFIXES = ("SpA", "Ltda.", "EIRL", "S.A.", "Comercial", "Distribuidora")
+
+# Regiones de norte a sur (mismos valores que el panel de control)
+REGIONS = (
+    "arica-parinacota", "tarapaca", "antofagasta", "atacama", "coquimbo", "valparaiso",
+    "metropolitana", "ohiggins", "maule", "nuble", "biobio", "araucania", "los-rios",
+    "los-lagos", "aysen", "magallanes",
+)
+# Región de origen de los proveedores (concentrados en la zona central)
+SUPPLIER_REGION_WEIGHTS = (
+    0.01, 0.02, 0.03, 0.01, 0.04, 0.12, 0.50, 0.04, 0.04, 0.02, 0.08, 0.03, 0.02, 0.03, 0.005, 0.005,
+)
+
+# Registros por bloque de valores aleatorios (cada bloque tiene su semilla)
+_BLOCK = 4096
+# Publicaciones anteriores entre las que un clon elige su fuente
+CLONE_WINDOW = 50_000
+
+IMAGE_BASE = "https://images.example.com/products"
+THUMBNAIL_SIZES = ("desktop", "tablet", "mobile", "minithumb")
+
+
+def _normalized(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _round_price(prices: np.ndarray) -> np.ndarray:
+    """Precios terminados en 990 (o 90 bajo $1.000), como en el retail chileno"""
+    rounded = np.where(prices >= 1000, np.ceil(prices / 1000) * 1000 - 10, np.ceil(prices / 100) * 100 - 10)
+    return np.maximum(rounded, 490.0)
+
+
+def iter_catalog(
+    n: int,
+    seed: int = 42,
+    chunk_size: int = 50_000,
+    duplicate_rate: float = 0.03
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Genera el catálogo en lotes de hasta chunk_size registros
+
+    Los registros tienen el formato de fetch_catalog. Distribuciones:
+    categorías con pesos fijos, proveedores con popularidad tipo Zipf (pocos
+    proveedores concentran la mayoría de los productos), precios log-normales
+    por categoría, 0-3 tramos de precio por volumen, ventas con cola larga,
+    ~8% sin stock, ~8% sin imagen y distintos grados de miniaturas, despacho
+    a regiones cercanas al proveedor y una fracción de publicaciones clonadas
+    (mismo texto, otro proveedor, de entre las CLONE_WINDOW anteriores) para
+    el índice de casi-duplicados.
+
+    Los valores de cada registro salen de bloques fijos de _BLOCK registros
+    con su propia semilla, no de los lotes: la misma semilla produce el
+    mismo catálogo con cualquier chunk_size.
+    """
+    chunk: List[Dict[str, Any]] = []
+    for block in _iter_blocks(n, seed, duplicate_rate):
+        chunk.extend(block)
+        while len(chunk) >= chunk_size:
+            yield chunk[:chunk_size]
+            chunk = chunk[chunk_size:]
+    if chunk:
+        yield chunk
+
+
+def _iter_blocks(n: int, seed: int, duplicate_rate: float) -> Iterator[List[Dict[str, Any]]]:
+    rng = np.random.default_rng(seed)
+    category_weights = _normalized([c[1] for c in CATEGORIES])
+    n_suppliers = max(5, n // 40)
+
+    # Proveedores: nombre, región de origen y popularidad (Zipf s=1.1)
+    supplier_regions = rng.choice(len(REGIONS), size=n_suppliers, p=_normalized(SUPPLIER_REGION_WEIGHTS)).tolist()
+    supplier_weights = _normalized(1.0 / np.arange(1, n_suppliers + 1) ** 1.1)
+    supplier_names = [
+        f"{BRANDS[i % len(BRANDS)]} {COMPANY_SUFFIXES[(i // len(BRANDS)) % len(COMPANY_SUFFIXES)]} {i:05d}"
+        for i in range(n_suppliers)
+    ]
+    # Parámetros de texto (categoría, proveedor, palabras) de las últimas
+    # CLONE_WINDOW publicaciones, por índice % CLONE_WINDOW: fuente de los clones
+    window = min(n, CLONE_WINDOW) or 1
+    ring_categories = np.zeros(window, dtype=np.int64)
+    ring_suppliers = np.zeros(window, dtype=np.int64)
+    ring_words = np.zeros((window, 6), dtype=np.int64)
+
+    for start in range(0, n, _BLOCK):
+        size = min(_BLOCK, n - start)
+        block_rng = np.random.default_rng([seed, start // _BLOCK])
+
+        categories = block_rng.choice(len(CATEGORIES), size=size, p=category_weights)
+        medians = np.array([c[2] for c in CATEGORIES], dtype=np.float64)[categories]
+        prices = _round_price(medians * block_rng.lognormal(0.0, 0.7, size))
+        suppliers = block_rng.choice(n_suppliers, size=size, p=supplier_weights)
+        stock = np.where(
+            block_rng.random(size) < 0.08, 0,
+            np.minimum(block_rng.lognormal(3.5, 1.3, size).astype(np.int64) + 1, 100_000)
+        )
+        active = block_rng.random(size) >= 0.03
+        min_quantity = block_rng.choice(
+            np.array([1, 2, 5, 10, 12, 24, 50]), size=size, p=[0.55, 0.05, 0.12, 0.12, 0.06, 0.06, 0.04]
+        )
+        n_tiers = block_rng.choice(4, size=size, p=[0.45, 0.25, 0.2, 0.1])
+        tier_discounts = block_rng.uniform(0.03, 0.12, size=(size, 3))
+        sales = np.where(block_rng.random(size) < 0.3, 0, (block_rng.pareto(1.3, size) * 8).astype(np.int64))
+        image_kind = block_rng.choice(4, size=size, p=[0.08, 0.15, 0.22, 0.55])
+        reach = block_rng.choice(np.array([1, 2, 3, 5, 8, 16]), size=size, p=[0.2, 0.2, 0.2, 0.15, 0.1, 0.15])
+        words = block_rng.integers(0, 1 << 30, size=(size, 6))
+        # Distancia hacia atrás de la publicación clonada (0 = no es clon)
+        available = np.minimum(np.arange(start, start + size), CLONE_WINDOW)
+        clone_back = np.where(
+            block_rng.random(size) < duplicate_rate,
+            (block_rng.random(size) * available).astype(np.int64) + 1,
+            0
+        )
+        clone_back[available == 0] = 0
+
+        # Los clones toman los parámetros de texto de su fuente (ya resuelta
+        # si también era clon), del bloque o de la ventana anterior
+        text_categories, text_suppliers, text_words = categories.copy(), suppliers.copy(), words.copy()
+        for i in np.flatnonzero(clone_back).tolist():
+            source = start + i - int(clone_back[i])
+            if source >= start:
+                j = source - start
+                text_categories[i], text_suppliers[i], text_words[i] = text_categories[j], text_suppliers[j], text_words[j]
+            else:
+                j = source % window
+                text_categories[i], text_suppliers[i], text_words[i] = ring_categories[j], ring_suppliers[j], ring_words[j]
+        slots = np.arange(start, start + size) % window
+        ring_categories[slots], ring_suppliers[slots], ring_words[slots] = text_categories, text_suppliers, text_words
+        # El loop por registro trabaja con tipos de Python (json/sqlite no aceptan np.int64)
+        categories, prices, suppliers, stock = categories.tolist(), prices.tolist(), suppliers.tolist(), stock.tolist()
+        active, min_quantity, n_tiers = active.tolist(), min_quantity.tolist(), n_tiers.tolist()
+        tier_discounts, sales, image_kind = tier_discounts.tolist(), sales.tolist(), image_kind.tolist()
+        reach, words = reach.tolist(), words.tolist()
+        text_categories, text_suppliers, text_words = text_categories.tolist(), text_suppliers.tolist(), text_words.tolist()
+
+        records: List[Dict[str, Any]] = []
+        for i in range(size):
+            index = start + i
+            product_id = f"syn-{index:08d}"
+            supplier = suppliers[i]
+            w = words[i]
+
+            # Los clones repiten texto y categoría de una publicación anterior
+            t = text_words[i]
+            category, _, _, nouns, (spec_name, spec_values) = CATEGORIES[text_categories[i]]
+            brand = BRANDS[t[0] % len(BRANDS)]
+            name = f"{nouns[t[1] % len(nouns)]} {brand} {chr(65 + t[2] % 26)}{t[3] % 900 + 100}"
+            description = (
+                f"{name}, {ADJECTIVES[t[4] % len(ADJECTIVES)]} y "
+                f"{ADJECTIVES[t[5] % len(ADJECTIVES)]}. Vendido por {supplier_names[text_suppliers[i]]}."
+            )
+            spec_value = spec_values[t[3] % len(spec_values)]
+
+            price = prices[i]
+            base_quantity = min_quantity[i]
+            tiers = [{"min_quantity": base_quantity, "max_quantity": None, "price": price}]
+            for t in range(int(n_tiers[i])):
+                tiers[-1]["max_quantity"] = base_quantity * (5, 20, 50)[t] - 1
+                price = float(_round_price(np.array([price * (1 - tier_discounts[i][t])]))[0])
+                tiers.append({"min_quantity": base_quantity * (5, 20, 50)[t], "max_quantity": None, "price": price})
+
+            home = supplier_regions[supplier]
+            delivery_regions = []
+            for region in range(len(REGIONS)):
+                distance = abs(region - home)
+                if distance < reach[i]:
+                    delivery_regions.append({
+                        "region": REGIONS[region],
+                        "price": float(2_990 + 1_000 * distance),
+                        "delivery_days": 1 + distance // 2 + (w[0] >> region) % 2
+                    })
+
+            kind = image_kind[i]
+            image_url = f"{IMAGE_BASE}/{product_id}/main.jpg" if kind else ""
+            thumbnails = (
+                {size_name: f"{IMAGE_BASE}/{product_id}/{size_name}.webp" for size_name in THUMBNAIL_SIZES}
+                if kind == 3 else {}
+            )
+            thumbnail_url = f"{IMAGE_BASE}/{product_id}/desktop.webp" if kind >= 2 else None
+
+            records.append({
+                "id": product_id,
+                "name": name,
+                "category": category,
+                "price": tiers[0]["price"],
+                "stock": stock[i],
+                "image_url": image_url,
+                "thumbnail_url": thumbnail_url,
+                "thumbnails": thumbnails,
+                "active": active[i],
+                "provider_id": f"supplier-{supplier:06d}",
+                "provider_name": supplier_names[supplier],
+                "description": description,
+                "spec_name": spec_name,
+                "spec_value": spec_value,
+                "min_quantity": base_quantity,
+                "sales": sales[i],
+                "price_tiers": tiers,
+                "delivery_regions": delivery_regions
+            })
+        yield records
+
+
+def generate_catalog(n: int, seed: int = 42, **kwargs: Any) -> List[Dict[str, Any]]:
+    """El catálogo completo en una lista (para tamaños que caben en memoria)"""
+    records: List[Dict[str, Any]] = []
+    for chunk in iter_catalog(n, seed=seed, **kwargs):
+        records.extend(chunk)
+    return records
+
+
+def main():
+    from app.utils.data_sources import SQLiteSource, write_parquet
+
+    parser = argparse.ArgumentParser(description="Genera un catálogo sintético")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.03)
+    parser.add_argument("--output", required=True, help="Archivo .db/.sqlite o .parquet")
+    args = parser.parse_args()
+
+    chunks = iter_catalog(
+        args.products, seed=args.seed, chunk_size=args.chunk_size, duplicate_rate=args.duplicate_rate
+    )
+    started = time.perf_counter()
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension == ".parquet":
+        total = write_parquet(args.output, chunks)
+    elif extension in (".db", ".sqlite", ".sqlite3"):
+        total = SQLiteSource.write(args.output, chunks)
+    else:
+        parser.error("--output must end in .db, .sqlite, .sqlite3 or .parquet")
+    print(f"{total} products written to {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Text Utilities
+Normalización de texto compartida por los índices del catálogo
+"""
+import re
+import unicodedata
+from typing import List
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes, para que 'Electrónica' == 'electronica'"""
+    text = text.lower()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras del texto normalizado"""
+    return _TOKEN_RE.findall(normalize_text(text))
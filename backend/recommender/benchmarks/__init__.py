@@ -0,0 +1,9 @@
+"""
+Benchmarks
+Micro-benchmarks de los caminos calientes del recomendador, con baselines
+versionadas (baselines.json) y umbral de regresión
+
+    python -m benchmarks                       # compara contra baselines.json
+    python -m benchmarks --sizes 1000,1000000  # otros tamaños de catálogo
+    python -m benchmarks --update-baselines    # re-graba las baselines
+"""
@@ -0,0 +1,179 @@
+"""
+Benchmark Runner
+Mide ops/seg, memoria pico y asignaciones por caso y compara con baselines.json
+
+Sale con código 1 si algún caso empeora más que el umbral (--threshold o
+BENCHMARK_THRESHOLD, en %): menos ops/seg o más memoria pico. Los tiempos
+sólo son comparables en la misma máquina; baselines.json guarda dónde se
+grabó y se avisa si no coincide.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.cases import CASES, catalog
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+
+# Diferencias de memoria bajo este piso (KB) son ruido, no regresiones
+MEMORY_FLOOR_KB = 64
+
+
+def machine() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "processor": platform.machine()
+    }
+
+
+def measure_time(fn: Callable[[], Any], repeat: int, min_seconds: float) -> Dict[str, float]:
+    """
+    ops/seg de fn: se calibra cuántas llamadas caben en min_seconds y se
+    toman `repeat` rondas; se reporta la mejor (la menos perturbada) y la mediana
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds or number >= 1 << 20:
+            break
+        number = max(number * 2, int(number * min_seconds / max(elapsed, 1e-9)))
+
+    rates = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            rates.append(number / (time.perf_counter() - started))
+    finally:
+        gc.enable()
+    return {"ops_per_sec": max(rates), "median_ops_per_sec": statistics.median(rates)}
+
+
+def measure_memory(fn: Callable[[], Any]) -> Dict[str, float]:
+    """
+    Memoria de una llamada bajo tracemalloc
+
+    peak_kb: pico durante la llamada por sobre lo que ya estaba asignado.
+    allocations: bloques que siguen vivos al retornar (lo que construye el
+    resultado); tracemalloc no cuenta las asignaciones temporales.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return {"peak_kb": round((peak - baseline) / 1024, 1), "allocations": max(0, blocks)}
+
+
+def run(sizes: List[int], only: Optional[str], repeat: int, min_seconds: float) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    runs = sorted(
+        ((size, benchmark) for benchmark in CASES if not only or only in benchmark.name
+         for size in ([benchmark.size] if benchmark.size else sizes)),
+        key=lambda pair: pair[0]
+    )
+    if not runs:
+        return results
+
+    # Un solo catálogo del tamaño mayor; los menores son prefijos
+    records = catalog(runs[-1][0])
+    for size, benchmark in runs:
+        fn = benchmark.setup(records[:size])
+        key = f"{benchmark.name}/{size}"
+        result = results[key] = {**measure_time(fn, repeat, min_seconds), **measure_memory(fn)}
+        print(
+            f"{key:45} {result['ops_per_sec']:>14,.2f} ops/s  "
+            f"{result['peak_kb']:>12,.1f} KB peak  {result['allocations']:>9,} allocs",
+            flush=True
+        )
+        del fn
+        gc.collect()
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baselines: Dict[str, Dict[str, float]],
+    threshold: float
+) -> List[str]:
+    """Mensajes de regresión (vacío si todo está dentro del umbral)"""
+    regressions = []
+    limit = threshold / 100
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        change = result["ops_per_sec"] / baseline["ops_per_sec"] - 1
+        if change < -limit:
+            regressions.append(
+                f"{key}: {result['ops_per_sec']:,.1f} ops/s vs {baseline['ops_per_sec']:,.1f} baseline ({change:+.1%})"
+            )
+        peak, base_peak = result["peak_kb"], baseline["peak_kb"]
+        if peak - base_peak > MEMORY_FLOOR_KB and peak > base_peak * (1 + limit):
+            regressions.append(f"{key}: {peak:,.1f} KB peak vs {base_peak:,.1f} KB baseline")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del recomendador")
+    parser.add_argument("--sizes", default=os.getenv("BENCHMARK_SIZES", DEFAULT_SIZES),
+                        help="Tamaños de catálogo separados por coma")
+    parser.add_argument("--only", help="Sólo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCHMARK_THRESHOLD", "20")),
+                        help="Regresión máxima tolerada, en %%")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Duración mínima de cada ronda")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="Graba los resultados como baselines en vez de comparar")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = run(sizes, args.only, args.repeat, args.min_seconds)
+
+    stored: Dict[str, Any] = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            stored = json.load(f)
+
+    if args.update_baselines:
+        stored = {"machine": machine(), "results": {**stored.get("results", {}), **results}}
+        with open(args.baselines, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    if stored.get("machine") and stored["machine"] != machine():
+        print(f"warning: baselines were recorded on {stored['machine']}, timings may not be comparable",
+              file=sys.stderr)
+    regressions = compare(results, stored.get("results", {}), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark Cases
+Cada caso prepara sus datos fuera de la medición y retorna la función a medir
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import orjson
+
+from app.models.random_recommender import RandomRecommender
+from app.utils.catalog import CatalogSnapshot
+from app.utils.database import transform_rows
+from app.utils.rows import product_rows
+from app.utils.seen_filter import BloomFilter, ExclusionSet
+from app.utils.serialization import ProductPage, encode
+from app.utils.synthetic_catalog import iter_catalog
+
+PAGE_SIZE = 100
+
+# Fracción del catálogo excluida por IDs explícitos y por vistos (Bloom filter, hasta SEEN_PRODUCTS)
+EXCLUDED_FRACTION = 0.05
+SEEN_PRODUCTS = 2000
+
+
+class Case(NamedTuple):
+    name: str
+    setup: Callable[[List[Dict[str, Any]]], Callable[[], Any]]
+    # None = se mide en cada tamaño de catálogo; si no, sólo con este tamaño
+    size: Optional[int] = None
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, size: Optional[int] = None):
+    def register(setup: Callable[[List[Dict[str, Any]]], Callable[[], Any]]):
+        CASES.append(Case(name, setup, size))
+        return setup
+    return register
+
+
+def catalog(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Catálogo sintético para los benchmarks
+
+    Sin delivery_regions ni description (no los usa ningún caso), así 1M de
+    productos cabe en unos pocos GB.
+    """
+    records: List[Dict[str, Any]] = []
+    for chunk in iter_catalog(n, seed=seed):
+        for record in chunk:
+            del record["delivery_regions"], record["description"]
+        records.extend(chunk)
+    return records
+
+
+def _postgrest_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Registro del catálogo con la forma de una fila de products con sus joins"""
+    return {
+        "productid": record["id"],
+        "productnm": record["name"],
+        "category": record["category"],
+        "price": record["price"],
+        "productqty": record["stock"],
+        "is_active": record["active"],
+        "supplier_id": record["provider_id"],
+        "users": {"user_nm": record["provider_name"]},
+        "product_images": [{
+            "image_url": record["image_url"],
+            "thumbnail_url": record["thumbnail_url"],
+            "thumbnails": record["thumbnails"]
+        }] if record["image_url"] else []
+    }
+
+
+def _exclusions(records: List[Dict[str, Any]]) -> ExclusionSet:
+    rng = np.random.default_rng(7)
+    n = len(records)
+    excluded = rng.choice(n, size=int(n * EXCLUDED_FRACTION), replace=False).tolist()
+    seen = BloomFilter(capacity=SEEN_PRODUCTS)
+    seen_rows = rng.choice(n, size=min(int(n * EXCLUDED_FRACTION), SEEN_PRODUCTS), replace=False)
+    seen.update(records[i]["id"] for i in seen_rows.tolist())
+    return ExclusionSet({records[i]["id"] for i in excluded}, seen)
+
+
+@case("random_recommender.recommend")
+def random_recommend(records):
+    recommender = RandomRecommender()
+    products = [dict(record) for record in records]
+    return lambda: recommender.recommend(products, limit=20)
+
+
+@case("random_recommender.score")
+def random_score(records):
+    recommender = RandomRecommender()
+    candidates = np.arange(len(records))
+    return lambda: recommender.score(candidates, limit=PAGE_SIZE)
+
+
+@case("database.decode_products", size=1000)
+def decode_products(records):
+    # Una respuesta de PostgREST (a lo más max-rows = 1000 filas): decodificar + transformar
+    body = orjson.dumps([_postgrest_row(record) for record in records])
+    exclude = _exclusions(records)
+    return lambda: transform_rows(product_rows.decode(body), exclude_ids=exclude, image_size="desktop")
+
+
+@case("catalog.select_exclude")
+def select_exclude(records):
+    snapshot = CatalogSnapshot(records)
+    exclude = _exclusions(records)
+    return lambda: snapshot.select(min_stock=1, exclude=exclude)
+
+
+@case("serialization.page", size=1000)
+def serialize_page(records):
+    snapshot = CatalogSnapshot(records)
+    rows = np.arange(PAGE_SIZE)
+    scores = np.round(np.random.default_rng(1).uniform(0.5, 1.0, PAGE_SIZE), 2)
+
+    def run():
+        # Fragmentos ya codificados (caso normal): sólo extras + concatenación
+        page = snapshot.page(rows, quantity=10, scores=scores)
+        return encode({"recommendations": page, "total": len(page)})
+    return run
+
+
+@case("serialization.products", size=1000)
+def serialize_products(records):
+    products = [dict(record) for record in records[:PAGE_SIZE]]
+    return lambda: encode({"recommendations": ProductPage.from_products(products), "total": len(products)})
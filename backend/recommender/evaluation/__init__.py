@@ -0,0 +1,9 @@
+"""
+Offline Evaluation
+Reproduce compras históricas en orden temporal y compara las estrategias
+de RecommenderService.strategies (más una referencia por popularidad)
+
+    python -m evaluation                                    # product_sales de Supabase
+    DATA_SOURCE=synthetic://100000 python -m evaluation --history synthetic://200000
+    python -m evaluation --history compras.jsonl --k 5,10 --workers 4 --json reporte.json
+"""
@@ -0,0 +1,312 @@
+"""
+Evaluation Engine
+Reproduce las compras en orden temporal y mide cada estrategia como estaba
+en ese momento
+
+Evaluación rolling-origin: las primeras `warmup` compras sólo entrenan; el
+resto se parte en `windows` ventanas consecutivas. Al inicio de cada
+ventana las estrategias con fit() se reentrenan con todo lo anterior (sin
+ver el futuro) y cada orden de la ventana es una consulta: lo que compró
+el usuario en esa orden es lo relevante.
+
+Los usuarios se reparten en shards (usuario % shards) que corren en un
+pool de procesos; cada proceso recibe la historia una sola vez. Las
+métricas se calculan vectorizadas sobre la matriz de recomendaciones de
+todo el shard, no consulta por consulta.
+
+Una estrategia es cualquier objeto con score(candidates, limit) ->
+(filas, scores), como las de RecommenderService.strategies; si además
+tiene fit(history, n_items) se reentrena en cada ventana, y si su score
+acepta `user` recibe en cada consulta un UserContext con las compras del
+usuario anteriores a ella (lo que el servicio sabría en ese momento).
+"""
+import inspect
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from evaluation.history import History
+
+
+class PopularityBaseline:
+    """
+    Referencia: los productos más comprados hasta el momento
+
+    No personaliza; una estrategia que no le gana a esto tampoco le gana
+    a un ranking fijo. El ranking no cambia entre fit y fit, así que se
+    calcula una vez por conjunto de candidatos.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self._ranked: Optional[tuple] = None
+
+    def fit(self, history: History, n_items: int):
+        self.counts = np.bincount(history.item, minlength=n_items)
+        self._ranked = None
+
+    def score(self, candidates: np.ndarray, limit: int = 6):
+        k = min(len(candidates), limit)
+        if k <= 0:
+            return candidates[:0], np.empty(0)
+        ranked = self._ranked
+        if ranked is None or ranked[0] is not candidates or len(ranked[1]) < k:
+            counts = self.counts[candidates]
+            top = np.argpartition(-counts, k - 1)[:k]
+            top = top[np.argsort(-counts[top], kind="stable")]
+            ranked = self._ranked = (candidates, candidates[top], counts[top].astype(np.float64))
+        return ranked[1][:k], ranked[2][:k]
+
+
+class UserContext(NamedTuple):
+    """Lo que una estrategia personalizada sabe del usuario al momento de la consulta"""
+    user: int             # código de usuario de la historia
+    items: np.ndarray     # filas compradas antes de la consulta, en orden temporal
+
+
+def _accepts_user(strategy: Any) -> bool:
+    """True si strategy.score recibe el contexto del usuario (parámetro `user`)"""
+    try:
+        return "user" in inspect.signature(strategy.score).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class Queries(NamedTuple):
+    """Una consulta por orden; los productos de la orden en formato CSR"""
+    user: np.ndarray      # int32
+    time: np.ndarray      # int64
+    offsets: np.ndarray   # int64, len = consultas + 1
+    items: np.ndarray     # int32
+
+
+def build_queries(history: History) -> Queries:
+    """Agrupa las compras por orden (la historia ya viene ordenada por (time, order))"""
+    starts = np.flatnonzero(np.r_[True, history.order[1:] != history.order[:-1]])
+    offsets = np.r_[starts, len(history)].astype(np.int64)
+    return Queries(history.user[starts], history.time[starts], offsets, history.item)
+
+
+def windows(history: History, count: int, warmup: float) -> np.ndarray:
+    """
+    Límites de las ventanas de evaluación (count + 1 instantes)
+
+    La primera empieza después de la fracción warmup de las compras; las
+    ventanas tienen la misma cantidad de compras, no la misma duración.
+
+    Raises:
+        ValueError: Si la historia no tiene compras
+    """
+    times = history.time
+    if len(times) == 0:
+        raise ValueError("purchase history is empty: there is nothing to evaluate")
+    start = int(len(times) * warmup)
+    positions = np.linspace(start, len(times) - 1, count + 1).astype(np.int64)
+    bounds = times[positions].copy()
+    bounds[-1] += 1
+    return bounds
+
+
+def basket_metrics(
+    recommended: np.ndarray,
+    offsets: np.ndarray,
+    items: np.ndarray,
+    ks: Sequence[int]
+) -> Dict[str, np.ndarray]:
+    """
+    hit@k y NDCG@k por consulta, vectorizado
+
+    Args:
+        recommended: Matriz (consultas, max_k) de filas recomendadas (-1 = vacío)
+        offsets, items: Productos relevantes de cada consulta (CSR)
+        ks: Cortes a medir (cada uno <= max_k)
+
+    Returns:
+        {"hit@k": array, "ndcg@k": array} con un valor por consulta
+    """
+    n_queries, max_k = recommended.shape
+    sizes = np.diff(offsets)
+    # Pares (consulta, producto) como una sola clave int64
+    width = np.int64(max(int(items.max(initial=0)), int(recommended.max(initial=0))) + 1)
+    relevant = np.repeat(np.arange(n_queries, dtype=np.int64), sizes) * width + items
+    keys = np.arange(n_queries, dtype=np.int64)[:, None] * width + recommended
+    # Una orden puede repetir un producto: lo relevante son los distintos
+    relevant = np.unique(relevant)
+    distinct = np.bincount(relevant // width, minlength=n_queries)
+    hits = np.isin(keys, relevant) & (recommended >= 0)
+
+    discount = 1.0 / np.log2(np.arange(2, max_k + 2))
+    gains = hits * discount
+    ideal = np.r_[1.0, np.cumsum(discount)]
+
+    metrics = {}
+    for k in ks:
+        metrics[f"hit@{k}"] = hits[:, :k].any(axis=1).astype(np.float64)
+        dcg = gains[:, :k].sum(axis=1)
+        metrics[f"ndcg@{k}"] = dcg / ideal[np.minimum(distinct, k)]
+    return metrics
+
+
+class ShardResult(NamedTuple):
+    queries: int
+    sums: Dict[str, float]          # suma de cada métrica sobre las consultas
+    recommended: np.ndarray         # veces que se recomendó cada fila (para cobertura)
+    latencies: np.ndarray           # segundos por llamada a score
+
+
+# Datos del proceso del pool, recibidos una vez en _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    history: History,
+    queries: Queries,
+    candidates: np.ndarray,
+    n_items: int,
+    bounds: np.ndarray,
+    strategies: Dict[str, Any],
+    seed: int
+):
+    _worker.update(
+        history=history, queries=queries, candidates=candidates, n_items=n_items,
+        bounds=bounds, strategies=strategies, seed=seed
+    )
+
+
+def evaluate_shard(shard: int, shards: int, ks: Sequence[int]) -> Dict[str, ShardResult]:
+    """Evalúa todas las estrategias sobre las consultas de los usuarios del shard"""
+    w = _worker
+    history: History = w["history"]
+    queries: Queries = w["queries"]
+    candidates: np.ndarray = w["candidates"]
+    bounds: np.ndarray = w["bounds"]
+    n_items: int = w["n_items"]
+    max_k = max(ks)
+    # Las estrategias aleatorias usan los generadores globales
+    random.seed(w["seed"] + shard)
+    np.random.seed(w["seed"] + shard)
+
+    mine = np.flatnonzero(queries.user % shards == shard)
+    window_of = np.searchsorted(bounds, queries.time[mine], side="right") - 1
+    in_range = (window_of >= 0) & (window_of < len(bounds) - 1)
+    mine, window_of = mine[in_range], window_of[in_range]
+
+    # Productos relevantes de las consultas del shard, en CSR
+    sizes = queries.offsets[mine + 1] - queries.offsets[mine]
+    offsets = np.r_[0, np.cumsum(sizes)].astype(np.int64)
+    gather = np.repeat(queries.offsets[mine] - offsets[:-1], sizes) + np.arange(offsets[-1])
+    items = queries.items[gather]
+
+    # Compras de los usuarios del shard agrupadas por usuario (en orden
+    # temporal dentro de cada uno), para armar el UserContext de cada consulta
+    own = np.flatnonzero(history.user % shards == shard)
+    own = own[np.argsort(history.user[own], kind="stable")]
+    own_users, own_times, own_items = history.user[own], history.time[own], history.item[own]
+
+    def context(query: int) -> UserContext:
+        user = int(queries.user[query])
+        lo = int(np.searchsorted(own_users, user, side="left"))
+        hi = int(np.searchsorted(own_users, user, side="right"))
+        end = lo + int(np.searchsorted(own_times[lo:hi], queries.time[query], side="left"))
+        return UserContext(user, own_items[lo:end])
+
+    results = {}
+    for name, strategy in w["strategies"].items():
+        recommended = np.full((len(mine), max_k), -1, dtype=np.int64)
+        latencies = np.empty(len(mine))
+        fit = getattr(strategy, "fit", None)
+        personalized = _accepts_user(strategy)
+        for window in range(len(bounds) - 1):
+            rows = np.flatnonzero(window_of == window)
+            if len(rows) == 0:
+                continue
+            if fit is not None:
+                fit(history.before(int(bounds[window])), n_items)
+            for row in rows.tolist():
+                extra = {"user": context(int(mine[row]))} if personalized else {}
+                started = time.perf_counter()
+                picked, _ = strategy.score(candidates, limit=max_k, **extra)
+                latencies[row] = time.perf_counter() - started
+                recommended[row, :len(picked)] = picked
+
+        metrics = basket_metrics(recommended, offsets, items, ks)
+        results[name] = ShardResult(
+            queries=len(mine),
+            sums={key: float(values.sum()) for key, values in metrics.items()},
+            recommended=np.bincount(recommended[recommended >= 0].ravel(), minlength=n_items),
+            latencies=latencies
+        )
+    return results
+
+
+def evaluate(
+    history: History,
+    strategies: Dict[str, Any],
+    candidates: np.ndarray,
+    n_items: int,
+    ks: Sequence[int] = (5, 10, 20),
+    window_count: int = 10,
+    warmup: float = 0.2,
+    workers: int = 1,
+    shards: Optional[int] = None,
+    seed: int = 42
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Evalúa las estrategias sobre la historia
+
+    Args:
+        history: Compras ordenadas por tiempo
+        strategies: {nombre: estrategia}; se copian a cada proceso
+        candidates: Filas del catálogo que se pueden recomendar
+        n_items: Filas del catálogo
+        ks: Cortes para hit-rate y NDCG
+        window_count: Ventanas de reentrenamiento
+        warmup: Fracción inicial de las compras que sólo entrena
+        workers: Procesos (1 = en este proceso)
+        shards: Shards de usuarios (por defecto 4 por proceso)
+        seed: Semilla de las estrategias aleatorias
+
+    Returns:
+        {estrategia: {queries, hit@k, ndcg@k, coverage@max_k, latency_ms}}
+    """
+    queries = build_queries(history)
+    bounds = windows(history, window_count, warmup)
+    shards = shards or workers * 4
+    ks = sorted(ks)
+    init_args = (history, queries, candidates, n_items, bounds, strategies, seed)
+
+    if workers <= 1:
+        _init_worker(*init_args)
+        parts = [evaluate_shard(shard, shards, ks) for shard in range(shards)]
+    else:
+        method = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context(method),
+            initializer=_init_worker,
+            initargs=init_args
+        ) as pool:
+            parts = list(pool.map(evaluate_shard, range(shards), [shards] * shards, [ks] * shards))
+
+    report: Dict[str, Dict[str, Any]] = {}
+    for name in strategies:
+        results: List[ShardResult] = [part[name] for part in parts]
+        total = sum(r.queries for r in results)
+        sums: Dict[str, float] = {}
+        for r in results:
+            for key, value in r.sums.items():
+                sums[key] = sums.get(key, 0.0) + value
+        recommended = np.sum([r.recommended for r in results], axis=0)
+        latencies = np.concatenate([r.latencies for r in results]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        report[name] = {
+            "queries": total,
+            **{key: value / total if total else 0.0 for key, value in sums.items()},
+            f"coverage@{ks[-1]}": float(np.count_nonzero(recommended)) / max(len(candidates), 1),
+            "latency_ms": {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+        }
+    return report
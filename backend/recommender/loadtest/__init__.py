@@ -0,0 +1,7 @@
+"""
+Load Test
+Prueba de carga HTTP de punta a punta contra un PostgREST local con catálogo sintético
+
+    python -m loadtest --products 100000 --rate 50,100,200 --duration 30
+    python -m loadtest --target http://localhost:8000 --rate 100   # app ya levantada
+"""
@@ -0,0 +1,355 @@
+"""
+Load Test Runner
+Levanta el stub de PostgREST y la app, y la carga con llegadas de lazo abierto
+
+Las llegadas siguen un proceso de Poisson a la tasa pedida sin esperar
+respuestas (lazo abierto): si la app se atrasa, los requests se acumulan
+como le pasaría en producción. La latencia se mide desde el instante
+programado de cada llegada, no desde que se envió, para no esconder la
+cola (coordinated omission). Con --concurrency en vuelo, las llegadas que
+no caben se cuentan como dropped.
+
+Por cada tasa se reporta, por endpoint, throughput y latencias p50/p95/p99,
+y para la app completa los cores de CPU que consumió (leídos de /proc), de
+modo que requests/seg por worker y por core son números medidos. El
+generador corre en este proceso: si "lag p99" crece, el cuello de botella
+es el generador y no la app (usar --app-cpus para separarlos).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from app.utils.synthetic_catalog import CATEGORIES
+
+ENDPOINTS = ("recommendations", "similar", "personalized", "trending")
+DEFAULT_MIX = "recommendations=4,similar=3,personalized=2,trending=1"
+USERS = 5000
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """CPU (usuario + sistema) de un proceso y sus descendientes, desde /proc"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    try:
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            # fields[1] = ppid, fields[11] = utime, fields[12] = stime
+            stats[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))
+    except OSError:
+        return None
+    family, total = {pid}, 0
+    changed = True
+    while changed:
+        changed = False
+        for child, (parent, _) in stats.items():
+            if parent in family and child not in family:
+                family.add(child)
+                changed = True
+    for member in family:
+        if member in stats:
+            total += stats[member][1]
+    return total / ticks
+
+
+def _spawn(args: List[str], env: Dict[str, str], cpus: Optional[List[int]]) -> subprocess.Popen:
+    preexec = (lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *args, "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        preexec_fn=preexec
+    )
+
+
+async def _wait_ready(url: str, timeout: float, check=None):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url)
+                if response.status_code == 200 and (check is None or check(response.json())):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s")
+
+
+def _request(endpoint: str, products: int, rng: random.Random) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """(método, ruta, body) de un request representativo del endpoint"""
+    user = f"user-{int(rng.paretovariate(1.2)) % USERS}"
+    if endpoint == "recommendations":
+        body: Dict[str, Any] = {"user_id": user, "limit": 12}
+        if rng.random() < 0.4:
+            body["category"] = rng.choice(CATEGORIES)[0]
+        return "POST", "/api/v1/recommendations", body
+    if endpoint == "similar":
+        return "GET", f"/api/v1/similar/syn-{rng.randrange(products):08d}?limit=6", None
+    if endpoint == "personalized":
+        return "GET", f"/api/v1/personalized/{user}?limit=10", None
+    return "GET", "/api/v1/trending?limit=10", None
+
+
+def _arrivals(
+    rng: random.Random,
+    rate: float,
+    until: float,
+    mix: Dict[str, float],
+    products: int
+) -> Iterator[Tuple[float, str, Tuple[str, str, Optional[Dict[str, Any]]]]]:
+    """
+    (segundos desde el inicio, endpoint, request) de cada llegada hasta `until`
+
+    Todos los sorteos salen de aquí, en orden, incluidas las llegadas que
+    después se descartan: con la misma semilla la secuencia de requests es
+    la misma sin importar cómo se agenden las tareas.
+    """
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= until:
+            return
+        endpoint = rng.choices(endpoints, weights)[0]
+        yield offset, endpoint, _request(endpoint, products, rng)
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    rate: float,
+    duration: float,
+    warmup: float,
+    mix: Dict[str, float],
+    concurrency: int,
+    products: int,
+    seed: int
+) -> Dict[str, Any]:
+    """Una tasa de llegadas durante warmup + duration; sólo se mide después del warmup"""
+    endpoints = list(mix)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    lags: List[float] = []
+    in_flight = 0
+    tasks = set()
+
+    async def fire(
+        endpoint: str,
+        request: Tuple[str, str, Optional[Dict[str, Any]]],
+        scheduled: float,
+        measured: bool
+    ):
+        nonlocal in_flight
+        method, path, body = request
+        try:
+            response = await client.request(method, path, json=body)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            in_flight -= 1
+        if measured:
+            latencies[endpoint].append(time.perf_counter() - scheduled)
+            statuses[endpoint][status] += 1
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    for offset, endpoint, request in _arrivals(random.Random(seed), rate, warmup + duration, mix, products):
+        scheduled = started + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        measured = scheduled >= measure_from
+        if measured:
+            lags.append(max(0.0, time.perf_counter() - scheduled))
+        if in_flight >= concurrency:
+            if measured:
+                statuses[endpoint]["dropped"] += 1
+            continue
+        in_flight += 1
+        task = asyncio.create_task(fire(endpoint, request, scheduled, measured))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+
+    report: Dict[str, Any] = {"rate": rate, "endpoints": {}}
+    total_ok = 0
+    for endpoint in endpoints:
+        values = np.array(latencies.get(endpoint, []))
+        counts = dict(statuses.get(endpoint, {}))
+        ok = sum(n for status, n in counts.items() if status.startswith("2"))
+        total_ok += ok
+        report["endpoints"][endpoint] = {
+            "requests": sum(counts.values()),
+            "ok": ok,
+            "statuses": counts,
+            "throughput": ok / duration,
+            **{
+                f"p{p}_ms": float(np.percentile(values, p) * 1000) if len(values) else None
+                for p in (50, 95, 99)
+            }
+        }
+    report["throughput"] = total_ok / duration
+    report["lag_p99_ms"] = float(np.percentile(lags, 99) * 1000) if lags else None
+    return report
+
+
+def _print_step(step: Dict[str, Any]):
+    print(f"\n== {step['rate']:g} req/s offered ==")
+    print(f"{'endpoint':16}{'requests':>9}{'ok/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for endpoint, data in step["endpoints"].items():
+        cells = "".join(
+            f"{data[key]:>9.1f}" if data[key] is not None else f"{'-':>9}"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"{endpoint:16}{data['requests']:>9}{data['throughput']:>9.1f}{cells}  {data['statuses']}")
+    line = f"total {step['throughput']:.1f} ok/s, generator lag p99 {step['lag_p99_ms'] or 0:.1f} ms"
+    if step.get("cores") is not None:
+        line += (
+            f", app CPU {step['cores']:.2f} cores, {step['per_worker']:.1f} ok/s per worker, "
+            f"{step['per_core']:.1f} ok/s per core"
+        )
+    print(line)
+
+
+def _parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (use {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    processes: List[subprocess.Popen] = []
+    target = args.target
+    app_pid = None
+    try:
+        if target is None:
+            stub_port, app_port = _free_port(), _free_port()
+            processes.append(_spawn(
+                ["--factory", "loadtest.postgrest_stub:create_app", "--port", str(stub_port)],
+                {
+                    "LOADTEST_PRODUCTS": str(args.products),
+                    "LOADTEST_SEED": str(args.seed),
+                    "LOADTEST_DB_LATENCY_MS": str(args.db_latency_ms),
+                    "LOADTEST_DB_JITTER_MS": str(args.db_jitter_ms)
+                },
+                args.stub_cpus
+            ))
+            await _wait_ready(f"http://127.0.0.1:{stub_port}/rest/v1/product_sales?limit=1", args.startup_timeout)
+            app = _spawn(
+                ["app.main:app", "--port", str(app_port), "--workers", str(args.workers)],
+                {
+                    "DATA_SOURCE": "supabase",
+                    "SUPABASE_URL": f"http://127.0.0.1:{stub_port}",
+                    "SUPABASE_KEY": "loadtest",
+                    "SUPABASE_HTTP2": "false"
+                },
+                args.app_cpus
+            )
+            processes.append(app)
+            app_pid = app.pid
+            target = f"http://127.0.0.1:{app_port}"
+            # Listo cuando el catálogo terminó de cargar (en cada worker, idealmente)
+            await _wait_ready(
+                f"{target}/api/v1/stats", args.startup_timeout,
+                check=lambda stats: (stats.get("catalog") or {}).get("products")
+            )
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        report: Dict[str, Any] = {
+            "target": target,
+            "products": args.products,
+            "workers": args.workers if app_pid else None,
+            "db_latency_ms": args.db_latency_ms,
+            "db_jitter_ms": args.db_jitter_ms,
+            "mix": args.mix,
+            "steps": []
+        }
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as client:
+            for i, rate in enumerate(args.rate):
+                cpu_before = _cpu_seconds(app_pid) if app_pid else None
+                wall_before = time.perf_counter()
+                step = await run_step(
+                    client, rate, args.duration, args.warmup, args.mix,
+                    args.concurrency, args.products, args.seed + i
+                )
+                if cpu_before is not None:
+                    cores = (_cpu_seconds(app_pid) - cpu_before) / (time.perf_counter() - wall_before)
+                    step["cores"] = cores
+                    step["per_worker"] = step["throughput"] / args.workers
+                    step["per_core"] = step["throughput"] / cores if cores > 0 else None
+                _print_step(step)
+                report["steps"].append(step)
+        return report
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de recomendaciones")
+    parser.add_argument("--rate", default="50",
+                        help="Llegadas por segundo; varias separadas por coma corren en secuencia")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos medidos por tasa")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos previos no medidos")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                        help=f"Peso de cada endpoint (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=256, help="Máximo de requests en vuelo")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout por request (s)")
+    parser.add_argument("--products", type=int, default=10000, help="Tamaño del catálogo sintético")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-latency-ms", type=float, default=20, help="Latencia base del stub")
+    parser.add_argument("--db-jitter-ms", type=float, default=10, help="Media de la cola exponencial")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn para la app")
+    parser.add_argument("--app-cpus", type=lambda v: [int(c) for c in v.split(",")],
+                        help="CPUs para la app (sched_setaffinity), ej. 0,1")
+    parser.add_argument("--stub-cpus", type=lambda v: [int(c) for c in v.split(",")],
+                        help="CPUs para el stub de PostgREST")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--target", help="URL de una app ya levantada (no se inicia stub ni app)")
+    parser.add_argument("--json", help="Guarda el reporte completo en este archivo")
+    args = parser.parse_args()
+    args.rate = [float(rate) for rate in args.rate.split(",")]
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+PostgREST Stub
+Reemplazo local de la API REST de Supabase con un catálogo sintético y latencia inyectada
+
+Implementa lo que usa app.utils.database: GET /rest/v1/<tabla> con select
+(columnas y joins users!/product_images!), filtros eq/neq/gt/gte/lt/lte/in/is,
+order, offset/limit y el tope de filas de PostgREST (max-rows).
+
+    LOADTEST_PRODUCTS=100000 uvicorn --factory loadtest.postgrest_stub:create_app --port 54321
+"""
+import asyncio
+import os
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.utils.synthetic_catalog import iter_catalog
+
+# Parámetros que no son filtros
+RESERVED_PARAMS = {"select", "order", "offset", "limit"}
+
+# Resultados filtrados y ordenados que se guardan para las páginas siguientes
+MAX_CACHED_QUERIES = 256
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda value, arg: value == arg,
+    "neq": lambda value, arg: value != arg,
+    "gt": lambda value, arg: value is not None and value > arg,
+    "gte": lambda value, arg: value is not None and value >= arg,
+    "lt": lambda value, arg: value is not None and value < arg,
+    "lte": lambda value, arg: value is not None and value <= arg,
+    "in": lambda value, arg: value in arg,
+    "is": lambda value, arg: value is arg,
+}
+
+
+def build_tables(records: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Filas de products (con sus joins) y de las tablas satélite, desde registros del catálogo"""
+    products, sales, tiers, regions = [], [], [], []
+    for record in records:
+        product_id = record["id"]
+        products.append({
+            "productid": product_id,
+            "productnm": record["name"],
+            "category": record["category"],
+            "price": record["price"],
+            "productqty": record["stock"],
+            "is_active": record["active"],
+            "supplier_id": record["provider_id"],
+            "description": record["description"],
+            "spec_name": record["spec_name"],
+            "spec_value": record["spec_value"],
+            "min_quantity": record["min_quantity"],
+            "users": {"user_nm": record["provider_name"]},
+            "product_images": [{
+                "image_url": record["image_url"],
+                "thumbnail_url": record["thumbnail_url"],
+                "thumbnails": record["thumbnails"]
+            }] if record["image_url"] else []
+        })
+        if record["sales"]:
+            sales.append({"id": len(sales) + 1, "product_id": product_id, "quantity": record["sales"]})
+        for tier in record["price_tiers"]:
+            tiers.append({"product_qty_id": len(tiers) + 1, "product_id": product_id, **tier})
+        for delivery in record["delivery_regions"]:
+            regions.append({"id": len(regions) + 1, "product_id": product_id, **delivery})
+    return {
+        "products": products,
+        "product_sales": sales,
+        "product_quantity_ranges": tiers,
+        "product_delivery_regions": regions
+    }
+
+
+def parse_select(select: str) -> List[Tuple[str, Optional[List[str]]]]:
+    """
+    "a,b,users!supplier_id(user_nm)" -> [("a", None), ("b", None), ("users", ["user_nm"])]
+
+    Los joins se devuelven con el nombre de la tabla, como PostgREST.
+    """
+    items: List[Tuple[str, Optional[List[str]]]] = []
+    depth, start = 0, 0
+    select = select.replace(" ", "").replace("\n", "")
+    for i, char in enumerate(select + ","):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            item = select[start:i]
+            start = i + 1
+            if not item:
+                continue
+            if "(" in item:
+                name, _, columns = item.partition("(")
+                items.append((name.split("!")[0], columns.rstrip(")").split(",")))
+            else:
+                items.append((item, None))
+    return items
+
+
+def _coerce(sample: Any, raw: str) -> Any:
+    """Convierte el argumento de un filtro al tipo de la columna"""
+    if raw == "null":
+        return None
+    if isinstance(sample, bool):
+        return raw == "true"
+    if isinstance(sample, int):
+        return int(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+class PostgRESTStub:
+    """
+    Tablas en memoria servidas con la forma de PostgREST
+
+    Cada respuesta espera latency_ms más una cola exponencial de media
+    jitter_ms, para simular la latencia de red y de Postgres.
+    """
+
+    def __init__(
+        self,
+        tables: Dict[str, List[Dict[str, Any]]],
+        latency_ms: float = 20,
+        jitter_ms: float = 10,
+        max_rows: int = 1000
+    ):
+        self.tables = tables
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_rows = max_rows
+        # Índices para los filtros más comunes (por ID y por categoría)
+        self.by_id = {row["productid"]: row for row in tables["products"]}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for row in tables["products"]:
+            self.by_category.setdefault(row["category"], []).append(row)
+        self._results: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+        self.requests = 0
+        self.app = Starlette(routes=[Route("/rest/v1/{table}", self.handle, methods=["GET"])])
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+    def _delay(self) -> float:
+        jitter = random.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    def _candidates(self, table: str, filters: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Filas de partida: usa los índices si hay filtro por ID o categoría"""
+        if table != "products":
+            return self.tables[table]
+        productid = filters.get("productid", "")
+        if productid.startswith("eq."):
+            row = self.by_id.get(productid[3:])
+            return [row] if row else []
+        if productid.startswith("in."):
+            ids = productid[3:].strip("()").split(",")
+            return [self.by_id[i.strip('"')] for i in ids if i.strip('"') in self.by_id]
+        category = filters.get("category", "")
+        if category.startswith("eq."):
+            return self.by_category.get(category[3:], [])
+        return self.tables["products"]
+
+    def _filtered(self, table: str, filters: Dict[str, str], order: Optional[str]) -> List[Dict[str, Any]]:
+        """Filas que cumplen los filtros, en orden (memoizado: las cargas paginadas repiten la consulta)"""
+        key = (table, tuple(sorted(filters.items())), order)
+        rows = self._results.get(key)
+        if rows is not None:
+            return rows
+
+        rows = self._candidates(table, filters)
+
+        sample = rows[0] if rows else {}
+        for column, expression in filters.items():
+            operator, _, raw = expression.partition(".")
+            compare = _OPERATORS[operator]
+            if operator == "in":
+                arg: Any = {_coerce(sample.get(column), v.strip('"')) for v in raw.strip("()").split(",")}
+            else:
+                arg = _coerce(sample.get(column), raw)
+            rows = [row for row in rows if compare(row.get(column), arg)]
+
+        if order:
+            for spec in reversed(order.split(",")):
+                column, _, direction = spec.partition(".")
+                rows = sorted(rows, key=lambda row: row.get(column), reverse=direction.startswith("desc"))
+
+        if len(self._results) >= MAX_CACHED_QUERIES:
+            self._results.clear()
+        self._results[key] = rows
+        return rows
+
+    def query(self, table: str, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Aplica filtros, orden, paginación y proyección como PostgREST"""
+        filters = {key: value for key, value in params.items() if key not in RESERVED_PARAMS}
+        rows = self._filtered(table, filters, params.get("order"))
+
+        offset = int(params.get("offset", 0))
+        limit = min(int(params.get("limit", self.max_rows)), self.max_rows)
+        rows = rows[offset:offset + limit]
+
+        select = parse_select(params.get("select", "*"))
+        if select == [("*", None)]:
+            return rows
+        projected = []
+        for row in rows:
+            item = {}
+            for name, columns in select:
+                value = row.get(name)
+                if columns is None:
+                    item[name] = value
+                elif isinstance(value, list):
+                    item[name] = [{c: v.get(c) for c in columns} for v in value]
+                else:
+                    item[name] = {c: value.get(c) for c in columns} if value else None
+            projected.append(item)
+        return projected
+
+    async def handle(self, request: Request) -> Response:
+        table = request.path_params["table"]
+        if table not in self.tables:
+            return Response(
+                orjson.dumps({"code": "42P01", "message": f'relation "public.{table}" does not exist'}),
+                status_code=404,
+                media_type="application/json"
+            )
+        self.requests += 1
+        await asyncio.sleep(self._delay())
+        params = dict(request.query_params)
+        rows = self.query(table, params)
+        offset = int(params.get("offset", 0))
+        return Response(
+            orjson.dumps(rows),
+            media_type="application/json",
+            headers={"content-range": f"{offset}-{offset + len(rows) - 1}/*" if rows else "*/*"}
+        )
+
+    @classmethod
+    def from_env(cls) -> "PostgRESTStub":
+        products = int(os.getenv("LOADTEST_PRODUCTS", "10000"))
+        seed = int(os.getenv("LOADTEST_SEED", "42"))
+        records = [record for chunk in iter_catalog(products, seed=seed) for record in chunk]
+        return cls(
+            build_tables(records),
+            latency_ms=float(os.getenv("LOADTEST_DB_LATENCY_MS", "20")),
+            jitter_ms=float(os.getenv("LOADTEST_DB_JITTER_MS", "10")),
+            max_rows=int(os.getenv("LOADTEST_MAX_ROWS", "1000"))
+        )
+
+
+def create_app() -> PostgRESTStub:
+    """Factory para uvicorn --factory (configuración por variables LOADTEST_*)"""
+    return PostgRESTStub.from_env()
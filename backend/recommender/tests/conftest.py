@@ -0,0 +1,11 @@
+"""
+Configuración de las pruebas
+
+Los módulos de app crean sus singletons al importarse, así que el entorno
+se fija antes: catálogo sintético (sin Supabase) y sin pool de procesos.
+"""
+import os
+
+os.environ.setdefault("DATA_SOURCE", "synthetic://2000")
+os.environ.setdefault("JOB_PROCESS_WORKERS", "0")
+os.environ.setdefault("SHARED_CACHE_URL", "")
@@ -0,0 +1,187 @@
+"""Admission control: cola acotada por endpoint y deadline por request"""
+import asyncio
+
+import pytest
+
+from app.api.admission import AdmissionControl, AdmissionMiddleware, ConcurrencyLimiter, Overloaded
+from app.utils import request_budget
+
+
+def test_limiter_admits_in_fifo_order_and_rejects_when_full():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=2, queue_timeout=1.0)
+        await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            await limiter.acquire()
+            order.append(name)
+
+        waiters = [asyncio.ensure_future(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        assert limiter.queued == 2
+        with pytest.raises(Overloaded, match="Queue full"):
+            await limiter.acquire()
+
+        limiter.release()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiters)
+        limiter.release()
+        return limiter, order
+
+    limiter, order = asyncio.run(scenario())
+    assert order == ["first", "second"]
+    assert limiter.active == 0
+    assert limiter.stats["rejected"] == 1 and limiter.stats["admitted"] == 3
+
+
+def test_limiter_queue_timeout_and_cancelled_waiter_leave_the_queue():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=4, queue_timeout=0.02)
+        await limiter.acquire()
+        with pytest.raises(Overloaded, match="Queue timeout"):
+            await limiter.acquire()
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queued == 0
+
+        # El lugar liberado no se pierde en waiters abandonados
+        limiter.release()
+        await limiter.acquire()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 1
+    assert limiter.stats["queue_timeouts"] == 1
+
+
+def test_under_pressure_follows_queue_ratio():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=4, queue_timeout=1.0, cheap_queue_ratio=0.5)
+        await limiter.acquire()
+        waiters = []
+        for expected in (False, False, True):
+            assert limiter.under_pressure() is expected
+            waiters.append(asyncio.ensure_future(limiter.acquire()))
+            await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+async def request(middleware, path="/api/v1/recommendations", disconnect_after=None):
+    """Corre un request HTTP por el middleware y devuelve (status, headers, body)"""
+    sent = []
+
+    async def receive():
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "path": path}, receive, send)
+    if not sent:
+        return None, {}, b""
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+class App:
+    """App ASGI que espera `delay` y anota el presupuesto que vio"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.seen = []
+        self.cancelled = 0
+
+    async def __call__(self, scope, receive, send):
+        self.seen.append((request_budget.remaining(), request_budget.cheap_mode()))
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+def middleware(app, budget=1.0, **limiter):
+    options = {"max_concurrency": 1, "max_queue": 0, "queue_timeout": 0.5, **limiter}
+    control = AdmissionControl(
+        [("recommendations", "/api/v1/recommendations", ConcurrencyLimiter(**options))],
+        budget_seconds=budget,
+        retry_after=3
+    )
+    return AdmissionMiddleware(app, control), control
+
+
+def test_admitted_request_runs_with_request_budget():
+    app = App()
+    mw, _ = middleware(app, budget=2.0)
+    status, _, body = asyncio.run(request(mw))
+    assert (status, body) == (200, b"ok")
+    remaining, cheap = app.seen[0]
+    assert 1.5 < remaining <= 2.0 and cheap is False
+
+
+def test_unmatched_path_bypasses_admission():
+    app = App()
+    mw, control = middleware(app)
+    assert asyncio.run(request(mw, path="/health"))[0] == 200
+    assert app.seen[0][0] is None
+    assert control.limiters[0][2].stats["admitted"] == 0
+
+
+def test_overload_returns_503_with_retry_after():
+    async def scenario():
+        app = App(delay=0.1)
+        mw, _ = middleware(app)
+        return await asyncio.gather(request(mw), request(mw))
+
+    (first, _, _), (second, headers, body) = asyncio.run(scenario())
+    assert first == 200
+    assert second == 503
+    assert headers[b"retry-after"] == b"3"
+    assert b"overloaded" in body
+
+
+def test_deadline_cancels_the_app_and_returns_503():
+    app = App(delay=1.0)
+    mw, control = middleware(app, budget=0.05)
+    status, _, body = asyncio.run(request(mw))
+    assert status == 503 and b"deadline" in body
+    assert app.cancelled == 1
+    assert control.stats["deadline_exceeded"] == 1
+    assert control.limiters[0][2].active == 0
+
+
+def test_client_disconnect_cancels_without_response():
+    app = App(delay=1.0)
+    mw, control = middleware(app)
+    status, _, _ = asyncio.run(request(mw, disconnect_after=0.02))
+    assert status is None
+    assert app.cancelled == 1
+    assert control.stats["disconnected"] == 1
+
+
+def test_queue_pressure_switches_to_cheap_mode():
+    async def scenario():
+        app = App(delay=0.05)
+        mw, _ = middleware(app, max_queue=2, cheap_queue_ratio=0.5)
+        await asyncio.gather(request(mw), request(mw), request(mw))
+        return app
+
+    app = asyncio.run(scenario())
+    # El tercero llegó con la cola a la mitad: corre en modo barato
+    assert [cheap for _, cheap in app.seen] == [False, False, True]
@@ -0,0 +1,152 @@
+"""Snapshot columnar del catálogo: precios por tramo y selección"""
+import numpy as np
+import pytest
+
+from app.utils.catalog import CatalogSnapshot, _MAX_PRICE_BRACKETS
+from app.utils.seen_filter import BloomFilter, ExclusionSet, RotatingBloomFilter
+
+
+def product(pid, price, tiers=None, **extra):
+    return {
+        "id": pid, "name": pid, "category": extra.pop("category", "tools"), "price": price,
+        "stock": extra.pop("stock", 10), "active": True, "provider_id": extra.pop("provider_id", "s1"),
+        "provider_name": "Proveedor", "image_url": "", "thumbnails": {}, "description": "",
+        "spec_name": "", "spec_value": "", "min_quantity": 1, "sales": 0,
+        "price_tiers": tiers or [], "delivery_regions": [], **extra
+    }
+
+
+@pytest.fixture
+def snapshot():
+    return CatalogSnapshot([
+        product("a", 100.0, [{"min_quantity": 1, "price": 100.0}, {"min_quantity": 10, "price": 90.0},
+                             {"min_quantity": 100, "price": 80.0}]),
+        product("b", 50.0, [{"min_quantity": 5, "price": 50.0}, {"min_quantity": 50, "price": 40.0}]),
+        product("c", 20.0),
+    ])
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    (1, [100.0, 50.0, 20.0]),
+    (9, [100.0, 50.0, 20.0]),
+    (10, [90.0, 50.0, 20.0]),
+    (50, [90.0, 40.0, 20.0]),
+    (10_000, [80.0, 40.0, 20.0]),
+])
+def test_effective_price_by_tier(snapshot, quantity, expected):
+    assert snapshot.effective_price(quantity).tolist() == expected
+
+
+def test_effective_price_per_row_quantity(snapshot):
+    assert snapshot.effective_price(np.array([100, 4, 1])).tolist() == [80.0, 50.0, 20.0]
+
+
+def test_price_cache_keyed_by_tier_bracket(snapshot):
+    for quantity in range(1, 5000):
+        snapshot.effective_price(quantity)
+    # Cortes en 1, 5, 10, 50 y 100: a lo más 6 tramos distintos
+    assert len(snapshot._price_cache) <= 6
+    assert snapshot.effective_price(12) is snapshot.effective_price(49)
+
+
+def test_price_cache_bounded_with_many_brackets():
+    snapshot = CatalogSnapshot([
+        product(f"p{i}", 10.0, [{"min_quantity": 1, "price": 10.0}, {"min_quantity": i + 2, "price": 9.0}])
+        for i in range(200)
+    ])
+    for quantity in range(1, 300):
+        prices = snapshot.effective_price(quantity)
+        assert prices[0] == (9.0 if quantity >= 2 else 10.0)
+    assert len(snapshot._price_cache) <= _MAX_PRICE_BRACKETS
+
+
+class CountingFilter:
+    """Contenedor que sólo responde `in` (como un Bloom filter) y cuenta las consultas"""
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.probed = []
+
+    def __contains__(self, key):
+        self.probed.append(key)
+        return key in self.keys
+
+
+class CountingSet(set):
+    probes = 0
+
+    def __contains__(self, key):
+        self.probes += 1
+        return super().__contains__(key)
+
+
+def test_select_excludes_explicit_ids_and_seen(snapshot):
+    seen = CountingFilter({"b"})
+    rows = snapshot.select(exclude=ExclusionSet({"a", "missing"}, seen))
+    assert [snapshot.ids[row] for row in rows] == ["c"]
+
+
+def test_select_probes_filter_only_for_surviving_rows():
+    snapshot = CatalogSnapshot([product(f"p{i}", float(i), category="tools" if i < 5 else "toys")
+                                for i in range(20)])
+    seen = CountingFilter({"p3"})
+    explicit = CountingSet({"p0", "p1"})
+    rows = snapshot.select(category="tools", exclude=ExclusionSet(seen, explicit))
+    assert [snapshot.ids[row] for row in rows] == ["p2", "p4"]
+    # Los IDs explícitos se traducen a filas de una vez, sin un `in` por candidato
+    assert explicit.probes == 0
+    assert sorted(seen.probed) == ["p2", "p3", "p4"]
+
+
+def test_select_accepts_plain_bloom_filter(snapshot):
+    seen = BloomFilter(capacity=100)
+    seen.add("a")
+    assert [snapshot.ids[row] for row in snapshot.select(exclude=seen)] == ["b", "c"]
+
+
+def test_content_hash_depends_on_content_not_generation(snapshot):
+    products = [product("a", 100.0), product("b", 50.0, stock=3)]
+    assert CatalogSnapshot(products, generation=1).content_hash == \
+        CatalogSnapshot([dict(p) for p in products], generation=7).content_hash
+
+    base = CatalogSnapshot(products).content_hash
+    for changed in (
+        [product("a", 99.0), product("b", 50.0, stock=3)],
+        [product("a", 100.0), product("b", 50.0, stock=4)],
+        [product("a", 100.0, name="otro"), product("b", 50.0, stock=3)],
+        [product("b", 50.0, stock=3), product("a", 100.0)],
+        [product("a", 100.0, delivery_regions=[{"region": "RM", "price": 1.0, "delivery_days": 2}]),
+         product("b", 50.0, stock=3)],
+    ):
+        assert CatalogSnapshot(changed).content_hash != base
+
+
+def test_region_lookup_returns_none_for_rows_outside_region():
+    snapshot = CatalogSnapshot([
+        product("a", 10.0, delivery_regions=[{"region": "RM", "price": 1.0, "delivery_days": 2}]),
+        product("b", 20.0, delivery_regions=[{"region": "V", "price": 3.0, "delivery_days": 4}]),
+        product("c", 30.0, delivery_regions=[{"region": "RM", "price": 5.0, "delivery_days": 6},
+                                             {"region": "V", "price": 7.0, "delivery_days": 8}]),
+        product("d", 40.0),
+    ])
+    rm = snapshot.regions["rm"]
+    # b cae entre dos filas de RM y d después de la última: ninguna debe tomar valores vecinos
+    shipping, days = rm.lookup(np.array([3, 2, 1, 0]))
+    assert shipping == [None, 5.0, None, 1.0]
+    assert days == [None, 6, None, 2]
+
+    products = snapshot.products(np.arange(4), region="RM")
+    assert [(p["shipping_price"], p["delivery_days"]) for p in products] == \
+        [(1.0, 2), (None, None), (5.0, 6), (None, None)]
+
+
+def test_select_probes_seen_filters_with_precomputed_hashes(monkeypatch):
+    snapshot = CatalogSnapshot([product(f"p{i}", float(i)) for i in range(5000)])
+    seen = RotatingBloomFilter(capacity=500)
+    seen.update(f"p{i}" for i in range(0, 5000, 7))
+    expected = [row for row in range(5000) if snapshot.ids[row] not in seen and row % 3]
+
+    # Sin un `in` por fila: ni el digest de cada ID ni _positions
+    monkeypatch.setattr(BloomFilter, "__contains__", lambda self, key: pytest.fail("per-row probe"))
+    rows = snapshot.select(exclude=ExclusionSet({f"p{i}" for i in range(0, 5000, 3)}, seen))
+    assert rows.tolist() == expected
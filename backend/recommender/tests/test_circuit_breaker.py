@@ -0,0 +1,121 @@
+"""Circuit breaker: apertura por fallas o lentitud, prueba y cierre"""
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.utils.circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def call(breaker, success=True, seconds=0.01):
+    breaker.before_call()
+    breaker.record(success, seconds)
+
+
+def test_opens_on_failure_rate_after_min_calls(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, window=10, min_calls=4)
+    for _ in range(3):
+        call(breaker, success=False)
+    # Menos de min_calls: todavía no decide
+    assert breaker.is_closed
+
+    call(breaker, success=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == pytest.approx(30.0)
+
+
+def test_stays_closed_below_failure_rate(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, window=10, min_calls=4)
+    for success in [True, False, True, True, False, True, True, True]:
+        call(breaker, success=success)
+    assert breaker.is_closed
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = CircuitBreaker(slow_call_rate=0.5, slow_call_seconds=1.0, window=4, min_calls=4)
+    for seconds in [2.0, 0.1, 2.0, 1.0]:
+        call(breaker, seconds=seconds)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_rate_uses_only_recent_window(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4)
+    for _ in range(8):
+        call(breaker, success=True)
+    call(breaker, success=False)
+    assert breaker.is_closed
+    # 2 de las últimas 4 fallaron, aunque sean 2 de 10 en total
+    call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def open_breaker(**kwargs):
+    breaker = CircuitBreaker(window=2, min_calls=2, open_seconds=10, **kwargs)
+    call(breaker, success=False)
+    call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = open_breaker()
+    clock[0] += 5
+    assert breaker.retry_after() == pytest.approx(5.0)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 5
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Una sola prueba a la vez
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True, 0.01)
+    assert breaker.is_closed
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = open_breaker()
+    clock[0] += 10
+    call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert breaker.retry_after() == pytest.approx(10.0)
+
+
+def test_half_open_slow_probe_reopens(clock):
+    breaker = open_breaker(slow_call_seconds=1.0)
+    clock[0] += 10
+    call(breaker, success=True, seconds=2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_abandoned_probe_frees_its_slot(clock):
+    breaker = open_breaker(probe_calls=2)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.abandon()
+    breaker.before_call()
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True, 0.01)
+    assert breaker.is_closed
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("TEST_BREAKER_MIN_CALLS", "3")
+    monkeypatch.setenv("TEST_BREAKER_OPEN_SECONDS", "7")
+    breaker = CircuitBreaker.from_env("TEST_BREAKER")
+    assert breaker.min_calls == 3
+    assert breaker.open_seconds == 7.0
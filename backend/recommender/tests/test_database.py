@@ -0,0 +1,51 @@
+"""Envío y decodificación de consultas PostgREST"""
+from types import SimpleNamespace
+
+import httpx
+import orjson
+import pytest
+from postgrest.exceptions import APIError
+
+from app.utils import database
+from app.utils.rows import product_rows, sale_rows
+
+ROWS = [{"productid": "p1", "productnm": "Taladro", "price": 10.5, "users": {"user_nm": "Ana"}}]
+
+
+class FakeQuery:
+    """Consulta con la interfaz que usa _send (request interno o execute público)"""
+
+    def __init__(self, data, request=None):
+        self.data = data
+        self.request = request
+
+    def execute(self):
+        return SimpleNamespace(data=self.data)
+
+
+def test_send_uses_raw_response(monkeypatch):
+    sent = []
+    monkeypatch.setattr(database, "send_with_retry",
+                        lambda request: sent.append(request) or httpx.Response(200, content=orjson.dumps(ROWS)))
+
+    body = database._send(FakeQuery(None, request="req"))
+    assert sent == ["req"]
+    assert product_rows.decode(body)[0].users.user_nm == "Ana"
+
+
+def test_send_raises_api_error(monkeypatch):
+    error = {"message": "permission denied", "code": "42501", "hint": None, "details": None}
+    monkeypatch.setattr(database, "send_with_retry",
+                        lambda request: httpx.Response(401, content=orjson.dumps(error)))
+
+    with pytest.raises(APIError) as raised:
+        database._send(FakeQuery(None, request="req"))
+    assert raised.value.code == "42501"
+
+
+@pytest.mark.parametrize("internals", [True, False])
+def test_send_falls_back_to_execute(monkeypatch, internals):
+    if not internals:
+        monkeypatch.setattr(database, "send_with_retry", None)
+    body = database._send(FakeQuery([{"product_id": "p1", "quantity": 3}]))
+    assert sale_rows.decode(body)[0].quantity == 3
@@ -0,0 +1,94 @@
+"""Re-ranking MMR con topes por proveedor y categoría"""
+import numpy as np
+import pytest
+
+from app.models.diversity_reranker import DiversityReranker
+
+
+def reference_mmr(reranker, scores, suppliers, categories, k):
+    """MMR directo: recalcula la similitud máxima contra toda la selección en cada paso"""
+    lo, hi = scores.min(), scores.max()
+    relevance = (scores - lo) / (hi - lo) if hi > lo else np.ones(len(scores))
+    lam = reranker.diversity_lambda
+    sw, cw = reranker.supplier_weight, reranker.category_weight
+    selected = []
+    for _ in range(min(k, len(scores))):
+        best, best_value = None, -np.inf
+        for i in range(len(scores)):
+            if i in selected:
+                continue
+            if reranker.max_per_supplier is not None and \
+                    sum(suppliers[j] == suppliers[i] for j in selected) >= reranker.max_per_supplier:
+                continue
+            if reranker.max_per_category is not None and \
+                    sum(categories[j] == categories[i] for j in selected) >= reranker.max_per_category:
+                continue
+            similarity = max(
+                (sw * (suppliers[i] == suppliers[j]) + cw * (categories[i] == categories[j]) for j in selected),
+                default=0.0
+            )
+            value = lam * relevance[i] - (1 - lam) * similarity
+            if value > best_value:
+                best, best_value = i, value
+        if best is None:
+            break
+        selected.append(best)
+    return selected
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("caps", [(None, None), (2, None), (None, 3), (1, 2)])
+def test_matches_reference_mmr(seed, caps):
+    rng = np.random.default_rng(seed)
+    n = 60
+    scores = rng.random(n)
+    suppliers = rng.integers(0, 6, n)
+    categories = rng.integers(0, 4, n)
+    reranker = DiversityReranker(
+        diversity_lambda=0.6, max_per_supplier=caps[0], max_per_category=caps[1], strict_caps=True
+    )
+    picked = reranker.rerank_indices(scores, suppliers, categories, 15)
+    assert picked.tolist() == reference_mmr(reranker, scores, suppliers, categories, 15)
+
+
+def test_lambda_one_is_pure_relevance():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    picked = DiversityReranker(diversity_lambda=1.0).rerank_indices(scores, np.zeros(4, int), np.zeros(4, int), 3)
+    assert picked.tolist() == [1, 3, 2]
+
+
+def test_diversity_interleaves_suppliers():
+    # Proveedor 0 tiene los tres mejores scores, pero MMR alterna proveedores
+    scores = np.array([1.0, 0.95, 0.9, 0.5, 0.45])
+    suppliers = np.array([0, 0, 0, 1, 1])
+    picked = DiversityReranker(diversity_lambda=0.5).rerank_indices(scores, suppliers, suppliers, 3)
+    assert picked.tolist()[:2] == [0, 3]
+
+
+def test_caps_fill_with_best_remaining_unless_strict():
+    scores = np.array([1.0, 0.9, 0.8, 0.1])
+    suppliers = np.array([0, 0, 0, 1])
+    categories = np.zeros(4, int)
+
+    loose = DiversityReranker(max_per_supplier=1).rerank_indices(scores, suppliers, categories, 3)
+    assert loose.tolist()[:2] == [0, 3]
+    assert loose.tolist()[2] == 1
+
+    strict = DiversityReranker(max_per_supplier=1, strict_caps=True).rerank_indices(scores, suppliers, categories, 3)
+    assert strict.tolist() == [0, 3]
+
+
+def test_rerank_products_respects_limit_and_caps():
+    products = [
+        {"id": f"p{i}", "provider_id": f"s{i % 2}", "category": "tools", "recommendation_score": 1 - i / 10}
+        for i in range(8)
+    ]
+    ranked = DiversityReranker(max_per_supplier=2, strict_caps=True).rerank(products, limit=5)
+    assert len(ranked) == 4
+    assert sorted(p["provider_id"] for p in ranked) == ["s0", "s0", "s1", "s1"]
+    assert DiversityReranker().rerank([], limit=5) == []
+
+
+def test_invalid_lambda():
+    with pytest.raises(ValueError):
+        DiversityReranker(diversity_lambda=1.5)
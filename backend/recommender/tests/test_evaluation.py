@@ -0,0 +1,85 @@
+"""Evaluación offline: métricas por canasta, ventanas y contexto del usuario"""
+import numpy as np
+import pytest
+
+from evaluation.engine import PopularityBaseline, UserContext, basket_metrics, evaluate, windows
+from evaluation.history import History, sort_history
+
+
+def history(rows):
+    """rows: (usuario, producto, instante, orden)"""
+    user, item, time, order = (np.array(column) for column in zip(*rows))
+    return sort_history(History(user.astype(np.int32), item.astype(np.int32),
+                                time.astype(np.int64), order.astype(np.int32)))
+
+
+def test_basket_metrics_hits_and_ndcg():
+    recommended = np.array([
+        [3, 1, 2],     # relevante {1}: acierto en la posición 2
+        [5, 6, -1],    # relevante {7}: nada
+        [2, 4, 9],     # relevantes {2, 9, 2}: dos distintos, en 1 y 3
+    ])
+    offsets = np.array([0, 1, 2, 5])
+    items = np.array([1, 7, 2, 9, 2])
+    metrics = basket_metrics(recommended, offsets, items, ks=(1, 3))
+
+    assert metrics["hit@1"].tolist() == [0.0, 0.0, 1.0]
+    assert metrics["hit@3"].tolist() == [1.0, 0.0, 1.0]
+    assert metrics["ndcg@3"][0] == pytest.approx(1 / np.log2(3))
+    assert metrics["ndcg@3"][1] == 0.0
+    ideal = 1 + 1 / np.log2(3)
+    assert metrics["ndcg@3"][2] == pytest.approx((1 + 1 / np.log2(4)) / ideal)
+    assert metrics["ndcg@1"][2] == pytest.approx(1.0)
+
+
+def test_basket_metrics_ignores_empty_slots():
+    # -1 marca un hueco: no cuenta como acierto aunque la fila 0 sea relevante
+    metrics = basket_metrics(np.array([[-1, 0]]), np.array([0, 1]), np.array([0]), ks=(1, 2))
+    assert metrics["hit@1"].tolist() == [0.0]
+    assert metrics["hit@2"].tolist() == [1.0]
+
+
+def test_windows_split_purchases_after_warmup():
+    h = history([(0, 0, t, t) for t in range(100, 200)])
+    bounds = windows(h, count=4, warmup=0.2)
+    assert len(bounds) == 5
+    assert bounds[0] == 120 and bounds[-1] == 200
+    assert np.all(np.diff(bounds) > 0)
+
+
+def test_windows_rejects_empty_history():
+    empty = History(*(column[:0] for column in history([(0, 0, 0, 0)])))
+    with pytest.raises(ValueError, match="empty"):
+        windows(empty, count=3, warmup=0.2)
+
+
+class Repeat:
+    """Recomienda lo que el usuario ya compró (necesita su historia)"""
+
+    def __init__(self):
+        self.contexts = []
+
+    def score(self, candidates, limit=6, user=None):
+        self.contexts.append(user)
+        items = np.unique(user.items)[:limit]
+        return items, np.ones(len(items))
+
+
+def test_personalized_strategy_receives_history_before_each_query():
+    # Cada usuario recompra siempre su propio producto (usuario u -> producto u)
+    rows = [(u, u, 1000 + 10 * t + u, 100 * t + u) for t in range(10) for u in range(5)]
+    repeat = Repeat()
+    report = evaluate(history(rows), {"repeat": repeat, "popular": PopularityBaseline()},
+                      candidates=np.arange(5), n_items=5, ks=(1,), window_count=2, warmup=0.2, shards=2)
+
+    assert report["repeat"]["hit@1"] == 1.0
+    assert report["popular"]["hit@1"] < 0.5
+    seen = {}
+    for context in repeat.contexts:
+        assert isinstance(context, UserContext)
+        assert set(context.items.tolist()) == {context.user}
+        seen.setdefault(context.user, []).append(len(context.items))
+    # Cada consulta ve exactamente las compras anteriores: ni la orden consultada ni las posteriores
+    for lengths in seen.values():
+        assert lengths == list(range(lengths[0], lengths[0] + len(lengths)))
+        assert lengths[-1] == 9
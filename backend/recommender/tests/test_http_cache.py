@@ -0,0 +1,97 @@
+"""ETag / 304 / respuestas guardadas del caché HTTP"""
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from app.api.http_cache import ConditionalCacheMiddleware
+
+ORIGINS = ["http://localhost:5173", "http://localhost:3000"]
+
+
+@pytest.fixture
+def state():
+    return {"version": "1:random", "calls": 0}
+
+
+@pytest.fixture
+def client(state):
+    api = FastAPI()
+
+    @api.get("/api/v1/trending")
+    async def trending():
+        state["calls"] += 1
+        return {"calls": state["calls"]}
+
+    @api.get("/api/v1/other")
+    async def other():
+        state["calls"] += 1
+        return {"calls": state["calls"]}
+
+    # Mismo orden que app.main: el caché por dentro de CORS
+    api.add_middleware(
+        ConditionalCacheMiddleware,
+        paths=("/api/v1/trending",),
+        version=lambda: state["version"]
+    )
+    api.add_middleware(CORSMiddleware, allow_origins=ORIGINS, allow_credentials=True)
+    return TestClient(api)
+
+
+def test_stored_response_reused_with_etag(client, state):
+    first = client.get("/api/v1/trending?limit=5&fields=id")
+    second = client.get("/api/v1/trending?fields=id&limit=5")
+
+    assert first.json() == second.json() == {"calls": 1}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+
+def test_if_none_match_returns_304_without_calling_endpoint(client, state):
+    etag = client.get("/api/v1/trending").headers["etag"]
+
+    response = client.get("/api/v1/trending", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert state["calls"] == 1
+
+
+def test_new_version_changes_etag(client, state):
+    etag = client.get("/api/v1/trending").headers["etag"]
+    state["version"] = "2:random"
+
+    response = client.get("/api/v1/trending", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json() == {"calls": 2}
+
+
+def test_other_paths_not_cached(client, state):
+    client.get("/api/v1/other")
+    response = client.get("/api/v1/other")
+    assert response.json() == {"calls": 2}
+    assert "etag" not in response.headers
+
+
+@pytest.mark.parametrize("origin", ORIGINS)
+def test_cors_headers_follow_each_request_origin(client, origin):
+    for other in ORIGINS:
+        client.get("/api/v1/trending", headers={"Origin": other})
+
+    response = client.get("/api/v1/trending", headers={"Origin": origin})
+    assert response.headers["access-control-allow-origin"] == origin
+
+    etag = response.headers["etag"]
+    not_modified = client.get("/api/v1/trending", headers={"Origin": origin, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["access-control-allow-origin"] == origin
+
+
+def test_app_stack_serves_cached_strategies_per_origin():
+    from app.main import app
+
+    client = TestClient(app)
+    for origin in ORIGINS + ORIGINS[::-1]:
+        response = client.get("/api/v1/strategies", headers={"Origin": origin})
+        assert response.status_code == 200
+        assert response.headers["access-control-allow-origin"] == origin
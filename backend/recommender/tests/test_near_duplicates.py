@@ -0,0 +1,48 @@
+"""Clusters de casi-duplicados (MinHash-LSH + union-find)"""
+import pytest
+
+from app.models.near_duplicates import NearDuplicateIndex
+
+DRILL = "taladro percutor inalambrico 18v bosch con dos baterias y maletin"
+CHAIR = "silla de oficina ergonomica con apoyo lumbar y ruedas de nylon"
+SHOES = "zapatillas de running para mujer con suela de goma antideslizante"
+
+
+@pytest.fixture
+def index():
+    index = NearDuplicateIndex()
+    index.update({"a": DRILL, "b": DRILL, "c": DRILL, "d": CHAIR, "e": CHAIR, "f": SHOES})
+    return index
+
+
+def test_clusters_clones(index):
+    assert index.representative("b") == index.representative("a") == index.representative("c")
+    assert index.representative("d") == index.representative("e")
+    assert index.representative("f") == "f"
+    assert sorted(index.members("c")) == ["a", "b", "c"]
+
+
+def test_remove_two_members_of_one_cluster(index):
+    root = index.representative("a")
+    others = [pid for pid in ("a", "b", "c") if pid != root]
+    index.update({}, removed=[root, others[0]])
+
+    assert index.members(others[1]) == [others[1]]
+    # El índice queda consistente: la sync siguiente no falla
+    index.update({"g": DRILL})
+    assert index.representative("g") == index.representative(others[1])
+
+
+def test_change_two_members_of_one_cluster(index):
+    index.update({"a": CHAIR, "b": SHOES})
+
+    assert index.representative("a") == index.representative("d")
+    assert index.representative("b") == index.representative("f")
+    assert index.members("c") == ["c"]
+    index.update({}, removed=["a", "d"])
+    assert index.members("e") == ["e"]
+
+
+def test_dedupe_keeps_first_of_each_cluster(index):
+    products = [{"id": pid} for pid in ("c", "d", "a", "f", "e")]
+    assert [p["id"] for p in index.dedupe(products)] == ["c", "d", "f"]
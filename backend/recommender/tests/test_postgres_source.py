@@ -0,0 +1,81 @@
+"""
+Origen Postgres directo (asyncpg)
+
+Las pruebas de integración corren sólo con TEST_POSTGRES_DSN, que debe
+apuntar a una base desechable: el seeder trunca las tablas del esquema.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app.utils.data_sources import to_product
+from app.utils.postgres_source import PostgresSource, _record, _uuids, seed
+
+DSN = os.getenv("TEST_POSTGRES_DSN")
+PRODUCTS = 300
+
+
+def row(**values):
+    base = {
+        "id": "p1", "name": "Taladro", "category": None, "price": 10.0, "stock": 3, "active": True,
+        "provider_id": None, "provider_name": None, "image_url": None, "thumbnail_url": None,
+        "thumbnails": None
+    }
+    return {**base, **values}
+
+
+def test_record_defaults():
+    record = _record(row())
+    assert record["thumbnails"] == {}
+    assert (record["image_url"], record["category"], record["provider_name"]) == ("", "Sin categoría", "Desconocido")
+
+
+def test_record_parses_thumbnails_stored_as_json_string():
+    record = _record(row(image_url="full.jpg", thumbnails='{"mobile": "m.jpg"}'))
+    assert record["thumbnails"] == {"mobile": "m.jpg"}
+    assert to_product(record, image_size="mobile")["image_url"] == "m.jpg"
+    assert _record(row(thumbnails="not json"))["thumbnails"] == {}
+
+
+def test_uuids_skips_invalid_ids():
+    valid = str(uuid.uuid4())
+    assert _uuids([valid, "syn-00000001", ""]) == [uuid.UUID(valid)]
+
+
+@pytest.mark.skipif(not DSN, reason="TEST_POSTGRES_DSN not set")
+def test_against_local_postgres():
+    async def scenario():
+        assert await seed(DSN, PRODUCTS, chunk_size=128) == PRODUCTS
+        # Lotes chicos para recorrer varias vueltas del cursor
+        source = PostgresSource(DSN, batch_size=64)
+        try:
+            pool = await source.pool()
+            active = await pool.fetchval("SELECT count(*) FROM products WHERE is_active")
+            catalog = await source.fetch_catalog()
+
+            first = catalog[0]
+            # Una fila antigua con thumbnails como string JSON
+            await pool.execute(
+                "UPDATE product_images SET thumbnails = to_jsonb($2::text) WHERE product_id = $1::uuid",
+                first["id"], '{"mobile": "legacy-mobile.jpg"}'
+            )
+            single = await source.fetch_product_by_id(first["id"])
+            many = await source.fetch_products_by_ids([first["id"], catalog[1]["id"], "not-a-uuid"],
+                                                      image_size="mobile")
+            candidates = await source.fetch_candidates(category=first["category"], min_stock=1)
+            return active, catalog, single, many, candidates
+        finally:
+            await source.close()
+
+    active, catalog, single, many, candidates = asyncio.run(scenario())
+
+    assert len(catalog) == active
+    assert len({record["id"] for record in catalog}) == len(catalog)
+    assert all(record["price_tiers"] for record in catalog)
+    assert any(record["delivery_regions"] for record in catalog)
+    assert single is not None and single["id"] == catalog[0]["id"]
+    assert set(many) == {catalog[0]["id"], catalog[1]["id"]}
+    assert many[catalog[0]["id"]]["image_url"] == "legacy-mobile.jpg"
+    assert candidates and all(c["category"] == catalog[0]["category"] for c in candidates)
@@ -0,0 +1,140 @@
+"""QueryExecutor: hedging de lecturas lentas, deadlines y breaker"""
+import asyncio
+import time
+
+import pytest
+
+from app.utils import request_budget
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.query_executor import QueryExecutor, QueryTimeout
+
+
+class Replica:
+    """Consulta async cuyas respuestas tardan lo indicado, en orden de llamada"""
+
+    def __init__(self, *delays, fail=()):
+        self.delays = list(delays)
+        self.fail = set(fail)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def query(self):
+        attempt = self.calls
+        self.calls += 1
+        delay = self.delays[attempt] if attempt < len(self.delays) else 0.0
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if attempt in self.fail:
+            raise RuntimeError(f"attempt {attempt} failed")
+        return attempt
+
+
+def warmed(**kwargs) -> QueryExecutor:
+    """Executor con hedging y latencias de ~1ms ya registradas para 'read'"""
+    executor = QueryExecutor(hedge=True, hedge_min_samples=5, hedge_min_delay=0.02, **kwargs)
+
+    async def warm():
+        for _ in range(5):
+            await executor.run("read", Replica(0.001).query)
+
+    asyncio.run(warm())
+    return executor
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    executor = warmed()
+    replica = Replica(1.0, 0.0)
+
+    started = time.perf_counter()
+    assert asyncio.run(executor.run("read", replica.query)) == 1
+    assert time.perf_counter() - started < 0.5
+    # La copia ganó y la primaria (corrutina) se canceló
+    assert replica.calls == 2 and replica.cancelled == 1
+    stats = executor.stats()["read"]
+    assert stats["hedges_fired"] == 1 and stats["hedges_won"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    executor = warmed()
+    replica = Replica(0.0)
+    assert asyncio.run(executor.run("read", replica.query)) == 0
+    assert replica.calls == 1
+    assert executor.stats()["read"]["hedges_fired"] == 0
+
+
+def test_no_hedge_for_writes_or_before_enough_samples():
+    executor = warmed()
+    replica = Replica(0.1)
+    asyncio.run(executor.run("read", replica.query, hedge=False))
+    assert replica.calls == 1
+
+    cold = QueryExecutor(hedge=True, hedge_min_samples=5, hedge_min_delay=0.02)
+    replica = Replica(0.1)
+    asyncio.run(cold.run("read", replica.query))
+    assert replica.calls == 1
+
+
+def test_failed_primary_falls_back_to_backup():
+    executor = warmed()
+    replica = Replica(0.1, 0.2, fail={0})
+    assert asyncio.run(executor.run("read", replica.query)) == 1
+
+
+def test_both_copies_failing_raises():
+    executor = warmed()
+    replica = Replica(0.1, 0.05, fail={0, 1})
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.run("read", replica.query))
+    assert executor.stats()["read"]["errors"] == 1
+
+
+def test_sync_call_is_hedged_in_threads():
+    executor = warmed()
+    delays = iter([0.5, 0.0])
+
+    def blocking():
+        time.sleep(next(delays))
+        return "ok"
+
+    async def timed():
+        started = time.perf_counter()
+        result = await executor.run("read", blocking)
+        # El thread perdedor sigue durmiendo; asyncio.run lo espera al cerrar
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result == "ok" and elapsed < 0.4
+    assert executor.stats()["read"]["hedges_won"] == 1
+
+
+def test_deadline_raises_timeout_and_counts_as_failure():
+    breaker = CircuitBreaker(window=1, min_calls=1)
+    executor = QueryExecutor(deadline_seconds=0.05, breaker=breaker)
+    with pytest.raises(QueryTimeout):
+        asyncio.run(executor.run("read", Replica(1.0).query))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    replica = Replica(0.0)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(executor.run("read", replica.query))
+    assert replica.calls == 0
+    assert executor.stats()["read"]["rejected"] == 1
+
+
+def test_request_budget_cut_is_not_a_database_failure():
+    breaker = CircuitBreaker(window=1, min_calls=1)
+    executor = QueryExecutor(deadline_seconds=5.0, breaker=breaker)
+
+    async def request():
+        tokens = request_budget.start(0.05)
+        try:
+            return await executor.run("read", Replica(1.0).query)
+        finally:
+            request_budget.reset(tokens)
+
+    with pytest.raises(request_budget.DeadlineExceeded):
+        asyncio.run(request())
+    assert breaker.is_closed
@@ -0,0 +1,30 @@
+"""Caminos de RecommenderService que dependen de si el catálogo está cargado"""
+import asyncio
+
+import pytest
+
+from app.services import recommender_service as service_module
+from app.services.recommender_service import RecommenderService
+
+
+@pytest.fixture
+def service():
+    service = RecommenderService()
+    service.dedupe_enabled = False
+    return service
+
+
+@pytest.mark.parametrize("sort_by, descending", [("price_asc", False), ("price_desc", True)])
+def test_price_sort_waits_for_snapshot(service, monkeypatch, sort_by, descending):
+    async def no_candidates(**kwargs):
+        raise AssertionError("price sort must not fall back to Supabase relevance order")
+
+    monkeypatch.setattr(service_module.data_source, "fetch_candidates", no_candidates)
+    assert service.catalog.snapshot is None
+
+    page = asyncio.run(service.get_recommendations(limit=8, sort_by=sort_by))
+
+    prices = [product["price"] for product in page]
+    assert len(prices) == 8
+    assert prices == sorted(prices, reverse=descending)
+    assert service.catalog.snapshot is not None
@@ -0,0 +1,94 @@
+"""Bloom filters de productos vistos y su rotación por generaciones"""
+import numpy as np
+import pytest
+
+from app.utils.seen_filter import BloomFilter, ExclusionSet, RotatingBloomFilter, SeenStore, key_hashes
+
+
+def test_bloom_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"prod-{i}" for i in range(1000)]
+    bloom.update(keys)
+    assert all(key in bloom for key in keys)
+    assert bloom.is_full
+
+
+def test_bloom_false_positive_rate_near_target():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.update(f"prod-{i}" for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives / 10_000 < 0.03
+
+
+@pytest.mark.parametrize("capacity, error_rate", [(0, 0.01), (10, 0.0), (10, 1.0)])
+def test_bloom_rejects_invalid_parameters(capacity, error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, error_rate)
+
+
+def test_rotation_keeps_previous_generation_then_forgets_it():
+    seen = RotatingBloomFilter(capacity=10)
+    seen.update(f"old-{i}" for i in range(10))
+    seen.update(f"new-{i}" for i in range(9))
+    # La generación llena pasó a ser la anterior: todavía se excluye
+    assert "old-0" in seen and "new-0" in seen
+
+    seen.update(["new-9", "newest"])
+    assert "old-0" not in seen
+    assert "new-0" in seen and "newest" in seen
+
+
+def test_rotation_by_age(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("app.utils.seen_filter.time.monotonic", lambda: clock[0])
+    seen = RotatingBloomFilter(capacity=100, rotate_seconds=60)
+    seen.add("a")
+    clock[0] += 61
+    assert "a" in seen
+    clock[0] += 61
+    assert "a" not in seen
+
+
+def test_seen_store_evicts_least_recently_used_user():
+    store = SeenStore(capacity=10, max_users=2)
+    store.mark_seen("u1", ["a"])
+    store.mark_seen("u2", ["b"])
+    store.get("u1")
+    store.mark_seen("u3", ["c"])
+    assert store.get("u2") is None
+    assert "a" in store.get("u1")
+    assert store.stats()["users"] == 2
+
+    store.clear("u1")
+    assert store.get("u1") is None
+
+
+def test_exclusion_set_combines_sources():
+    bloom = BloomFilter(capacity=10)
+    bloom.add("b")
+    exclusion = ExclusionSet({"a"}, None, bloom, set())
+    assert "a" in exclusion and "b" in exclusion and "c" not in exclusion
+    assert len(exclusion.sources) == 2
+    assert not ExclusionSet(None, set())
+
+
+def test_contains_hashed_matches_membership_including_false_positives():
+    # Filtro chico y sobrecargado para que haya falsos positivos que comparar
+    bloom = BloomFilter(capacity=50, error_rate=0.1)
+    bloom.update(f"prod-{i}" for i in range(200))
+    keys = [f"prod-{i}" for i in range(0, 400)] + [f"other-{i}" for i in range(2000)]
+    expected = [key in bloom for key in keys]
+    assert 0 < sum(expected[400:]) < 2000
+
+    h1, h2 = key_hashes(keys)
+    assert bloom.contains_hashed(h1, h2).tolist() == expected
+
+
+def test_rotating_contains_hashed_checks_both_generations():
+    seen = RotatingBloomFilter(capacity=10)
+    seen.update(f"old-{i}" for i in range(10))
+    seen.add("new")
+    keys = ["old-3", "new", "never"]
+    h1, h2 = key_hashes(keys)
+    assert seen.contains_hashed(h1, h2).tolist() == [key in seen for key in keys] == [True, True, False]
+    assert key_hashes([])[0].dtype == np.uint64
@@ -0,0 +1,217 @@
+"""Caché de dos niveles (L1 + L2 compartido) y protocolo RESP"""
+import asyncio
+import time
+
+import pytest
+
+from app.utils.shared_cache import MemoryBackend, RedisBackend, RedisError, TieredCache, cache_key
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FailingBackend:
+    """L2 caído: todas las operaciones fallan"""
+
+    async def get(self, key):
+        raise ConnectionError("down")
+
+    async def set(self, key, value, ttl, only_if_absent=False):
+        raise ConnectionError("down")
+
+    async def delete(self, key):
+        raise ConnectionError("down")
+
+
+def counting_compute(calls, value=b"page", delay=0.0):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return compute
+
+
+def test_cache_key_is_order_independent():
+    assert cache_key("trending", "1:random", limit=5, fields=None) == \
+        cache_key("trending", "1:random", fields=None, limit=5)
+    assert cache_key("trending", "1:random", limit=5) != cache_key("trending", "2:random", limit=5)
+
+
+def test_memory_backend_ttl_and_nx():
+    async def scenario():
+        backend = MemoryBackend()
+        assert await backend.set("k", b"1", 0.05)
+        assert not await backend.set("k", b"2", 1, only_if_absent=True)
+        assert await backend.get("k") == b"1"
+        await asyncio.sleep(0.06)
+        return await backend.get("k")
+
+    assert run(scenario()) is None
+
+
+def test_single_flight_within_replica():
+    calls = []
+
+    async def scenario():
+        cache = TieredCache(l2=MemoryBackend())
+        compute = counting_compute(calls, delay=0.05)
+        values = await asyncio.gather(*(cache.get_or_compute("k", 60, compute) for _ in range(10)))
+        return values, await cache.get_or_compute("k", 60, compute), cache.stats
+
+    values, again, stats = run(scenario())
+    assert values == [b"page"] * 10 and again == b"page"
+    assert len(calls) == 1
+    assert stats["misses"] == 1 and stats["l1_hits"] == 1
+
+
+def test_replica_waits_for_lock_holder():
+    calls = []
+
+    async def scenario():
+        shared = MemoryBackend()
+        first, second = TieredCache(l2=shared), TieredCache(l2=shared, lock_wait=1.0)
+        owner = asyncio.create_task(first.get_or_compute("k", 60, counting_compute(calls, b"a", delay=0.1)))
+        await asyncio.sleep(0.01)
+        waiter = await second.get_or_compute("k", 60, counting_compute(calls, b"b"))
+        return await owner, waiter, second.stats
+
+    owner, waiter, stats = run(scenario())
+    assert owner == waiter == b"a"
+    assert len(calls) == 1
+    assert stats["l2_hits"] == 1
+
+
+def test_replica_computes_after_lock_wait():
+    calls = []
+
+    async def scenario():
+        shared = MemoryBackend()
+        await shared.set("k:lock", b"1", 60, True)
+        cache = TieredCache(l2=shared, lock_wait=0.05)
+        return await cache.get_or_compute("k", 60, counting_compute(calls))
+
+    assert run(scenario()) == b"page"
+    assert len(calls) == 1
+
+
+def test_l2_errors_are_misses():
+    calls = []
+
+    async def scenario():
+        cache = TieredCache(l2=FailingBackend())
+        value = await cache.get_or_compute("k", 60, counting_compute(calls))
+        # El L1 sigue sirviendo aunque el L2 esté caído
+        return value, await cache.get_or_compute("k", 60, counting_compute(calls)), cache.stats
+
+    value, again, stats = run(scenario())
+    assert value == again == b"page"
+    assert len(calls) == 1
+    assert stats["l2_errors"] >= 2
+
+
+def test_uncacheable_value_not_stored():
+    calls = []
+
+    async def scenario():
+        l2 = MemoryBackend()
+        cache = TieredCache(l2=l2)
+        value = await cache.get_or_compute("k", 60, counting_compute(calls), cacheable=lambda: False)
+        return value, await cache.l1.get("k"), await l2.get("k"), await l2.get("k:lock")
+
+    assert run(scenario()) == (b"page", None, None, None)
+
+
+def test_resp_encoding():
+    assert RedisBackend._encode("SET", "k", b"v\r\n", "PX", 100) == (
+        b"*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\nv\r\n\r\n$2\r\nPX\r\n$3\r\n100\r\n"
+    )
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"+OK\r\n", b"OK"),
+    (b":42\r\n", 42),
+    (b"$5\r\nhe\r\nl\r\n", b"he\r\nl"),
+    (b"$-1\r\n", None),
+    (b"*2\r\n$1\r\na\r\n:1\r\n", [b"a", 1]),
+    (b"*-1\r\n", None),
+])
+def test_resp_decoding(data, expected):
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        return await RedisBackend._read_reply(reader)
+
+    assert run(scenario()) == expected
+
+
+def test_resp_error_reply():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"-ERR wrong type\r\n")
+        return await RedisBackend._read_reply(reader)
+
+    with pytest.raises(RedisError, match="wrong type"):
+        run(scenario())
+
+
+class StalledWriter:
+    """Socket con el buffer de envío lleno: drain() no vuelve nunca"""
+
+    def __init__(self):
+        self.closed = False
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        await asyncio.Event().wait()
+
+    def close(self):
+        self.closed = True
+
+
+def test_stalled_write_times_out():
+    writer = StalledWriter()
+
+    async def scenario():
+        backend = RedisBackend(timeout=0.05)
+        backend._pool.put_nowait((asyncio.StreamReader(), writer))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(backend.get("k"), 2.0)
+        except asyncio.TimeoutError:
+            return time.perf_counter() - started
+
+    elapsed = run(scenario())
+    assert elapsed is not None and elapsed < 1.0
+    assert writer.closed
+
+
+def test_replicas_with_same_catalog_share_content_version():
+    from app.services.recommender_service import RecommenderService
+
+    catalogs = {"same": [{"id": "p1", "name": "Uno", "price": 10.0, "stock": 5}],
+                "other": [{"id": "p1", "name": "Uno", "price": 12.0, "stock": 5}]}
+
+    def replica(name):
+        service = RecommenderService()
+
+        async def loader():
+            return [dict(p) for p in catalogs[name]]
+        service.catalog.loader = loader
+        return service
+
+    async def scenario():
+        old, fresh, other = replica("same"), replica("same"), replica("other")
+        # La réplica antigua ya refrescó varias veces: otra generación, mismo catálogo
+        for _ in range(3):
+            await old.catalog.refresh()
+        await fresh.catalog.refresh()
+        await other.catalog.refresh()
+        return old, fresh, other
+
+    old, fresh, other = run(scenario())
+    assert old.catalog.snapshot.generation != fresh.catalog.snapshot.generation
+    assert old.content_version() == fresh.content_version()
+    assert other.content_version() != fresh.content_version()
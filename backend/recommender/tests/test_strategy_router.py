@@ -0,0 +1,137 @@
+"""Reparto de estrategias por usuario, presupuestos y resultados tardíos"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.models.random_recommender import RandomRecommender
+from app.services import recommender_service as service_module
+from app.services.recommender_service import RecommenderService
+from app.services.strategy_router import StrategyRouter
+
+
+def test_route_is_stable_and_follows_weights():
+    router = StrategyRouter("random", split={"random": 80, "slow": 20})
+    users = [f"user-{i}" for i in range(5000)]
+    arms = [router.route(u) for u in users]
+
+    assert arms == [router.route(u) for u in users]
+    assert 0.17 < arms.count("slow") / len(arms) < 0.23
+    assert router.route(None) == "random"
+
+
+def test_version_tracks_split():
+    router = StrategyRouter("random")
+    assert router.version() == "random"
+    router.set_split({"random": 50, "slow": 50})
+    split_version = router.version()
+    router.set_split({"random": 90, "slow": 10})
+    assert split_version != router.version() != "random"
+
+
+def test_validate_rejects_unknown_strategies():
+    with pytest.raises(ValueError):
+        StrategyRouter("random", budgets_ms={"missing": 10}).validate(["random"])
+
+
+def test_stats_report_rates():
+    router = StrategyRouter("random", budgets_ms={"slow": 20})
+    for outcome in ("ok", "ok", "timeout", "error"):
+        router.record("slow", outcome)
+    stats = router.stats()["strategies"]["slow"]
+    assert stats["requests"] == 4
+    assert stats["timeout_rate"] == 0.25
+    assert stats["fallback_rate"] == 0.5
+
+
+class Slow(RandomRecommender):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def score(self, candidates, limit=6):
+        time.sleep(self.delay)
+        return super().score(candidates, limit)
+
+
+@pytest.fixture
+def off_loop_writes(monkeypatch):
+    """Escrituras de métricas hechas fuera del hilo del event loop (debe quedar vacía)"""
+    loop_thread = threading.get_ident()
+    writes = []
+    observe = service_module.strategy_seconds.observe
+
+    def checked(*args):
+        if threading.get_ident() != loop_thread:
+            writes.append(args)
+        observe(*args)
+
+    monkeypatch.setattr(service_module.strategy_seconds, "observe", checked)
+    return writes
+
+
+@pytest.fixture
+def service(off_loop_writes):
+    service = RecommenderService()
+    service.dedupe_enabled = False
+    service.strategies["slow"] = Slow(0.2)
+    service.router.budgets_ms["slow"] = 20
+    service.router.set_split({"slow": 1})
+    return service
+
+
+def test_fallback_then_late_result(service, off_loop_writes):
+    async def scenario():
+        await service.catalog.get_snapshot()
+
+        started = time.perf_counter()
+        first = await service.get_recommendations(user_id="u1", limit=5)
+        waited = time.perf_counter() - started
+        first_served = service.served_strategy("u1")
+
+        await asyncio.sleep(0.4)
+        second = await service.get_recommendations(user_id="u1", limit=5)
+        return first, waited, first_served, second, service.served_strategy("u1")
+
+    first, waited, first_served, second, second_served = asyncio.run(scenario())
+
+    assert len(first) == len(second) == 5
+    assert waited < 0.15
+    assert first_served == "random"
+    assert second_served == "slow"
+    stats = service.router.stats()["strategies"]["slow"]
+    assert (stats["timeout"], stats["late_hit"]) == (1, 1)
+    # La latencia real del tardío quedó registrada, desde el event loop
+    assert stats["p50_ms"] >= 200
+    assert off_loop_writes == []
+
+
+def test_fallback_page_not_stored_in_result_cache(service):
+    async def scenario():
+        await service.catalog.get_snapshot()
+        first = await service.get_personalized_recommendations("u1", limit=4)
+        stored = len(service.result_cache.l1)
+        await asyncio.sleep(0.4)
+        second = await service.get_personalized_recommendations("u1", limit=4)
+        third = await service.get_personalized_recommendations("u1", limit=4)
+        return first, stored, second, third
+
+    first, stored, second, third = asyncio.run(scenario())
+    assert stored == 0
+    # La segunda llamada recoge el resultado tardío y ése sí queda guardado
+    assert second.ids == third.ids
+    assert service.router.stats()["strategies"]["slow"]["late_hit"] == 1
+
+
+def test_strategy_without_budget_waits(service):
+    service.router.budgets_ms.clear()
+
+    async def scenario():
+        await service.catalog.get_snapshot()
+        page = await service.get_recommendations(user_id="u1", limit=3)
+        return page, service.served_strategy("u1")
+
+    page, served = asyncio.run(scenario())
+    assert len(page) == 3
+    assert served == "slow"
+    assert service.router.stats()["strategies"]["slow"]["ok"] == 1